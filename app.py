@@ -1,7 +1,9 @@
 # app.py - Add this file to your existing project
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, make_response, flash
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, make_response, flash, Response
 import sqlite3
+import io
 import os
+import shutil
 from datetime import datetime
 import traceback
 import math
@@ -9,6 +11,29 @@ import json
 from typing import Dict, List, Tuple, Optional
 from dataclasses import dataclass
 from esp32_sender import ESP32DataSender
+from catalog_cache import CatalogCache
+from catalog_snapshot import SnapshotReader, SnapshotPublisher
+from session_store import configure_session_store
+from cart_aggregate import CartAggregate
+from listing import KeysetListing, ListingError
+from backup_manager import BackupManager, backup_to_file
+from http_cache import conditional_get, NO_CACHE, PRIVATE_NO_CACHE
+from catalog_stats import BREAKDOWNS, CatalogStats, compute_catalog_stats
+from scoring_config import CompiledScoringConfig, ScoringConfigError, ScoringConfigStore
+from calculations import SustainabilityConfig
+from grading import score_to_grade
+from catalog_export import EXPORT_FORMATS, EXPORT_MIMETYPES, iter_catalog_records, iter_export_lines
+from weight_sensitivity import WhatIfEngine, WhatIfError
+from impact_uncertainty import DEFAULT_CONFIDENCE, DEFAULT_DRAWS, UncertaintyEngine, UncertaintyError
+from recommender import DEFAULT_ALTERNATIVES, AlternativesIndex, RecommenderError
+from scan_logger import ScanLogger
+from scan_rollups import RollupQueryError, ScanRollups
+from retention_manager import RETENTION_TABLES, RetentionManager, ensure_user_activity_schema
+from catalog_writes import MAX_BULK_ITEMS, CatalogWriteError, UnknownItemError, parse_item, write_items
+from catalog_import import IMPORT_FORMATS, IMPORT_MIMETYPES, ImportFeedError, import_feed
+from material_names import MaterialNameError, MaterialResolver, normalize_material_name
+from catalog_jobs import JOB_KINDS, CatalogJobError, CatalogJobManager
+from job_queue import JOB_STATUSES, JobCancelledError, JobQueue, JobQueueError, PermanentJobError, script_job
 import threading
 import time
 from datetime import datetime
@@ -166,13 +191,29 @@ class DualSustainabilityConfig:
     }
 
 class DualSustainabilityScorer:
-    def __init__(self, db_connection):
+    def __init__(self, db_connection, scoring_config=None):
         self.db = db_connection
-        self.config = DualSustainabilityConfig()
+        # scoring_config: a ScoringConfigVersion; built-in defaults without one
+        self.scoring_config = scoring_config
+        if scoring_config is not None:
+            self.config = scoring_config.dual
+            self.compiled = scoring_config.compiled
+        else:
+            self.config = DualSustainabilityConfig()
+            self.compiled = CompiledScoringConfig(self.config)
         self._dynamic_ranges = None
     
     def get_dual_sustainability_score(self, qr_code: str) -> Dict:
         """Calculate both Initial Cost and Lasting Cost scores"""
+        # Scores are memoized per catalog version and config when scoring from the catalog cache
+        if hasattr(self.db, 'cached_score'):
+            return self.db.cached_score(
+                'dual', qr_code, lambda: self._compute_dual_score(qr_code), self.compiled.fingerprint
+            )
+        return self._compute_dual_score(qr_code)
+    
+    def _compute_dual_score(self, qr_code: str) -> Dict:
+        """Score a single item from the database (uncached)"""
         item_row = self.db.get_clothing_item(qr_code)
         if not item_row:
             return None
@@ -185,11 +226,7 @@ class DualSustainabilityScorer:
         materials = [dict(mat) for mat in materials]
         
         # Validate material composition
-        total_percentage = sum(mat['percentage'] for mat in materials)
-        if abs(total_percentage - 100) > 1:
-            composition_penalty = min(10, abs(total_percentage - 100))
-        else:
-            composition_penalty = 0
+        composition_penalty = self._composition_penalty(materials)
         
         # Calculate INITIAL COST (Production Impact)
         initial_cost_breakdown = self._calculate_initial_cost(item, materials)
@@ -217,19 +254,19 @@ class DualSustainabilityScorer:
             # Dual scoring
             'initial_cost': {
                 'score': round(initial_cost_score, 1),
-                'grade': self._score_to_grade(initial_cost_score),
+                'grade': score_to_grade(initial_cost_score),
                 'breakdown': initial_cost_breakdown
             },
             'lasting_cost': {
                 'score': round(lasting_cost_score, 1),
-                'grade': self._score_to_grade(lasting_cost_score),
+                'grade': score_to_grade(lasting_cost_score),
                 'breakdown': lasting_cost_breakdown
             },
             
             # Final combined score
             'final_sustainability_score': {
                 'score': round(final_score, 1),
-                'grade': self._score_to_grade(final_score)
+                'grade': score_to_grade(final_score)
             },
             
             # Overall recommendation
@@ -239,6 +276,39 @@ class DualSustainabilityScorer:
             'materials_count': len(materials)
         }
     
+    def get_component_scores(self, qr_code: str) -> Optional[Dict]:
+        """Unweighted initial/lasting component scores (0-100) for reweighting in what-if analysis"""
+        if hasattr(self.db, 'cached_score'):
+            return self.db.cached_score(
+                'components', qr_code, lambda: self._compute_component_scores(qr_code), self.compiled.fingerprint
+            )
+        return self._compute_component_scores(qr_code)
+    
+    def _compute_component_scores(self, qr_code: str) -> Optional[Dict]:
+        item_row = self.db.get_clothing_item(qr_code)
+        materials = self.db.get_material_composition(qr_code) if item_row else None
+        if not materials:
+            return None
+        
+        item = dict(item_row)
+        materials = [dict(mat) for mat in materials]
+        initial_cost_breakdown = self._calculate_initial_cost(item, materials)
+        return {
+            'initial': {
+                category: details['normalized_score']
+                for category, details in initial_cost_breakdown['impact_details'].items()
+            },
+            'lasting': self._lasting_components(item, self.compiled.material_vector(materials)),
+            'composition_penalty': self._composition_penalty(materials)
+        }
+    
+    def _composition_penalty(self, materials) -> float:
+        """Penalty for compositions that do not add up to 100%"""
+        total_percentage = sum(mat['percentage'] for mat in materials)
+        if abs(total_percentage - 100) > 1:
+            return min(10, abs(total_percentage - 100))
+        return 0
+    
     def _calculate_initial_cost(self, item, materials) -> Dict:
         """Calculate Initial Cost - production environmental impact"""
         ranges = self._get_dynamic_ranges()
@@ -247,7 +317,7 @@ class DualSustainabilityScorer:
         category_scores = {}
         impact_details = {}
         
-        for category in self.config.initial_cost_weights.keys():
+        for category, _ in self.compiled.initial_cost_weights:
             total_impact = 0
             material_impacts = []
             
@@ -292,7 +362,7 @@ class DualSustainabilityScorer:
         # Calculate weighted Initial Cost score
         overall_score = sum(
             category_scores[cat] * weight 
-            for cat, weight in self.config.initial_cost_weights.items()
+            for cat, weight in self.compiled.initial_cost_weights
             if cat in category_scores
         )
         
@@ -305,76 +375,70 @@ class DualSustainabilityScorer:
     
     def _calculate_lasting_cost(self, item, materials) -> Dict:
         """Calculate Lasting Cost - lifecycle environmental impact"""
+        # Resolve the composition to material IDs once for all lookups
+        component_scores = self._lasting_components(item, self.compiled.material_vector(materials))
+        
+        overall_score = sum(
+            component_scores[component] * weight 
+            for component, weight in self.compiled.lasting_cost_weights
+        )
         
+        return {
+            'overall_score': overall_score,
+            'component_scores': {k: round(v, 1) for k, v in component_scores.items()},
+            'explanation': 'Lifetime environmental cost (durability, pollution, disposal)'
+        }
+    
+    def _lasting_components(self, item, material_vector) -> Dict:
+        """Unweighted Lasting Cost component scores"""
         # 1. Durability Factor (how long will it last?)
-        durability_score = self._calculate_durability_score(item, materials)
+        durability_score = self._calculate_durability_score(item, material_vector)
         
         # 2. End-of-life Impact (biodegradation vs pollution)
         end_of_life_score = self._calculate_weighted_material_score(
-            materials, self.config.end_of_life_scores
+            material_vector, self.compiled.end_of_life
         )
         
         # 3. Microplastic Pollution (ongoing pollution during use)
         microplastic_score = self._calculate_weighted_material_score(
-            materials, self.config.microplastic_scores
+            material_vector, self.compiled.microplastic
         )
         
         # 4. Replacement Frequency (inverse of durability)
         replacement_score = durability_score  # Same as durability but conceptually different
         
-        # Calculate weighted Lasting Cost score
-        component_scores = {
+        return {
             'durability_factor': durability_score,
             'end_of_life_impact': end_of_life_score,
             'microplastic_pollution': microplastic_score,
             'replacement_frequency': replacement_score
         }
-        
-        overall_score = sum(
-            component_scores[component] * weight 
-            for component, weight in self.config.lasting_cost_weights.items()
-        )
-        
-        return {
-            'overall_score': overall_score,
-            'component_scores': {k: round(v, 1) for k, v in component_scores.items()},
-            'explanation': 'Lifetime environmental cost (durability, pollution, disposal)'
-        }
     
-    def _calculate_durability_score(self, item, materials) -> float:
+    def _calculate_durability_score(self, item, material_vector) -> float:
         """Calculate how durable/long-lasting the item will be"""
         # Base durability from materials
         weighted_durability = self._calculate_weighted_material_score(
-            materials, self.config.material_durability_scores
+            material_vector, self.compiled.durability
         )
         
         # Apply category expectations
-        category = item.get('category', '').lower()
-        category_multiplier = self.config.category_durability_expectations.get(category, 1.0)
+        category_multiplier = self.compiled.category_durability_multiplier(item.get('category'))
         
         # Apply weight-based durability factor
-        weight_factor = self.config.get_weight_durability_factor(item['weight_grams'])
+        weight_factor = self.compiled.weight_factor(item['weight_grams'])
         
         # Apply brand quality if available
-        brand = item.get('brand', '').lower()
-        brand_multiplier = self.config.brand_quality_multipliers.get(brand, 1.0)
+        brand_multiplier = self.compiled.brand_multiplier(item.get('brand'))
         
         # Final durability score
         final_score = weighted_durability * category_multiplier * weight_factor * brand_multiplier
         
         return min(100, final_score)  # Cap at 100
     
-    def _calculate_weighted_material_score(self, materials, score_dict) -> float:
+    def _calculate_weighted_material_score(self, material_vector, score_table) -> float:
         """Calculate weighted average score based on material composition"""
-        weighted_score = 0
-        
-        for material in materials:
-            material_name = material['material_name'].lower()
-            material_score = score_dict.get(material_name, 50)  # Default neutral score
-            weight_percentage = material['percentage'] / 100
-            weighted_score += material_score * weight_percentage
-        
-        return weighted_score
+        # Unknown materials hold the default neutral score (50) in the compiled tables
+        return self.compiled.weighted(score_table, material_vector)
     
     def _generate_sustainability_insight(self, initial_cost, lasting_cost, materials, item) -> Dict:
         """Generate insight comparing Initial vs Lasting costs"""
@@ -436,21 +500,6 @@ class DualSustainabilityScorer:
         }
         return self._dynamic_ranges
     
-    def _score_to_grade(self, score: float) -> str:
-        """Convert numeric score to letter grade"""
-        if score >= 90: return 'A+'
-        elif score >= 85: return 'A'
-        elif score >= 80: return 'A-'
-        elif score >= 75: return 'B+'
-        elif score >= 70: return 'B'
-        elif score >= 65: return 'B-'
-        elif score >= 60: return 'C+'
-        elif score >= 55: return 'C'
-        elif score >= 50: return 'C-'
-        elif score >= 45: return 'D+'
-        elif score >= 40: return 'D'
-        else: return 'F'
-    
     def calculate_cart_dual_score(self, cart_items: List[Dict]) -> Dict:
         """Calculate dual scores for entire cart"""
         if not cart_items:
@@ -480,6 +529,23 @@ class DualSustainabilityScorer:
         # Calculate weighted averages
         avg_initial_cost = initial_cost_total / total_weight if total_weight > 0 else 0
         avg_lasting_cost = lasting_cost_total / total_weight if total_weight > 0 else 0
+        return self._cart_dual_result(item_scores, total_weight, avg_initial_cost, avg_lasting_cost)
+    
+    def summarize_cart_aggregate(self, aggregate) -> Dict:
+        """Dual cart score from the running totals of a CartAggregate (no rescoring)"""
+        averages = aggregate.dual_averages()
+        if not averages['scored_items']:
+            return {'error': 'No valid items scored'}
+        
+        # Memoized per catalog version, so these are cache lookups
+        item_scores = [self.get_dual_sustainability_score(qr_code) for qr_code in averages['scored_items']]
+        return self._cart_dual_result(
+            item_scores, averages['total_weight'],
+            averages['avg_initial_cost'], averages['avg_lasting_cost']
+        )
+    
+    def _cart_dual_result(self, item_scores, total_weight, avg_initial_cost, avg_lasting_cost) -> Dict:
+        """Build the cart response from weight-adjusted averages"""
         # Calculate final average score
         final_cart_score = (avg_initial_cost + avg_lasting_cost) / 2
         # Generate cart-level insights
@@ -488,15 +554,15 @@ class DualSustainabilityScorer:
         return {
             'cart_initial_cost': {
                 'score': round(avg_initial_cost, 1),
-                'grade': self._score_to_grade(avg_initial_cost)
+                'grade': score_to_grade(avg_initial_cost)
             },
             'cart_lasting_cost': {
                 'score': round(avg_lasting_cost, 1),
-                'grade': self._score_to_grade(avg_lasting_cost)
+                'grade': score_to_grade(avg_lasting_cost)
             },
             'cart_final_score': {
                 'score': round(final_cart_score, 1),
-                'grade': self._score_to_grade(final_cart_score)
+                'grade': score_to_grade(final_cart_score)
             },
             'item_scores': item_scores,
             'total_items': len(item_scores),
@@ -535,9 +601,14 @@ class DualSustainabilityScorer:
         return insights
 
 class EnhancedSustainabilityScorer:
-    def __init__(self, db_connection):
+    def __init__(self, db_connection, scoring_config=None):
         self.db = db_connection
-        self.config = SustainabilityConfig()
+        if scoring_config is not None:
+            self.config = scoring_config.enhanced
+            self.compiled = scoring_config.compiled_enhanced
+        else:
+            self.config = SustainabilityConfig()
+            self.compiled = CompiledScoringConfig(DualSustainabilityConfig(), self.config)
         self._dynamic_ranges = None
         
     def calculate_dynamic_ranges(self) -> Dict[str, Tuple[float, float]]:
@@ -675,26 +746,13 @@ class EnhancedSustainabilityScorer:
             if cat in category_scores
         )
         
-        # Apply material sustainability bonuses/penalties
-        material_bonus = 0
-        for material in materials:
-            material_name = material['material_name'].lower()
-            percentage_weight = material['percentage'] / 100
-            
-            if material_name in self.config.material_sustainability_bonus:
-                material_bonus += (
-                    self.config.material_sustainability_bonus[material_name] * 
-                    percentage_weight
-                )
-            elif material_name in self.config.material_sustainability_penalty:
-                material_bonus += (
-                    self.config.material_sustainability_penalty[material_name] * 
-                    percentage_weight
-                )
+        # Apply material sustainability bonuses/penalties (compiled per material ID)
+        material_bonus = self.compiled.weighted(
+            self.compiled.adjustment, self.compiled.material_vector(materials)
+        )
         
         # Apply category multiplier
-        category = item.get('category', '').lower()
-        category_multiplier = self.config.category_multipliers.get(category, 1.0)
+        category_multiplier = self.compiled.category_multiplier(item.get('category'))
         
         # Calculate final score
         final_score = weighted_score + material_bonus - composition_penalty
@@ -712,26 +770,11 @@ class EnhancedSustainabilityScorer:
                 'composition_penalty': round(composition_penalty, 1),
                 'category_multiplier': category_multiplier
             },
-            'grade': self._score_to_grade(final_score),
+            'grade': score_to_grade(final_score),
             'weight_grams': item['weight_grams'],
             'materials_count': len(materials)
         }
     
-    def _score_to_grade(self, score: float) -> str:
-        """Convert numeric score to letter grade"""
-        if score >= 90: return 'A+'
-        elif score >= 85: return 'A'
-        elif score >= 80: return 'A-'
-        elif score >= 75: return 'B+'
-        elif score >= 70: return 'B'
-        elif score >= 65: return 'B-'
-        elif score >= 60: return 'C+'
-        elif score >= 55: return 'C'
-        elif score >= 50: return 'C-'
-        elif score >= 45: return 'D+'
-        elif score >= 40: return 'D'
-        else: return 'F'
-    
     def calculate_cart_score(self, cart_items: List[Dict]) -> Dict:
         """Calculate comprehensive cart sustainability score"""
         if not cart_items:
@@ -778,7 +821,7 @@ class EnhancedSustainabilityScorer:
         
         return {
             'cart_score': round(final_cart_score, 1),
-            'grade': self._score_to_grade(final_cart_score),
+            'grade': score_to_grade(final_cart_score),
             'category_breakdown': {k: round(v, 1) for k, v in avg_category_scores.items()},
             'item_scores': item_scores,
             'total_items': len(item_scores),
@@ -831,9 +874,13 @@ class EnhancedSustainabilityScorer:
 dual_scorer = None
 
 def initialize_dual_scorer():
-    """Initialize the dual sustainability scorer"""
+    """Initialize the dual sustainability scorer with the active scoring config"""
     global dual_scorer
-    dual_scorer = DualSustainabilityScorer(db)
+    dual_scorer = make_dual_scorer(catalog_cache)
+
+def make_dual_scorer(db_connection):
+    """Dual scorer over any db-like source, using the active scoring config"""
+    return DualSustainabilityScorer(db_connection, scoring_config_store.current())
 
 # Dual scoring endpoints
 @app.route('/api/dual_analyze/<qr_code>')
@@ -845,6 +892,12 @@ def dual_analyze_item(qr_code):
             
         result = dual_scorer.get_dual_sustainability_score(qr_code)
         if result:
+            if 'error' not in result:
+                log_scan_event('dual_analyze', qr_code, {
+                    'initial_cost': result['initial_cost']['score'],
+                    'lasting_cost': result['lasting_cost']['score'],
+                    'final_score': result['final_sustainability_score']['score']
+                })
             return jsonify(result)
         else:
             return jsonify({'error': 'Item not found'}), 404
@@ -870,7 +923,9 @@ def dual_cart_summary():
         if not dual_scorer:
             initialize_dual_scorer()
             
-        result = dual_scorer.calculate_cart_dual_score(cart_items)
+        result = dual_scorer.summarize_cart_aggregate(get_cart_aggregate())
+        if 'error' not in result:
+            add_cart_alternatives(result)
         return jsonify(result)
         
     except Exception as e:
@@ -880,7 +935,41 @@ def dual_cart_summary():
             'traceback': traceback.format_exc()
         }), 500
 
+def add_cart_alternatives(result):
+    """Attach the best same-category alternative for each cart item, and a swap tip for the weakest one"""
+    alternatives = {}
+    for item_score in result['item_scores']:
+        found = alternatives_index.alternatives(item_score['qr_code'], k=1)
+        if found and found['alternatives']:
+            alternatives[item_score['qr_code']] = found['alternatives'][0]
+    result['greener_alternatives'] = alternatives
+    
+    weakest = min(
+        (item_score for item_score in result['item_scores'] if item_score['qr_code'] in alternatives),
+        key=lambda item_score: item_score['final_sustainability_score']['score'],
+        default=None
+    )
+    if weakest:
+        swap = alternatives[weakest['qr_code']]
+        result['cart_insights'].append(
+            f"💡 Swap {weakest['item_name']} for {swap['item_name']} (grade {swap['final_grade']}, +{swap['score_gain']} points)"
+        )
+
+def dual_config_version():
+    """Fingerprint of the dual scoring configuration (ETag source for /api/dual_config)"""
+    if not dual_scorer:
+        initialize_dual_scorer()
+    config = dual_scorer.config
+    return json.dumps([
+        config.initial_cost_weights,
+        config.lasting_cost_weights,
+        config.material_durability_scores,
+        config.end_of_life_scores
+    ], sort_keys=True)
+
 @app.route('/api/dual_config')
+# Revalidated on every use: an activated scoring config must show up at once
+@conditional_get(dual_config_version, NO_CACHE)
 def get_dual_config():
     """Return dual scoring configuration for transparency"""
     if not dual_scorer:
@@ -897,6 +986,68 @@ def get_dual_config():
         }
     })
 
+# Scoring configuration admin API
+@app.route('/api/scoring_config', methods=['GET'])
+def get_scoring_config():
+    """Active scoring configuration version and its tables"""
+    scoring_config = scoring_config_store.current()
+    return jsonify({
+        'active_version': scoring_config.version,
+        'dual_fingerprint': scoring_config.compiled.fingerprint,
+        'config': scoring_config.data
+    })
+
+@app.route('/api/scoring_config', methods=['POST'])
+def create_scoring_config():
+    """Store a new config version: {"config": {section: {table: {key: value|null}}}, "comment": str, "activate": true}"""
+    try:
+        data = request.get_json(silent=True) or {}
+        version = scoring_config_store.create_version(
+            data.get('config', {}),
+            comment=data.get('comment'),
+            activate=data.get('activate', True)
+        )
+        activated = scoring_config_store.current().version == version
+        if activated and snapshot_publisher:
+            snapshot_publisher.request_publish(force=True)
+        return jsonify({'success': True, 'version': version, 'active': activated})
+    except ScoringConfigError as e:
+        return jsonify({'error': True, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': True, 'message': str(e)}), 500
+
+@app.route('/api/scoring_config/versions', methods=['GET'])
+def list_scoring_config_versions():
+    """All stored config versions, newest first"""
+    try:
+        return jsonify({
+            'active_version': scoring_config_store.current().version,
+            'versions': scoring_config_store.list_versions()
+        })
+    except Exception as e:
+        return jsonify({'error': True, 'message': str(e)}), 500
+
+@app.route('/api/scoring_config/versions/<int:version>', methods=['GET'])
+def get_scoring_config_version(version):
+    """One stored config version (0 = built-in defaults)"""
+    result = scoring_config_store.get_version(version)
+    if not result:
+        return jsonify({'error': True, 'message': 'Config version not found'}), 404
+    return jsonify(result)
+
+@app.route('/api/scoring_config/versions/<int:version>/activate', methods=['POST'])
+def activate_scoring_config_version(version):
+    """Activate (or roll back to) a stored config version"""
+    try:
+        scoring_config_store.activate(version)
+        if snapshot_publisher:
+            snapshot_publisher.request_publish(force=True)
+        return jsonify({'success': True, 'active_version': version})
+    except ScoringConfigError as e:
+        return jsonify({'error': True, 'message': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': True, 'message': str(e)}), 500
+
 # Debug endpoint for dual scoring
 @app.route('/api/debug_dual_scoring')
 def debug_dual_scoring():
@@ -987,6 +1138,8 @@ def initialize_all_scorers():
 class FashionEnvironmentDB:
     def __init__(self, db_path="fashion_env.db"):
         self.db_path = db_path
+        # Cached material name/alias -> material_id map shared by the lookups below
+        self.materials = MaterialResolver(self)
     
     def get_connection(self):
         conn = sqlite3.connect(self.db_path)
@@ -1015,14 +1168,16 @@ class FashionEnvironmentDB:
         return result
     
     def get_environmental_impact(self, material_name, impact_category):
+        material_id = self.materials.resolve(material_name)
+        if material_id is None:
+            return None
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute('''
-        SELECT ei.impact_value, ei.unit
-        FROM environmental_impacts ei
-        JOIN materials m ON ei.material_id = m.material_id
-        WHERE m.material_name = ? AND ei.impact_category = ?
-        ''', (material_name.lower(), impact_category))
+        SELECT impact_value, unit
+        FROM environmental_impacts
+        WHERE material_id = ? AND impact_category = ?
+        ''', (material_id, impact_category))
         result = cursor.fetchone()
         conn.close()
         return result
@@ -1065,10 +1220,11 @@ class FashionEnvironmentDB:
             cursor.execute('''
             INSERT INTO materials (material_name, density_g_per_cm3, description)
             VALUES (?, ?, ?)
-            ''', (name.lower(), density, description))
+            ''', (normalize_material_name(name), density, description))
             conn.commit()
             material_id = cursor.lastrowid
             conn.close()
+            self.materials.invalidate()
             return material_id
         except sqlite3.IntegrityError:
             conn.close()
@@ -1076,22 +1232,17 @@ class FashionEnvironmentDB:
     
     def add_material_composition(self, qr_code, material_name, percentage):
         """Add material composition for a clothing item"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Get material ID
-        cursor.execute('SELECT material_id FROM materials WHERE material_name = ?', (material_name.lower(),))
-        material = cursor.fetchone()
-        
-        if not material:
-            conn.close()
+        material_id = self.materials.resolve(material_name)
+        if material_id is None:
             return False
         
+        conn = self.get_connection()
+        cursor = conn.cursor()
         try:
             cursor.execute('''
             INSERT INTO clothing_material_composition (qr_code, material_id, percentage)
             VALUES (?, ?, ?)
-            ''', (qr_code, material['material_id'], percentage))
+            ''', (qr_code, material_id, percentage))
             conn.commit()
             conn.close()
             return True
@@ -1132,22 +1283,17 @@ class FashionEnvironmentDB:
     
     def add_environmental_impact(self, material_name, impact_category, impact_value, unit, source=None):
         """Add environmental impact data for a material"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Get material ID
-        cursor.execute('SELECT material_id FROM materials WHERE material_name = ?', (material_name.lower(),))
-        material = cursor.fetchone()
-        
-        if not material:
-            conn.close()
+        material_id = self.materials.resolve(material_name)
+        if material_id is None:
             return False
         
+        conn = self.get_connection()
+        cursor = conn.cursor()
         try:
             cursor.execute('''
             INSERT INTO environmental_impacts (material_id, impact_category, impact_value, unit, source)
             VALUES (?, ?, ?, ?, ?)
-            ''', (material['material_id'], impact_category, impact_value, unit, source))
+            ''', (material_id, impact_category, impact_value, unit, source))
             
             impact_id = cursor.lastrowid
             conn.commit()
@@ -1159,23 +1305,18 @@ class FashionEnvironmentDB:
     
     def update_environmental_impact(self, impact_id, material_name, impact_category, impact_value, unit, source=None):
         """Update existing environmental impact data"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Get material ID
-        cursor.execute('SELECT material_id FROM materials WHERE material_name = ?', (material_name.lower(),))
-        material = cursor.fetchone()
-        
-        if not material:
-            conn.close()
+        material_id = self.materials.resolve(material_name)
+        if material_id is None:
             return False
         
+        conn = self.get_connection()
+        cursor = conn.cursor()
         try:
             cursor.execute('''
             UPDATE environmental_impacts 
             SET material_id=?, impact_category=?, impact_value=?, unit=?, source=?
             WHERE impact_id=?
-            ''', (material['material_id'], impact_category, impact_value, unit, source, impact_id))
+            ''', (material_id, impact_category, impact_value, unit, source, impact_id))
             
             conn.commit()
             conn.close()
@@ -1208,10 +1349,11 @@ class FashionEnvironmentDB:
             UPDATE materials 
             SET material_name=?, density_g_per_cm3=?, description=?
             WHERE material_id=?
-            ''', (name.lower(), density, description, material_id))
+            ''', (normalize_material_name(name), density, description, material_id))
             
             conn.commit()
             conn.close()
+            self.materials.invalidate()
             return True
         except sqlite3.Error:
             conn.close()
@@ -1294,39 +1436,10 @@ class FashionEnvironmentDB:
     def get_database_stats(self):
         """Get overview statistics for the database"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        stats = {}
-        
-        # Get counts
-        cursor.execute('SELECT COUNT(*) as count FROM clothing_items')
-        stats['items_count'] = cursor.fetchone()['count']
-        
-        cursor.execute('SELECT COUNT(*) as count FROM materials')
-        stats['materials_count'] = cursor.fetchone()['count']
-        
-        cursor.execute('SELECT COUNT(*) as count FROM environmental_impacts')
-        stats['impacts_count'] = cursor.fetchone()['count']
-        
-        # Get unique brands
-        cursor.execute('SELECT COUNT(DISTINCT brand) as count FROM clothing_items WHERE brand IS NOT NULL')
-        stats['brands_count'] = cursor.fetchone()['count']
-        
-        # Get unique categories
-        cursor.execute('SELECT COUNT(DISTINCT category) as count FROM clothing_items WHERE category IS NOT NULL')
-        stats['categories_count'] = cursor.fetchone()['count']
-        
-        # Get unique impact categories
-        cursor.execute('SELECT COUNT(DISTINCT impact_category) as count FROM environmental_impacts')
-        stats['impact_categories_count'] = cursor.fetchone()['count']
-        
-        # Get average weight
-        cursor.execute('SELECT AVG(weight_grams) as avg_weight FROM clothing_items')
-        avg_weight = cursor.fetchone()['avg_weight']
-        stats['avg_weight'] = round(avg_weight, 1) if avg_weight else 0
-        
-        conn.close()
-        return stats
+        try:
+            return compute_catalog_stats(conn)['overview']
+        finally:
+            conn.close()
     
     def search_items(self, search_term):
         """Search clothing items by name, brand, category, or QR code"""
@@ -1382,10 +1495,9 @@ class FashionEnvironmentDB:
         return result
     
     def backup_database(self, backup_path):
-        """Create a backup of the database"""
-        import shutil
+        """Create a consistent backup of the live database (gzip if backup_path ends in .gz)"""
         try:
-            shutil.copy2(self.db_path, backup_path)
+            backup_to_file(self.db_path, backup_path, compress=backup_path.endswith('.gz'))
             return True
         except Exception:
             return False
@@ -1398,6 +1510,10 @@ class FashionEnvironmentDB:
     
     def get_items_by_material(self, material_name):
         """Get all clothing items that contain a specific material"""
+        material_id = self.materials.resolve(material_name)
+        if material_id is None:
+            return []
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
@@ -1405,10 +1521,9 @@ class FashionEnvironmentDB:
         SELECT ci.*, cmc.percentage
         FROM clothing_items ci
         JOIN clothing_material_composition cmc ON ci.qr_code = cmc.qr_code
-        JOIN materials m ON cmc.material_id = m.material_id
-        WHERE m.material_name = ?
+        WHERE cmc.material_id = ?
         ORDER BY ci.item_name
-        ''', (material_name.lower(),))
+        ''', (material_id,))
         
         result = cursor.fetchall()
         conn.close()
@@ -1422,6 +1537,205 @@ class FashionEnvironmentDB:
 # Initialize database
 db = FashionEnvironmentDB()
 
+# Keep carts and saved choices server-side; the cookie only carries a session ID
+# (SESSION_BACKEND=sqlite|memory|cookie)
+configure_session_store(app, os.environ.get('SESSION_BACKEND', 'sqlite'), db.db_path)
+
+# Shared read-through cache for the scan/scoring paths (see warmup.py)
+catalog_cache = CatalogCache(db)
+catalog_stats = CatalogStats(catalog_cache)
+
+# Scoring configuration versions, tunable at runtime through /api/scoring_config
+scoring_config_store = ScoringConfigStore(db, DualSustainabilityConfig, SustainabilityConfig)
+
+def current_dual_scorer():
+    if not dual_scorer:
+        initialize_dual_scorer()
+    return dual_scorer
+
+what_if_engine = WhatIfEngine(catalog_cache, current_dual_scorer)
+uncertainty_engine = UncertaintyEngine(catalog_cache, current_dual_scorer)
+alternatives_index = AlternativesIndex(catalog_cache, current_dual_scorer)
+
+# Optional cross-worker snapshot: every gunicorn worker maps the same file
+CATALOG_SNAPSHOT_PATH = os.environ.get('CATALOG_SNAPSHOT_PATH')
+snapshot_publisher = None
+if CATALOG_SNAPSHOT_PATH:
+    catalog_cache.attach_snapshot(SnapshotReader(CATALOG_SNAPSHOT_PATH))
+    snapshot_publisher = SnapshotPublisher(db, CATALOG_SNAPSHOT_PATH, make_dual_scorer)
+
+# Online backups (BACKUP_INTERVAL_SECONDS=0 disables the schedule)
+backup_manager = BackupManager(
+    db.db_path,
+    backup_dir=os.environ.get('BACKUP_DIR', 'backups'),
+    keep=int(os.environ.get('BACKUP_KEEP', 24)),
+    interval=float(os.environ.get('BACKUP_INTERVAL_SECONDS', 3600))
+)
+
+# Hourly/daily analytics rollups, updated by the scan log writer after every flush
+scan_rollups = ScanRollups(db.db_path)
+
+# Write-behind scan_history logging (never blocks the scan path)
+scan_logger = ScanLogger(
+    db.db_path,
+    max_queue=int(os.environ.get('SCAN_LOG_MAX_QUEUE', 10000)),
+    batch_size=int(os.environ.get('SCAN_LOG_BATCH_SIZE', 500)),
+    flush_interval=float(os.environ.get('SCAN_LOG_FLUSH_SECONDS', 1.0)),
+    policy=os.environ.get('SCAN_LOG_POLICY', 'drop_oldest'),
+    enabled=os.environ.get('SCAN_LOG_ENABLED', '1') == '1',
+    on_flush=lambda written: scan_rollups.update()
+)
+
+# Retention of old event rows (RETENTION_INTERVAL_SECONDS=0 disables the schedule)
+retention_manager = RetentionManager(
+    db.db_path,
+    archive_dir=os.environ.get('RETENTION_ARCHIVE_DIR', 'archives'),
+    retention_days={
+        table: int(os.environ[f"{table.upper()}_RETENTION_DAYS"])
+        for table in RETENTION_TABLES if f"{table.upper()}_RETENTION_DAYS" in os.environ
+    },
+    interval=float(os.environ.get('RETENTION_INTERVAL_SECONDS', 86400)),
+    rollups=scan_rollups
+)
+
+# Catalog-wide jobs on a process pool. Nothing on the request paths reads the materialized
+# catalog_scores, so the scheduled rescore is off unless CATALOG_RESCORE_INTERVAL_SECONDS is set
+# (e.g. 86400 for nightly)
+catalog_jobs = CatalogJobManager(
+    db.db_path,
+    config_provider=scoring_config_store.current,
+    work_dir=os.environ.get('CATALOG_JOBS_DIR', 'catalog_jobs'),
+    workers=int(os.environ.get('CATALOG_JOB_WORKERS', 0)) or None,
+    interval=float(os.environ.get('CATALOG_RESCORE_INTERVAL_SECONDS', 0))
+)
+
+# Persistent queue for long-running admin work (JOB_QUEUE_WORKERS=0: only enqueue here and
+# run `python job_queue.py worker` separately)
+job_queue = JobQueue(
+    db.db_path,
+    workers=int(os.environ.get('JOB_QUEUE_WORKERS', 1)),
+    work_dir=os.environ.get('JOB_QUEUE_DIR', 'jobs')
+)
+
+def backup_job(params, context):
+    job = backup_manager.run_backup()
+    if job['status'] != 'completed':
+        raise RuntimeError(job['error'])
+    return {'path': job['path'], 'size_bytes': job['size_bytes']}
+
+def retention_job(params, context):
+    report = retention_manager.run(dry_run=bool(params.get('dry_run')), trigger='queue')
+    if report['status'] != 'completed':
+        raise RuntimeError(report['error'])
+    return report
+
+def catalog_job_handler(kind):
+    """Queue handler running a catalog_jobs job, with its shard progress and cancellation"""
+    def handler(params, context):
+        def on_progress(job):
+            context.progress(job['progress'], f"{job['shards_done']}/{job['shards_total'] or 0} shards")
+            if context.cancelled:
+                catalog_jobs.cancel(job['job_id'])
+        
+        try:
+            job = catalog_jobs.run(
+                kind, {key: params[key] for key in ('format', 'scores') if key in params},
+                params.get('workers'), trigger='queue', on_progress=on_progress
+            )
+        except CatalogJobError as e:
+            raise PermanentJobError(str(e))
+        if job['status'] == 'cancelled':
+            raise JobCancelledError('Cancelled')
+        if job['status'] != 'completed':
+            raise RuntimeError(job['error'])
+        return dict(job['result'], catalog_job_id=job['job_id'], items=job['items_done'])
+    return handler
+
+def catalog_import_job(params, context):
+    """Import a feed stored by /api/items/import?async=1; the file is removed after the last attempt"""
+    finished = False
+    try:
+        with open(params['path'], newline='', encoding='utf-8') as stream:
+            report = import_feed(db, stream, params['format'], dry_run=bool(params.get('dry_run')))
+        finished = True
+        return report
+    except (ImportFeedError, CatalogWriteError, UnicodeDecodeError, FileNotFoundError) as e:
+        finished = True
+        raise PermanentJobError(str(e))
+    finally:
+        if finished or context.final_attempt:
+            try:
+                os.remove(params['path'])
+            except OSError:
+                pass
+
+job_queue.register('data_import', script_job('data_import'), max_attempts=1)
+job_queue.register('data_cleanup', script_job('data_cleanup'), max_attempts=1)
+job_queue.register('backup', backup_job)
+job_queue.register('retention', retention_job, max_attempts=2)
+job_queue.register('catalog_import', catalog_import_job, max_attempts=2)
+for catalog_job_kind in JOB_KINDS:
+    job_queue.register(f'catalog_{catalog_job_kind}', catalog_job_handler(catalog_job_kind))
+
+def log_scan_event(event_type, qr_code, impacts=None):
+    """Queue a scan_history row for the current session"""
+    scan_logger.log(event_type, qr_code, impacts, getattr(session, 'sid', None))
+
+def cart_event_impacts(aggregate):
+    """Cart size and final dual score after an add-to-cart (for the cart rollups)"""
+    averages = aggregate.dual_averages()
+    return {
+        'cart_items': len(aggregate.entries),
+        'cart_final_score': round((averages['avg_initial_cost'] + averages['avg_lasting_cost']) / 2, 1)
+                            if averages['scored_items'] else None
+    }
+
+CATALOG_WRITE_PREFIXES = ('/api/items', '/api/materials', '/api/impacts')
+
+def catalog_version_tag():
+    """Current catalog version from the cache (ETag source for catalog endpoints)"""
+    catalog_cache.revalidate()
+    if catalog_cache.version is None:
+        return None
+    return f"catalog-{catalog_cache.version}"
+
+@app.before_request
+def start_snapshot_poller():
+    """Make sure this worker runs its snapshot poller, backup/retention/rescore schedules, job queue workers and scan log writer (no-op after the first call)"""
+    if snapshot_publisher:
+        snapshot_publisher.ensure_poller()
+    backup_manager.ensure_scheduler()
+    retention_manager.ensure_scheduler()
+    catalog_jobs.ensure_scheduler()
+    job_queue.ensure_workers()
+    scan_logger.ensure_writer()
+
+@app.before_request
+def refresh_scoring_config():
+    """Swap in a newly activated scoring config; drop only the scores computed under the old one"""
+    if not dual_scorer:
+        return
+    scoring_config = scoring_config_store.current()
+    if dual_scorer.scoring_config is scoring_config:
+        return
+    
+    old_fingerprint = dual_scorer.compiled.fingerprint
+    initialize_dual_scorer()
+    if dual_scorer.compiled.fingerprint != old_fingerprint:
+        catalog_cache.drop_scores(old_fingerprint)
+
+@app.after_request
+def revalidate_catalog_cache(response):
+    """Pick up catalog writes made by this worker without waiting for the next version check"""
+    if request.method in ('POST', 'PUT', 'DELETE') and request.path.startswith(CATALOG_WRITE_PREFIXES):
+        if request.path.startswith('/api/materials'):
+            db.materials.invalidate()
+        catalog_cache.revalidate(force=True)
+        if snapshot_publisher:
+            # Rebuilt by the poller thread, not inside this request
+            snapshot_publisher.request_publish()
+    return response
+
 @app.route('/', methods=['GET'])
 def username_page():
     if 'username' in session:
@@ -1436,8 +1750,10 @@ def set_username():
         # Save username to the database if not already present
         conn = sqlite3.connect('fashion_env.db')
         cursor = conn.cursor()
-        cursor.execute('''CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE)''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE, last_seen TIMESTAMP)''')
+        ensure_user_activity_schema(conn)
         cursor.execute('''INSERT OR IGNORE INTO users (username) VALUES (?)''', (username,))
+        cursor.execute('''UPDATE users SET last_seen = CURRENT_TIMESTAMP WHERE username = ?''', (username,))
         conn.commit()
         conn.close()
         return redirect(url_for('slider'))
@@ -1456,79 +1772,87 @@ def analyze_item(qr_code):
     """API endpoint to analyze clothing item - same logic as your desktop app"""
     try:
         # Get clothing item
-        item = db.get_clothing_item(qr_code)
+        item = catalog_cache.get_clothing_item(qr_code)
         if not item:
             return jsonify({
                 'error': True,
                 'message': f'No item found with QR code: {qr_code}',
-                'available_items': [dict(item) for item in db.list_all_clothing_items()]
+                'available_items': [dict(item) for item in catalog_cache.list_all_clothing_items()]
             })
         
         # Get material composition
-        materials = db.get_material_composition(qr_code)
-        
-        # Calculate environmental impacts - exact same logic as your desktop app
-        impact_categories = ["water_usage", "carbon_footprint", "energy_usage"]
-        category_names = {
-            "water_usage": "💧 Water Usage",
-            "carbon_footprint": "🏭 Carbon Footprint", 
-            "energy_usage": "⚡ Energy Usage"
-        }
-        
-        results = {
-            'item': dict(item),
-            'materials': [dict(mat) for mat in materials],
-            'impacts': {}
-        }
-        
-        total_impacts = {}
-        
-        for category in impact_categories:
-            category_total = 0
-            unit = None
-            material_impacts = []
-            
-            for material in materials:
-                impact_data = db.get_environmental_impact(material['material_name'], category)
-                if impact_data:
-                    # Same calculation as your desktop app
-                    material_impact = (
-                        impact_data['impact_value'] * 
-                        (material['percentage'] / 100) * 
-                        (item['weight_grams'] / 1000)
-                    )
-                    category_total += material_impact
-                    unit = impact_data['unit']
-                    
-                    material_impacts.append({
-                        'material': material['material_name'].title(),
-                        'impact': material_impact,
-                        'percentage': material['percentage'],
-                        'base_impact': impact_data['impact_value'],
-                        'unit': impact_data['unit']
-                    })
-            
-            if unit:
-                # Remove /kg from final unit display (same as your desktop app fix)
-                final_unit = unit.replace('/kg', '')
-                total_impacts[category] = {
-                    'value': category_total, 
-                    'unit': final_unit,
-                    'name': category_names[category],
-                    'materials': material_impacts
-                }
-        
-        results['impacts'] = total_impacts
-        
-        # Add tube scale calculation
-        water_usage = total_impacts.get('water_usage', {}).get('value', 0)
-        results['tube_scale'] = calculate_tube_scale(water_usage)
+        materials = catalog_cache.get_material_composition(qr_code)
         
+        results = analyze_item_impacts(item, materials)
+        log_scan_event('analyze', qr_code, {
+            category: round(impact['value'], 4) for category, impact in results['impacts'].items()
+        })
         return jsonify(results)
         
     except Exception as e:
         return jsonify({'error': True, 'message': str(e)})
 
+def analyze_item_impacts(item, materials):
+    """Environmental impacts of one item, in the /api/analyze response format"""
+    # Calculate environmental impacts - exact same logic as your desktop app
+    impact_categories = ["water_usage", "carbon_footprint", "energy_usage"]
+    category_names = {
+        "water_usage": "💧 Water Usage",
+        "carbon_footprint": "🏭 Carbon Footprint", 
+        "energy_usage": "⚡ Energy Usage"
+    }
+    
+    results = {
+        'item': dict(item),
+        'materials': [dict(mat) for mat in materials],
+        'impacts': {}
+    }
+    
+    total_impacts = {}
+    
+    for category in impact_categories:
+        category_total = 0
+        unit = None
+        material_impacts = []
+        
+        for material in materials:
+            impact_data = catalog_cache.get_environmental_impact(material['material_name'], category)
+            if impact_data:
+                # Same calculation as your desktop app
+                material_impact = (
+                    impact_data['impact_value'] * 
+                    (material['percentage'] / 100) * 
+                    (item['weight_grams'] / 1000)
+                )
+                category_total += material_impact
+                unit = impact_data['unit']
+                
+                material_impacts.append({
+                    'material': material['material_name'].title(),
+                    'impact': material_impact,
+                    'percentage': material['percentage'],
+                    'base_impact': impact_data['impact_value'],
+                    'unit': impact_data['unit']
+                })
+        
+        if unit:
+            # Remove /kg from final unit display (same as your desktop app fix)
+            final_unit = unit.replace('/kg', '')
+            total_impacts[category] = {
+                'value': category_total, 
+                'unit': final_unit,
+                'name': category_names[category],
+                'materials': material_impacts
+            }
+    
+    results['impacts'] = total_impacts
+    
+    # Add tube scale calculation
+    water_usage = total_impacts.get('water_usage', {}).get('value', 0)
+    results['tube_scale'] = calculate_tube_scale(water_usage)
+    
+    return results
+
 def calculate_tube_scale(water_liters):
     """Convert water usage to tube scale (0.7L = 0.06ml, 4800L = 400ml)"""
     if water_liters <= 0:
@@ -1538,22 +1862,360 @@ def calculate_tube_scale(water_liters):
     tube_volume = water_liters * (400 / 4800)
     return round(tube_volume, 2)
 
+# Batch scoring
+BATCH_SCORE_MODES = ('dual', 'basic')
+BATCH_SCORE_MAX_CODES = int(os.environ.get('BATCH_SCORE_MAX_CODES', 10000))
+BATCH_SCORE_CHUNK_SIZE = 500
+
+def iter_batch_scores(qr_codes, mode):
+    """Score QR codes chunk by chunk; each chunk is resolved with one set-based fetch"""
+    for start in range(0, len(qr_codes), BATCH_SCORE_CHUNK_SIZE):
+        chunk = qr_codes[start:start + BATCH_SCORE_CHUNK_SIZE]
+        items = catalog_cache.prefetch_items(chunk)
+        
+        for qr_code in chunk:
+            item = items[qr_code]
+            if not item:
+                yield {'qr_code': qr_code, 'found': False, 'score': None}
+                continue
+            
+            if mode == 'dual':
+                score = dual_scorer.get_dual_sustainability_score(qr_code)
+            else:
+                score = analyze_item_impacts(item, catalog_cache.get_material_composition(qr_code))
+            yield {'qr_code': qr_code, 'found': True, 'score': score}
+
+@app.route('/api/batch_score', methods=['POST'])
+def batch_score():
+    """Score many items in one request: {"qr_codes": [...], "mode": "dual"|"basic", "stream": false}"""
+    try:
+        data = request.get_json(silent=True) or {}
+        qr_codes = data.get('qr_codes')
+        mode = data.get('mode', 'dual')
+        
+        if not isinstance(qr_codes, list) or not all(isinstance(code, str) for code in qr_codes):
+            return jsonify({'error': True, 'message': 'qr_codes must be a list of strings'}), 400
+        if mode not in BATCH_SCORE_MODES:
+            return jsonify({'error': True, 'message': f'mode must be one of: {", ".join(BATCH_SCORE_MODES)}'}), 400
+        
+        # Drop blanks and duplicates, keep request order
+        qr_codes = list(dict.fromkeys(code.strip() for code in qr_codes if code.strip()))
+        if len(qr_codes) > BATCH_SCORE_MAX_CODES:
+            return jsonify({'error': True, 'message': f'At most {BATCH_SCORE_MAX_CODES} QR codes per request'}), 400
+        
+        if mode == 'dual' and not dual_scorer:
+            initialize_dual_scorer()
+        
+        # NDJSON: one result per line, written as soon as it is scored
+        if data.get('stream') or 'application/x-ndjson' in request.headers.get('Accept', ''):
+            def generate():
+                try:
+                    for result in iter_batch_scores(qr_codes, mode):
+                        yield json.dumps(result) + '\n'
+                except Exception as e:
+                    yield json.dumps({'error': True, 'message': str(e)}) + '\n'
+            
+            return Response(generate(), mimetype='application/x-ndjson')
+        
+        results = list(iter_batch_scores(qr_codes, mode))
+        return jsonify({
+            'mode': mode,
+            'count': len(results),
+            'not_found': [result['qr_code'] for result in results if not result['found']],
+            'results': results
+        })
+        
+    except Exception as e:
+        return jsonify({'error': True, 'message': str(e)}), 500
+
+@app.route('/api/what_if', methods=['POST'])
+def what_if_weights():
+    """
+    Grade distributions and per-item deltas under alternative dual score weights:
+    {"scenarios": [{"name", "initial_cost_weights", "lasting_cost_weights", "normalize"}],
+     "qr_codes": [...] (optional), "include_items": true}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        return jsonify(what_if_engine.evaluate(
+            data.get('scenarios'),
+            qr_codes=data.get('qr_codes'),
+            include_items=data.get('include_items', True)
+        ))
+    except WhatIfError as e:
+        return jsonify({'error': True, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': True, 'message': str(e)}), 500
+
+@app.route('/api/scan_log/status')
+def scan_log_status():
+    """Queue depth and write/drop counters of this worker's scan logger"""
+    return jsonify(scan_logger.stats())
+
+# Scan analytics (read only the rollup tables, see scan_rollups.py)
+def rollup_query(query, default_bucket, **extra):
+    """Run a rollup query with the common ?bucket=&start=&end= arguments"""
+    try:
+        return jsonify(query(
+            request.args.get('bucket', default_bucket),
+            request.args.get('start'),
+            request.args.get('end'),
+            **extra
+        ))
+    except RollupQueryError as e:
+        return jsonify({'error': True, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': True, 'message': str(e)}), 500
+
+@app.route('/api/analytics/scans')
+def analytics_scans():
+    """Scan and cart events per bucket: ?bucket=hour|day&start=&end=&qr_code="""
+    return rollup_query(scan_rollups.scan_series, 'hour', qr_code=request.args.get('qr_code'))
+
+@app.route('/api/analytics/items')
+def analytics_items():
+    """Most scanned items with their average final score: ?bucket=&start=&end=&event_type=&limit=20"""
+    return rollup_query(
+        scan_rollups.top_items, 'day',
+        event_type=request.args.get('event_type'),
+        limit=request.args.get('limit', 20, type=int)
+    )
+
+@app.route('/api/analytics/grades')
+def analytics_grades():
+    """Final grade distribution of dual scans: ?bucket=&start=&end=&session_id="""
+    return rollup_query(scan_rollups.grade_distribution, 'day', session_id=request.args.get('session_id'))
 
+@app.route('/api/analytics/carts')
+def analytics_carts():
+    """Add-to-cart events with average cart score and size: ?bucket=&start=&end="""
+    return rollup_query(scan_rollups.cart_series, 'day')
+
+@app.route('/api/alternatives/<qr_code>')
+def greener_alternatives(qr_code):
+    """Same-category items with a better final score: ?k=3&rank=score|similar&min_improvement=0"""
+    try:
+        result = alternatives_index.alternatives(
+            qr_code,
+            k=request.args.get('k', DEFAULT_ALTERNATIVES, type=int),
+            rank=request.args.get('rank', 'score'),
+            min_improvement=request.args.get('min_improvement', 0.0, type=float)
+        )
+        if result is None:
+            return jsonify({'error': True, 'message': f'No scored item with QR code: {qr_code}'}), 404
+        return jsonify(result)
+    except RecommenderError as e:
+        return jsonify({'error': True, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': True, 'message': str(e)}), 500
+
+@app.route('/api/uncertainty/<qr_code>')
+def item_uncertainty(qr_code):
+    """Monte Carlo intervals for an item's impacts and final score: ?draws=10000&confidence=0.9&seed=&cache=1"""
+    try:
+        draws = request.args.get('draws', DEFAULT_DRAWS, type=int)
+        confidence = request.args.get('confidence', DEFAULT_CONFIDENCE, type=float)
+        seed = request.args.get('seed', type=int)
+        use_cache = request.args.get('cache', '1') != '0'
+        
+        result = uncertainty_engine.item_uncertainty(qr_code, draws, confidence, seed, use_cache)
+        if result is None:
+            return jsonify({'error': True, 'message': f'No item found with QR code: {qr_code}'}), 404
+        return jsonify(result)
+    except UncertaintyError as e:
+        return jsonify({'error': True, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': True, 'message': str(e)}), 500
+
+
+
+# Database listings (keyset pagination, see listing.py)
+ITEMS_LISTING = KeysetListing(
+    select_from='FROM clothing_items',
+    fields={
+        'qr_code': 'qr_code',
+        'item_name': 'item_name',
+        'brand': 'brand',
+        'category': 'category',
+        'weight_grams': 'weight_grams',
+        'created_date': 'created_date'
+    },
+    sort_keys={
+        'item_name': ['item_name'],
+        'qr_code': [],
+        'brand': ["IFNULL(brand, '')"],
+        'category': ["IFNULL(category, '')"],
+        'weight_grams': ['weight_grams']
+    },
+    key='qr_code',
+    default_sort='item_name',
+    indexes=(
+        'CREATE INDEX IF NOT EXISTS idx_clothing_items_name ON clothing_items(item_name, qr_code)',
+        "CREATE INDEX IF NOT EXISTS idx_clothing_items_brand ON clothing_items(IFNULL(brand, ''), qr_code)",
+        "CREATE INDEX IF NOT EXISTS idx_clothing_items_category ON clothing_items(IFNULL(category, ''), qr_code)",
+        'CREATE INDEX IF NOT EXISTS idx_clothing_items_weight ON clothing_items(weight_grams, qr_code)'
+    )
+)
+
+MATERIALS_LISTING = KeysetListing(
+    select_from='FROM materials m',
+    fields={
+        'material_id': 'm.material_id',
+        'material_name': 'm.material_name',
+        'density_g_per_cm3': 'm.density_g_per_cm3',
+        'description': 'm.description',
+        'created_date': 'm.created_date',
+        'impact_count': '(SELECT COUNT(*) FROM environmental_impacts ei WHERE ei.material_id = m.material_id)'
+    },
+    sort_keys={
+        'material_name': ['m.material_name'],
+        'material_id': []
+    },
+    key='m.material_id',
+    default_sort='material_name',
+    indexes=(
+        'CREATE INDEX IF NOT EXISTS idx_environmental_impacts_material ON environmental_impacts(material_id, impact_id)',
+    )
+)
+
+IMPACTS_LISTING = KeysetListing(
+    select_from='FROM environmental_impacts ei JOIN materials m ON ei.material_id = m.material_id',
+    fields={
+        'impact_id': 'ei.impact_id',
+        'material_name': 'm.material_name',
+        'impact_category': 'ei.impact_category',
+        'impact_value': 'ei.impact_value',
+        'unit': 'ei.unit',
+        'source': 'ei.source'
+    },
+    sort_keys={
+        'material_name': ['m.material_name', "IFNULL(ei.impact_category, '')"],
+        'impact_category': ["IFNULL(ei.impact_category, '')"],
+        'impact_value': ['ei.impact_value'],
+        'impact_id': []
+    },
+    key='ei.impact_id',
+    default_sort='material_name',
+    indexes=(
+        'CREATE INDEX IF NOT EXISTS idx_environmental_impacts_material ON environmental_impacts(material_id, impact_id)',
+        "CREATE INDEX IF NOT EXISTS idx_environmental_impacts_category ON environmental_impacts(IFNULL(impact_category, ''), impact_id)",
+        'CREATE INDEX IF NOT EXISTS idx_environmental_impacts_value ON environmental_impacts(impact_value, impact_id)'
+    )
+)
+
+def listing_payload(listing, collection, args):
+    """Run a listing; plain array without limit/cursor (as before), else a page object"""
+    conn = db.get_connection()
+    try:
+        rows, next_cursor, params = listing.fetch(conn, args)
+    finally:
+        conn.close()
+    
+    if not params['paged']:
+        return rows
+    return {
+        collection: rows,
+        'next_cursor': next_cursor,
+        'limit': params['limit'],
+        'sort': params['sort'],
+        'order': params['order']
+    }
+
+def listing_response(listing, collection):
+    return jsonify(listing_payload(listing, collection, request.args))
 
 @app.route('/api/items')
+@conditional_get(catalog_version_tag, PRIVATE_NO_CACHE)
 def get_all_items():
-    """Get all clothing items for database view"""
+    """Get clothing items for database view (optionally paged, sorted and projected)"""
     try:
-        items = db.list_all_clothing_items()
-        return jsonify([dict(item) for item in items])
+        return listing_response(ITEMS_LISTING, 'items')
+    except ListingError as e:
+        return jsonify({'error': True, 'message': str(e)}), 400
     except Exception as e:
-        return jsonify({'error': True, 'message': str(e)})
+        return jsonify({'error': True, 'message': str(e)}), 500
 
 def normalize(value, best, worst):
     if worst == best:
         return 1.0
     return max(0, min(1, (worst - value) / (worst - best)))
 
+# Fixed ranges used by the basic cart score
+BASIC_SCORE_RANGES = {
+    'water_usage': (5.91996, 6000),
+    'carbon_footprint': (0.9, 10.4),
+    'energy_usage': (1.09323, 138)
+}
+
+def build_cart_entry(cart_item):
+    """Precompute the impact vector and scores of one cart item for the cart aggregate"""
+    qr_code = cart_item['qr_code']
+    entry = {
+        'qr_code': qr_code,
+        'name': cart_item['name'],
+        'weight_grams': 0,
+        'basic_score': None,
+        'initial_cost': None,
+        'lasting_cost': None,
+        'impacts': None
+    }
+    
+    item = catalog_cache.get_clothing_item(qr_code)
+    if not item:
+        return entry
+    entry['weight_grams'] = item['weight_grams']
+    
+    # Raw impacts and the basic score
+    materials = catalog_cache.get_material_composition(qr_code)
+    impacts = {}
+    for category in BASIC_SCORE_RANGES:
+        total = 0
+        for mat in materials:
+            impact_data = catalog_cache.get_environmental_impact(mat['material_name'], category)
+            if impact_data:
+                total += impact_data['impact_value'] * (mat['percentage']/100) * (item['weight_grams']/1000)
+        impacts[category] = total
+    scores = [normalize(impacts[cat], *BASIC_SCORE_RANGES[cat]) for cat in BASIC_SCORE_RANGES]
+    entry['basic_score'] = round(sum(scores) / len(scores) * 100, 1)
+    if materials:
+        entry['impacts'] = impacts
+    
+    # Dual scores (memoized per catalog version)
+    if not dual_scorer:
+        initialize_dual_scorer()
+    dual_score = dual_scorer.get_dual_sustainability_score(qr_code)
+    if dual_score and 'error' not in dual_score:
+        entry['initial_cost'] = dual_score['initial_cost']['score']
+        entry['lasting_cost'] = dual_score['lasting_cost']['score']
+    
+    return entry
+
+def cart_aggregate_version():
+    """Catalog version plus scoring config: cart aggregates built under either older one are rebuilt"""
+    catalog_cache.revalidate()
+    if not dual_scorer:
+        initialize_dual_scorer()
+    return f"{catalog_cache.version}:{dual_scorer.compiled.fingerprint}"
+
+def get_cart_aggregate():
+    """Return the session's cart aggregate, rebuilding it if it is missing or out of date"""
+    cart_items = session.get('cart_items', [])
+    version = cart_aggregate_version()
+    
+    data = session.get('cart_aggregate')
+    if data is not None:
+        aggregate = CartAggregate.from_dict(data)
+        if (aggregate.catalog_version == version and
+                list(aggregate.entries) == [item['qr_code'] for item in cart_items]):
+            return aggregate
+    
+    aggregate = CartAggregate.build(cart_items, build_cart_entry, version)
+    save_cart_aggregate(aggregate)
+    return aggregate
+
+def save_cart_aggregate(aggregate):
+    session['cart_aggregate'] = aggregate.to_dict()
+
 @app.route("/cart")
 def cart():
     username = session.get('username')
@@ -1567,41 +2229,9 @@ def cart():
         "free_shipping_threshold": "22.01"
     }
 
-    minmax = {
-        'water_usage': (5.91996, 6000),
-        'carbon_footprint': (0.9, 10.4),
-        'energy_usage': (1.09323, 138)
-    }
-    
-    def get_item_score(qr_code):
-        impacts = {}
-        item = db.get_clothing_item(qr_code)
-        if not item:
-            return None
-        materials = db.get_material_composition(qr_code)
-        for category in minmax:
-            total = 0
-            for mat in materials:
-                impact_data = db.get_environmental_impact(mat['material_name'], category)
-                if impact_data:
-                    total += impact_data['impact_value'] * (mat['percentage']/100) * (item['weight_grams']/1000)
-            impacts[category] = total
-        scores = [normalize(impacts[cat], minmax[cat][0], minmax[cat][1]) for cat in minmax]
-        return sum(scores) / len(scores) * 100
-    
-    item_scores = []
-    if cart_items:
-        for item in cart_items:
-            score = get_item_score(item['qr_code'])
-            if score is not None:
-                item_scores.append({'name': item['name'], 'score': round(score, 1)})
-        scores = [s['score'] for s in item_scores]
-        if scores:
-            sustainability_score = round(sum(scores) / len(scores), 1)
-        else:
-            sustainability_score = None
-    else:
-        sustainability_score = None
+    cart_summary = get_cart_aggregate().basic_summary()
+    sustainability_score = cart_summary['sustainability_score']
+    item_scores = cart_summary['item_scores']
     
     return render_template("cart.html", cart_items=cart_items, summary=summary, hide_nav=True, username=username, sustainability_score=sustainability_score, item_scores=item_scores)
 
@@ -1661,9 +2291,14 @@ def add_to_cart():
                 'options': []
             }
             
+            aggregate = get_cart_aggregate()
             session['cart_items'].append(cart_item)
+            aggregate.add(build_cart_entry(cart_item))
+            save_cart_aggregate(aggregate)
             session.modified = True
             
+            log_scan_event('add_to_cart', qr_code, cart_event_impacts(aggregate))
+            
             # Check if this was the first item added
             is_first_item = len(session['cart_items']) == 1
             
@@ -1700,8 +2335,12 @@ def add_to_cart():
             'options': []
         }
         
+        aggregate = get_cart_aggregate()
         session['cart_items'].append(cart_item)
+        aggregate.add(build_cart_entry(cart_item))
+        save_cart_aggregate(aggregate)
         session.modified = True
+        log_scan_event('add_to_cart', qr_code, cart_event_impacts(aggregate))
         
         return jsonify({'success': True, 'message': 'Item added to cart'})
 
@@ -1711,8 +2350,8 @@ def get_item_details_by_qr(qr_code):
     Helper function to get item details by QR code using your existing database setup
     """
     try:
-        # Use your existing database instance
-        item = db.get_clothing_item(qr_code)
+        # Served from the catalog cache (falls back to the database on a miss)
+        item = catalog_cache.get_clothing_item(qr_code)
         
         if item:
             # Convert sqlite3.Row to dict to use .get() method
@@ -1738,8 +2377,8 @@ def get_item_details_by_qr(qr_code):
 def get_suggestions(query):
     """Get QR code suggestions based on user input"""
     try:
-        # Get all clothing items from database
-        items = db.list_all_clothing_items()
+        # Get all clothing items (from the catalog cache when warm)
+        items = catalog_cache.list_all_clothing_items()
         
         # Filter items that match the query (case-insensitive)
         suggestions = []
@@ -1772,16 +2411,20 @@ def remove_from_cart():
         
         # Get current cart
         cart = session.get('cart_items', [])
+        aggregate = get_cart_aggregate()
         
         # Find and remove the item
-        original_length = len(cart)
+        removed = [item for item in cart if item['name'] == item_name]
         cart = [item for item in cart if item['name'] != item_name]
         
-        if len(cart) == original_length:
+        if not removed:
             return jsonify({'success': False, 'message': 'Item not found in cart'})
         
         # Update session
+        for item in removed:
+            aggregate.remove(item['qr_code'])
         session['cart_items'] = cart
+        save_cart_aggregate(aggregate)
         
         return jsonify({'success': True, 'message': 'Item removed from cart'})
         
@@ -1912,67 +2555,18 @@ def api_cart_summary():
     username = session.get('username')
     if not username:
         return jsonify({'error': 'Not logged in'}), 401
-    cart_items = session.get('cart_items', [])
-    minmax = {
-        'water_usage': (5.91996, 6000),
-        'carbon_footprint': (0.9, 10.4),
-        'energy_usage': (1.09323, 138)
-    }
-    def get_item_score(qr_code):
-        impacts = {}
-        item = db.get_clothing_item(qr_code)
-        if not item:
-            return None
-        materials = db.get_material_composition(qr_code)
-        for category in minmax:
-            total = 0
-            for mat in materials:
-                impact_data = db.get_environmental_impact(mat['material_name'], category)
-                if impact_data:
-                    total += impact_data['impact_value'] * (mat['percentage']/100) * (item['weight_grams']/1000)
-            impacts[category] = total
-        scores = [normalize(impacts[cat], minmax[cat][0], minmax[cat][1]) for cat in minmax]
-        return sum(scores) / len(scores) * 100
-    item_scores = []
-    if cart_items:
-        for item in cart_items:
-            score = get_item_score(item['qr_code'])
-            if score is not None:
-                item_scores.append({'name': item['name'], 'score': round(score, 1)})
-        scores = [s['score'] for s in item_scores]
-        if scores:
-            sustainability_score = round(sum(scores) / len(scores), 1)
-        else:
-            sustainability_score = None
-    else:
-        sustainability_score = None
-    return jsonify({
-        'sustainability_score': sustainability_score,
-        'item_scores': item_scores
-    })
+    # Running totals maintained by add_to_cart/remove_from_cart
+    return jsonify(get_cart_aggregate().basic_summary())
 
 # Materials API endpoints
 @app.route('/api/materials', methods=['GET'])
+@conditional_get(catalog_version_tag, PRIVATE_NO_CACHE)
 def get_all_materials():
-    """Get all materials with impact counts"""
+    """Get materials with impact counts (optionally paged, sorted and projected)"""
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        # Get materials with impact counts
-        cursor.execute('''
-        SELECT m.*, 
-               COUNT(ei.impact_id) as impact_count
-        FROM materials m
-        LEFT JOIN environmental_impacts ei ON m.material_id = ei.material_id
-        GROUP BY m.material_id, m.material_name, m.density_g_per_cm3, m.description
-        ORDER BY m.material_name
-        ''')
-        
-        materials = cursor.fetchall()
-        conn.close()
-        
-        return jsonify([dict(material) for material in materials])
+        return listing_response(MATERIALS_LISTING, 'materials')
+    except ListingError as e:
+        return jsonify({'error': True, 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'error': True, 'message': str(e)}), 500
 
@@ -1982,13 +2576,17 @@ def add_material():
     try:
         data = request.get_json()
         
-        name = data.get('name', '').strip().lower()
+        name = normalize_material_name(data.get('name'))
         density = data.get('density')
         description = data.get('description', '').strip()
         
         if not name:
             return jsonify({'error': True, 'message': 'Material name is required'}), 400
         
+        existing = db.materials.lookup(name)
+        if existing:
+            return jsonify({'error': True, 'message': f'"{name}" already resolves to material "{existing[1]}"'}), 400
+        
         # Convert empty strings to None
         density = density if density else None
         description = description if description else None
@@ -2009,13 +2607,17 @@ def update_material(material_id):
     try:
         data = request.get_json()
         
-        name = data.get('name', '').strip().lower()
+        name = normalize_material_name(data.get('name'))
         density = data.get('density')
         description = data.get('description', '').strip()
         
         if not name:
             return jsonify({'error': True, 'message': 'Material name is required'}), 400
         
+        existing = db.materials.lookup(name)
+        if existing and existing[0] != material_id:
+            return jsonify({'error': True, 'message': f'"{name}" already resolves to material "{existing[1]}"'}), 400
+        
         # Convert empty strings to None
         density = density if density else None
         description = description if description else None
@@ -2068,8 +2670,39 @@ def delete_material(material_id):
     except Exception as e:
         return jsonify({'error': True, 'message': str(e)}), 500
 
+@app.route('/api/material_aliases', methods=['GET'])
+def get_material_aliases():
+    """Aliases stored in the database and the built-in synonyms that resolve in this catalog"""
+    try:
+        return jsonify(dict(db.materials.aliases(), success=True))
+    except Exception as e:
+        return jsonify({'error': True, 'message': str(e)}), 500
+
+@app.route('/api/material_aliases', methods=['POST'])
+def add_material_alias():
+    """Map an alternative name to an existing material: {"alias": ..., "material_name": ...}"""
+    try:
+        data = request.get_json(silent=True) or {}
+        alias = db.materials.add_alias(str(data.get('alias') or ''), str(data.get('material_name') or ''))
+        return jsonify(dict(alias, success=True))
+    except MaterialNameError as e:
+        return jsonify({'error': True, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': True, 'message': str(e)}), 500
+
+@app.route('/api/material_aliases/<alias>', methods=['DELETE'])
+def delete_material_alias(alias):
+    """Remove a database alias"""
+    try:
+        if not db.materials.remove_alias(alias):
+            return jsonify({'error': True, 'message': f'Alias "{alias}" not found'}), 404
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({'error': True, 'message': str(e)}), 500
+
 # Material composition endpoints
 @app.route('/api/materials/<qr_code>')
+@conditional_get(catalog_version_tag, NO_CACHE)
 def get_item_materials(qr_code):
     """Get material composition for a specific item"""
     try:
@@ -2080,24 +2713,13 @@ def get_item_materials(qr_code):
 
 # Environmental impacts API endpoints
 @app.route('/api/impacts', methods=['GET'])
+@conditional_get(catalog_version_tag, PRIVATE_NO_CACHE)
 def get_all_impacts():
-    """Get all environmental impacts"""
+    """Get environmental impacts (optionally paged, sorted and projected)"""
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        SELECT ei.impact_id, m.material_name, ei.impact_category, 
-               ei.impact_value, ei.unit, ei.source
-        FROM environmental_impacts ei
-        JOIN materials m ON ei.material_id = m.material_id
-        ORDER BY m.material_name, ei.impact_category
-        ''')
-        
-        impacts = cursor.fetchall()
-        conn.close()
-        
-        return jsonify([dict(impact) for impact in impacts])
+        return listing_response(IMPACTS_LISTING, 'impacts')
+    except ListingError as e:
+        return jsonify({'error': True, 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'error': True, 'message': str(e)}), 500
 
@@ -2107,7 +2729,7 @@ def add_impact():
     try:
         data = request.get_json()
         
-        material_name = data.get('material_name', '').strip().lower()
+        material_name = str(data.get('material_name') or '').strip()
         impact_category = data.get('impact_category', '').strip()
         impact_value = data.get('impact_value')
         unit = data.get('unit', '').strip()
@@ -2116,15 +2738,12 @@ def add_impact():
         if not all([material_name, impact_category, impact_value is not None, unit]):
             return jsonify({'error': True, 'message': 'All fields except source are required'}), 400
         
-        # Get material ID
+        material_id = db.materials.resolve(material_name)
+        if material_id is None:
+            return jsonify({'error': True, 'message': f'Material "{material_name}" not found'}), 404
+        
         conn = db.get_connection()
         cursor = conn.cursor()
-        cursor.execute('SELECT material_id FROM materials WHERE material_name = ?', (material_name,))
-        material = cursor.fetchone()
-        
-        if not material:
-            conn.close()
-            return jsonify({'error': True, 'message': f'Material "{material_name}" not found'}), 404
         
         # Convert empty string to None for source
         source = source if source else None
@@ -2132,7 +2751,7 @@ def add_impact():
         cursor.execute('''
         INSERT INTO environmental_impacts (material_id, impact_category, impact_value, unit, source)
         VALUES (?, ?, ?, ?, ?)
-        ''', (material['material_id'], impact_category, impact_value, unit, source))
+        ''', (material_id, impact_category, impact_value, unit, source))
         
         impact_id = cursor.lastrowid
         conn.commit()
@@ -2149,7 +2768,7 @@ def update_impact(impact_id):
     try:
         data = request.get_json()
         
-        material_name = data.get('material_name', '').strip().lower()
+        material_name = str(data.get('material_name') or '').strip()
         impact_category = data.get('impact_category', '').strip()
         impact_value = data.get('impact_value')
         unit = data.get('unit', '').strip()
@@ -2158,15 +2777,12 @@ def update_impact(impact_id):
         if not all([material_name, impact_category, impact_value is not None, unit]):
             return jsonify({'error': True, 'message': 'All fields except source are required'}), 400
         
-        # Get material ID
+        material_id = db.materials.resolve(material_name)
+        if material_id is None:
+            return jsonify({'error': True, 'message': f'Material "{material_name}" not found'}), 404
+        
         conn = db.get_connection()
         cursor = conn.cursor()
-        cursor.execute('SELECT material_id FROM materials WHERE material_name = ?', (material_name,))
-        material = cursor.fetchone()
-        
-        if not material:
-            conn.close()
-            return jsonify({'error': True, 'message': f'Material "{material_name}" not found'}), 404
         
         # Convert empty string to None for source
         source = source if source else None
@@ -2175,7 +2791,7 @@ def update_impact(impact_id):
         UPDATE environmental_impacts 
         SET material_id=?, impact_category=?, impact_value=?, unit=?, source=?
         WHERE impact_id=?
-        ''', (material['material_id'], impact_category, impact_value, unit, source, impact_id))
+        ''', (material_id, impact_category, impact_value, unit, source, impact_id))
         
         conn.commit()
         conn.close()
@@ -2203,132 +2819,120 @@ def delete_impact(impact_id):
         return jsonify({'error': True, 'message': str(e)}), 500
 
 # Clothing items CRUD endpoints
+def write_catalog_items(items, mode):
+    """Write parsed items and their compositions in one transaction"""
+    conn = db.get_connection()
+    try:
+        return write_items(conn, items, db.materials, mode)
+    finally:
+        conn.close()
+
 @app.route('/api/items', methods=['POST'])
 def add_clothing_item():
+    """Add one clothing item with its material composition (atomically)"""
     try:
-        data = request.get_json()
-        print(f"Raw request data: {data}")  # Debug print
-        
-        # Check if data is None
+        data = request.get_json(silent=True)
         if data is None:
             return jsonify({'error': True, 'message': 'No JSON data received'}), 400
         
-        # Handle None values properly with extra safety
-        qr_code = str(data.get('qr_code') or '').strip()
-        name = str(data.get('name') or '').strip()
-        brand = str(data.get('brand') or '').strip()
-        category = str(data.get('category') or '').strip()
-        weight = data.get('weight')
-        materials = data.get('materials', [])
-        
-        print(f"Parsed data - QR: {qr_code}, Name: {name}, Weight: {weight}")  # Debug
-        print(f"Materials: {materials}")  # Debug
-        
-        if not qr_code or not name or not weight:
-            return jsonify({'error': True, 'message': 'QR code, name, and weight are required'}), 400
-        
-        # Convert empty strings to None
-        brand = brand if brand else None
-        category = category if category else None
-        
-        # Add clothing item
-        success = db.add_clothing_item(qr_code, name, int(weight), brand, category)
-        
-        if not success:
-            return jsonify({'error': True, 'message': 'QR code already exists'}), 400
+        write_catalog_items([parse_item(data)], 'insert')
+        return jsonify({'success': True})
         
-        # Add material composition with better error handling
-        if materials:
-            conn = db.get_connection()
-            cursor = conn.cursor()
-            
-            for i, material_data in enumerate(materials):
-                print(f"Processing material {i}: {material_data}")  # Debug
-                
-                if material_data is None:
-                    continue
-                    
-                material_name = str(material_data.get('material_name') or '').strip().lower()
-                percentage = material_data.get('percentage')
-                
-                print(f"Material name: {material_name}, Percentage: {percentage}")  # Debug
-                
-                if material_name and percentage and float(percentage) > 0:
-                    # Get material ID
-                    cursor.execute('SELECT material_id FROM materials WHERE material_name = ?', (material_name,))
-                    material = cursor.fetchone()
-                    
-                    if material:
-                        cursor.execute('''
-                        INSERT INTO clothing_material_composition (qr_code, material_id, percentage)
-                        VALUES (?, ?, ?)
-                        ''', (qr_code, material['material_id'], float(percentage)))
-                        print(f"Added material composition: {material_name} - {percentage}%")
-            
-            conn.commit()
-            conn.close()
+    except CatalogWriteError as e:
+        return jsonify({'error': True, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': True, 'message': str(e)}), 500
+
+@app.route('/api/items/bulk', methods=['POST'])
+def add_clothing_items_bulk():
+    """
+    Add many clothing items in one transaction: {"items": [<item>, ...]}
+    
+    Items use the POST /api/items shape. Either every item is written or,
+    on any invalid item, unknown material or existing QR code, none is.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        items = data.get('items')
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': True, 'message': 'items must be a non-empty list'}), 400
+        if len(items) > MAX_BULK_ITEMS:
+            return jsonify({'error': True, 'message': f'At most {MAX_BULK_ITEMS} items per request'}), 400
+        
+        parsed = []
+        for index, item in enumerate(items):
+            try:
+                parsed.append(parse_item(item))
+            except CatalogWriteError as e:
+                raise CatalogWriteError(f"items[{index}]: {e}")
         
-        return jsonify({'success': True})
+        written = write_catalog_items(parsed, 'insert')
+        return jsonify(dict(written, success=True)), 201
         
+    except CatalogWriteError as e:
+        return jsonify({'error': True, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': True, 'message': str(e)}), 500
+    
+@app.route('/api/items/import', methods=['POST'])
+def import_clothing_items():
+    """
+    Bulk upsert a CSV / NDJSON item feed (?format=csv|ndjson&dry_run=1&async=1)
+    
+    The feed is the request body or a multipart 'file' upload. Invalid rows are
+    skipped and listed in the per-row error report; valid rows are written in
+    batched transactions. With async=1 the feed is stored and imported by the
+    job queue; the response is the queued job (its result holds the report).
+    """
+    try:
+        upload = request.files.get('file')
+        feed_format = request.args.get('format')
+        if not feed_format:
+            if upload and upload.filename:
+                feed_format = 'csv' if upload.filename.lower().endswith('.csv') else 'ndjson'
+            else:
+                feed_format = IMPORT_MIMETYPES.get(request.mimetype, 'ndjson')
+        dry_run = request.args.get('dry_run', '0') not in ('0', 'false', '')
+        
+        if request.args.get('async', '0') not in ('0', 'false', ''):
+            if feed_format not in IMPORT_FORMATS:
+                raise ImportFeedError(f"format must be one of: {', '.join(IMPORT_FORMATS)}")
+            os.makedirs(job_queue.work_dir, exist_ok=True)
+            path = os.path.join(job_queue.work_dir, f"import_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.{feed_format}")
+            with open(path, 'wb') as feed:
+                if upload:
+                    upload.save(feed)
+                else:
+                    shutil.copyfileobj(request.stream, feed)
+            job = job_queue.enqueue('catalog_import', {'path': path, 'format': feed_format, 'dry_run': dry_run})
+            return jsonify({'success': True, 'job': job}), 202
+        
+        stream = io.TextIOWrapper(upload.stream if upload else request.stream, encoding='utf-8', newline='')
+        report = import_feed(db, stream, feed_format, dry_run=dry_run)
+        return jsonify(dict(report, success=True))
+        
+    except (ImportFeedError, CatalogWriteError) as e:
+        return jsonify({'error': True, 'message': str(e)}), 400
+    except UnicodeDecodeError:
+        return jsonify({'error': True, 'message': 'Feed must be UTF-8 text'}), 400
     except Exception as e:
-        import traceback
-        print(f"Full error traceback:")
-        print(traceback.format_exc())
         return jsonify({'error': True, 'message': str(e)}), 500
     
 @app.route('/api/items/<qr_code>', methods=['PUT'])
 def update_clothing_item(qr_code):
-    """Update an existing clothing item"""
+    """Update an existing clothing item and replace its material composition (atomically)"""
     try:
-        data = request.get_json()
-        
-        name = data.get('name', '').strip()
-        brand = data.get('brand', '').strip()
-        category = data.get('category', '').strip()
-        weight = data.get('weight')
-        materials = data.get('materials', [])
-        
-        if not all([name, weight]):
-            return jsonify({'error': True, 'message': 'Name and weight are required'}), 400
-        
-        # Convert empty strings to None
-        brand = brand if brand else None
-        category = category if category else None
-        
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        # Update item details
-        cursor.execute('''
-        UPDATE clothing_items 
-        SET item_name=?, brand=?, category=?, weight_grams=?
-        WHERE qr_code=?
-        ''', (name, brand, category, weight, qr_code))
-        
-        # Delete old material composition
-        cursor.execute('DELETE FROM clothing_material_composition WHERE qr_code=?', (qr_code,))
-        
-        # Add new material composition
-        for material_data in materials:
-            material_name = material_data.get('material_name', '').strip().lower()
-            percentage = material_data.get('percentage')
-            
-            if material_name and percentage and percentage > 0:
-                # Get material ID
-                cursor.execute('SELECT material_id FROM materials WHERE material_name = ?', (material_name,))
-                material = cursor.fetchone()
-                
-                if material:
-                    cursor.execute('''
-                    INSERT INTO clothing_material_composition (qr_code, material_id, percentage)
-                    VALUES (?, ?, ?)
-                    ''', (qr_code, material['material_id'], percentage))
-        
-        conn.commit()
-        conn.close()
+        data = request.get_json(silent=True)
+        if data is None:
+            return jsonify({'error': True, 'message': 'No JSON data received'}), 400
         
+        write_catalog_items([parse_item(data, qr_code=qr_code)], 'update')
         return jsonify({'success': True})
         
+    except UnknownItemError as e:
+        return jsonify({'error': True, 'message': str(e)}), 404
+    except CatalogWriteError as e:
+        return jsonify({'error': True, 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'error': True, 'message': str(e)}), 500
 
@@ -2365,53 +2969,186 @@ def database_management():
 
 # Additional utility endpoints for database stats
 @app.route('/api/stats/overview')
+@conditional_get(catalog_version_tag, PRIVATE_NO_CACHE)
 def get_database_overview():
-    """Get overview statistics for the database"""
+    """Get overview statistics for the database (?breakdown=category,brand,material)"""
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        # Get counts
-        cursor.execute('SELECT COUNT(*) as count FROM clothing_items')
-        items_count = cursor.fetchone()['count']
-        
-        cursor.execute('SELECT COUNT(*) as count FROM materials')
-        materials_count = cursor.fetchone()['count']
-        
-        cursor.execute('SELECT COUNT(*) as count FROM environmental_impacts')
-        impacts_count = cursor.fetchone()['count']
-        
-        # Get unique brands
-        cursor.execute('SELECT COUNT(DISTINCT brand) as count FROM clothing_items WHERE brand IS NOT NULL')
-        brands_count = cursor.fetchone()['count']
+        breakdowns = [name.strip() for name in request.args.get('breakdown', '').split(',') if name.strip()]
+        unknown = [name for name in breakdowns if name not in BREAKDOWNS]
+        if unknown:
+            return jsonify({'error': True, 'message': f'Unknown breakdown: {", ".join(unknown)}'}), 400
         
-        # Get unique categories
-        cursor.execute('SELECT COUNT(DISTINCT category) as count FROM clothing_items WHERE category IS NOT NULL')
-        categories_count = cursor.fetchone()['count']
-        
-        # Get unique impact categories
-        cursor.execute('SELECT COUNT(DISTINCT impact_category) as count FROM environmental_impacts')
-        impact_categories_count = cursor.fetchone()['count']
-        
-        # Get average weight
-        cursor.execute('SELECT AVG(weight_grams) as avg_weight FROM clothing_items')
-        avg_weight = cursor.fetchone()['avg_weight'] or 0
-        
-        conn.close()
+        # Served from memory until the catalog version changes
+        return jsonify(catalog_stats.overview(breakdowns))
         
+    except Exception as e:
+        return jsonify({'error': True, 'message': str(e)}), 500
+
+@app.route('/api/backups', methods=['GET'])
+def list_backups():
+    """Retained backups and the state of this worker's latest backup job"""
+    try:
         return jsonify({
-            'items_count': items_count,
-            'materials_count': materials_count,
-            'impacts_count': impacts_count,
-            'brands_count': brands_count,
-            'categories_count': categories_count,
-            'impact_categories_count': impact_categories_count,
-            'avg_weight': round(avg_weight, 1) if avg_weight else 0
+            'backups': [
+                {key: value for key, value in backup.items() if key != 'mtime'}
+                for backup in backup_manager.list_backups()
+            ],
+            'current_job': backup_manager.current_job(),
+            'keep': backup_manager.keep,
+            'interval_seconds': backup_manager.interval
         })
-        
     except Exception as e:
         return jsonify({'error': True, 'message': str(e)}), 500
 
+@app.route('/api/backups', methods=['POST'])
+def start_backup():
+    """Start an online backup in the background"""
+    try:
+        job = backup_manager.start_backup()
+        return jsonify({'success': True, 'job': job}), 202
+    except Exception as e:
+        return jsonify({'error': True, 'message': str(e)}), 500
+
+@app.route('/api/backups/<job_id>')
+def get_backup_status(job_id):
+    """Progress of a backup job started by this worker"""
+    job = backup_manager.get_job(job_id)
+    if not job:
+        return jsonify({'error': True, 'message': 'Backup job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/retention', methods=['GET'])
+def retention_status():
+    """Retention windows and the reports of this worker's recent retention runs"""
+    return jsonify({
+        'retention_days': retention_manager.retention_days,
+        'interval_seconds': retention_manager.interval,
+        'archive_dir': retention_manager.archive_dir,
+        'reports': retention_manager.reports()
+    })
+
+@app.route('/api/retention', methods=['POST'])
+def start_retention():
+    """Archive, delete and compact old event rows in the background ({"dry_run": true} only counts)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        if data.get('dry_run'):
+            return jsonify({'success': True, 'report': retention_manager.run(dry_run=True, trigger='manual')})
+        return jsonify({'success': True, 'report': retention_manager.start_run()}), 202
+    except RuntimeError as e:
+        return jsonify({'error': True, 'message': str(e)}), 409
+    except Exception as e:
+        return jsonify({'error': True, 'message': str(e)}), 500
+
+@app.route('/api/catalog_jobs', methods=['GET'])
+def list_catalog_jobs():
+    """Catalog jobs started by this worker, newest first"""
+    return jsonify({
+        'jobs': catalog_jobs.list_jobs(),
+        'kinds': list(JOB_KINDS),
+        'workers': catalog_jobs.workers,
+        'rescore_interval_seconds': catalog_jobs.interval
+    })
+
+@app.route('/api/catalog_jobs', methods=['POST'])
+def start_catalog_job():
+    """Start a catalog job across worker processes ({"kind": "rescore|ranges|export", "format", "scores", "workers"})"""
+    try:
+        data = request.get_json(silent=True) or {}
+        params = {key: data[key] for key in ('format', 'scores') if key in data}
+        job = catalog_jobs.start_job(data.get('kind'), params, data.get('workers'))
+        return jsonify({'success': True, 'job': job}), 202
+    except CatalogJobError as e:
+        return jsonify({'error': True, 'message': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': True, 'message': str(e)}), 409
+    except Exception as e:
+        return jsonify({'error': True, 'message': str(e)}), 500
+
+@app.route('/api/catalog_jobs/<job_id>')
+def get_catalog_job(job_id):
+    """Progress of a catalog job started by this worker"""
+    job = catalog_jobs.get_job(job_id)
+    if not job:
+        return jsonify({'error': True, 'message': 'Catalog job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/catalog_jobs/<job_id>/cancel', methods=['POST'])
+def cancel_catalog_job(job_id):
+    """Stop a running catalog job (pending shards are dropped, running ones stop early)"""
+    job = catalog_jobs.cancel(job_id)
+    if not job:
+        return jsonify({'error': True, 'message': 'Catalog job not found'}), 404
+    if job['status'] not in ('cancelling', 'cancelled'):
+        return jsonify({'error': True, 'message': f"Catalog job is {job['status']}"}), 409
+    return jsonify({'success': True, 'job': job}), 202
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """Queued, running and recent jobs (?status=&kind=&limit=)"""
+    try:
+        return jsonify({
+            'jobs': job_queue.list(request.args.get('status'), request.args.get('kind'),
+                                   request.args.get('limit', 50, type=int)),
+            'counts': job_queue.counts(),
+            'kinds': job_queue.kinds(),
+            'statuses': list(JOB_STATUSES)
+        })
+    except JobQueueError as e:
+        return jsonify({'error': True, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': True, 'message': str(e)}), 500
+
+@app.route('/api/jobs', methods=['POST'])
+def enqueue_job():
+    """Queue an admin job ({"kind", "params", "priority", "max_attempts", "delay"})"""
+    try:
+        data = request.get_json(silent=True) or {}
+        job = job_queue.enqueue(
+            data.get('kind'), data.get('params'), int(data.get('priority', 0)),
+            data.get('max_attempts'), float(data.get('delay', 0))
+        )
+        return jsonify({'success': True, 'job': job}), 202
+    except (JobQueueError, TypeError, ValueError) as e:
+        return jsonify({'error': True, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': True, 'message': str(e)}), 500
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """Status, progress and result of a queued job"""
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({'error': True, 'message': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued job, or ask a running one to stop"""
+    job = job_queue.cancel(job_id)
+    if not job:
+        return jsonify({'error': True, 'message': 'Job not found'}), 404
+    if job['status'] != 'cancelled' and not (job['status'] == 'running' and job['cancel_requested']):
+        return jsonify({'error': True, 'message': f"Job is {job['status']}"}), 409
+    return jsonify({'success': True, 'job': job}), 202
+
+@app.route('/api/export')
+def export_catalog():
+    """Stream the full catalog with computed impacts (?format=ndjson|csv&scores=0|1)"""
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': True, 'message': f'format must be one of: {", ".join(EXPORT_FORMATS)}'}), 400
+    
+    include_scores = request.args.get('scores', '1') != '0'
+    records = iter_catalog_records(db, scorer_factory=make_dual_scorer if include_scores else None)
+    
+    filename = f"catalog_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    return Response(
+        iter_export_lines(records, export_format),
+        mimetype=EXPORT_MIMETYPES[export_format],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 
 
 @app.route('/api/cart')
@@ -2458,7 +3195,7 @@ def receive_esp32_word():
 # Integration with Flask app
 def integrate_enhanced_scoring(app, db):
     """Add enhanced scoring endpoints to Flask app"""
-    scorer = EnhancedSustainabilityScorer(db)
+    scorer = EnhancedSustainabilityScorer(db, scoring_config_store.current())
     
     @app.route('/api/enhanced_analyze/<qr_code>')
     def enhanced_analyze_item(qr_code):
@@ -2523,7 +3260,7 @@ def debug_enhanced_scoring():
         
         # Test if the enhanced scoring class can be created
         try:
-            scorer = EnhancedSustainabilityScorer(db)
+            scorer = EnhancedSustainabilityScorer(db, scoring_config_store.current())
             debug_info['scorer_created'] = True
         except Exception as e:
             debug_info['scorer_error'] = str(e)
@@ -2627,6 +3364,7 @@ def internal_error(error):
 #esp32
 # Initialize ESP32 sender (update IP address to match your ESP32)
 esp32_sender = ESP32DataSender(esp32_ip="172.20.10.8", esp32_port=80)
+ESP32_AVAILABLE = os.environ.get('ESP32_ENABLED', '1') == '1'
 
 @app.route('/api/send_to_esp32', methods=['POST'])
 def send_cart_to_esp32():
@@ -2642,8 +3380,8 @@ def send_cart_to_esp32():
     try:
         # Calculate environmental impacts using your existing calculation method
         if ESP32_AVAILABLE:
-            # Use your existing calculation method
-            impact_data = esp32_sender.calculate_cart_environmental_impact(cart_items, db)
+            # Totals are maintained by the cart aggregate on add/remove
+            impact_data = get_cart_aggregate().impact_totals()
             
             # Instead of sending directly to ESP32, store it for polling
             update_esp32_data_store(impact_data)
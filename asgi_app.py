@@ -0,0 +1,318 @@
+# asgi_app.py - Optional ASGI entry point for the read-only scoring and catalog API
+"""
+Serves the read-only endpoints of app.py from an asyncio event loop. A slow
+client or a locked database then no longer ties up a whole sync worker. It
+runs side by side with the Flask app, on the same database and (optionally)
+the same catalog snapshot. Writes, sessions, carts and pages stay on Flask.
+
+    uvicorn asgi_app:app --workers 4 --port 8001
+    gunicorn -k uvicorn.workers.UvicornWorker -w 4 -b :8001 asgi_app:app
+
+Any ASGI server works; this module itself needs nothing beyond the standard
+library. All SQLite work goes through async_db.AsyncDB. It runs the existing
+CatalogCache / FashionEnvironmentDB methods and scorers in a bounded thread
+pool, so responses are built exactly as in app.py.
+
+Served (GET / HEAD):
+    /api/analyze/<qr_code>        /api/dual_analyze/<qr_code>
+    /api/alternatives/<qr_code>   /api/uncertainty/<qr_code>
+    /api/items  /api/materials  /api/impacts  (listings, with ETags)
+    /api/materials/<qr_code>      /api/suggestions/<query>
+    /api/asgi/status
+
+Environment:
+    ASGI_DB_THREADS   threads doing database work per process (default 8)
+    ASGI_DB_TIMEOUT   seconds before a database call is answered with 503 (default 5)
+    WARMUP_ENABLED / WARMUP_PRECOMPUTE_SCORES
+                      preload the catalog at startup, as gunicorn.conf.py does
+"""
+
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+import app as flask_app
+from async_db import AsyncDB, DatabaseBusyError
+from http_cache import NO_CACHE, PRIVATE_NO_CACHE, make_etag
+from impact_uncertainty import DEFAULT_CONFIDENCE, DEFAULT_DRAWS, UncertaintyError
+from listing import ListingError
+from recommender import DEFAULT_ALTERNATIVES, RecommenderError
+
+
+adb = AsyncDB(
+    flask_app.catalog_cache,
+    max_workers=int(os.environ.get('ASGI_DB_THREADS', '8')),
+    timeout=float(os.environ.get('ASGI_DB_TIMEOUT', '5'))
+)
+
+
+# ============================================================================
+# REQUEST / RESPONSE
+# ============================================================================
+
+class QueryArgs(dict):
+    """Query string (first value per key) with Flask's args.get(key, default, type)"""
+
+    def __init__(self, query_string: str):
+        super().__init__()
+        for key, value in parse_qsl(query_string, keep_blank_values=True):
+            self.setdefault(key, value)
+
+    def get(self, key, default=None, type=None):
+        if key not in self:
+            return default
+        if type is None:
+            return self[key]
+        try:
+            return type(self[key])
+        except (TypeError, ValueError):
+            return default
+
+
+class Request:
+    def __init__(self, scope: Dict):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.query_string = scope.get('query_string', b'').decode('latin-1')
+        self.args = QueryArgs(self.query_string)
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                        for name, value in scope.get('headers', [])}
+
+    @property
+    def full_path(self) -> str:
+        """Same form as Flask's request.full_path, so both servers issue the same ETags"""
+        return f"{self.path}?{self.query_string}"
+
+
+class Response:
+    def __init__(self, payload=None, status: int = 200, headers: Optional[Dict[str, str]] = None):
+        self.payload = payload
+        self.status = status
+        self.headers = headers or {}
+
+    def body(self) -> bytes:
+        if self.status == 304:
+            return b''
+        return json.dumps(self.payload, default=str).encode('utf-8')
+
+
+def error_response(message: str, status: int) -> Response:
+    return Response({'error': True, 'message': message}, status)
+
+
+async def conditional(request: Request, cache_control: str, build) -> Response:
+    """ETag / If-None-Match on the catalog version (as http_cache.conditional_get)"""
+    version = await adb.run(flask_app.catalog_version_tag)
+    if version is None:
+        return await build()
+
+    etag = make_etag(version, request.full_path)
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': cache_control}
+    tags = {tag.strip().strip('"').removeprefix('W/"') for tag in request.headers.get('if-none-match', '').split(',')}
+    if etag in tags or '*' in tags:
+        return Response(None, 304, headers)
+
+    response = await build()
+    if response.status == 200:
+        response.headers.update(headers)
+    return response
+
+
+# ============================================================================
+# HANDLERS
+# ============================================================================
+
+def current_scorer():
+    """Active dual scorer, after picking up a newly activated scoring config"""
+    flask_app.refresh_scoring_config()
+    return flask_app.current_dual_scorer()
+
+
+async def analyze(request: Request, qr_code: str) -> Response:
+    item = await adb.get_clothing_item(qr_code)
+    if not item:
+        items = await adb.list_all_clothing_items()
+        return Response({
+            'error': True,
+            'message': f'No item found with QR code: {qr_code}',
+            'available_items': [dict(item) for item in items]
+        })
+
+    materials = await adb.get_material_composition(qr_code)
+    results = await adb.run(flask_app.analyze_item_impacts, item, materials)
+    flask_app.scan_logger.log('analyze', qr_code, {
+        category: round(impact['value'], 4) for category, impact in results['impacts'].items()
+    })
+    return Response(results)
+
+
+async def dual_analyze(request: Request, qr_code: str) -> Response:
+    scorer = await adb.run(current_scorer)
+    result = await adb.run(scorer.get_dual_sustainability_score, qr_code)
+    if not result:
+        return Response({'error': 'Item not found'}, 404)
+    if 'error' not in result:
+        flask_app.scan_logger.log('dual_analyze', qr_code, {
+            'initial_cost': result['initial_cost']['score'],
+            'lasting_cost': result['lasting_cost']['score'],
+            'final_score': result['final_sustainability_score']['score']
+        })
+    return Response(result)
+
+
+async def alternatives(request: Request, qr_code: str) -> Response:
+    await adb.run(current_scorer)
+    result = await adb.run(
+        flask_app.alternatives_index.alternatives,
+        qr_code,
+        k=request.args.get('k', DEFAULT_ALTERNATIVES, type=int),
+        rank=request.args.get('rank', 'score'),
+        min_improvement=request.args.get('min_improvement', 0.0, type=float)
+    )
+    if result is None:
+        return error_response(f'No scored item with QR code: {qr_code}', 404)
+    return Response(result)
+
+
+async def uncertainty(request: Request, qr_code: str) -> Response:
+    await adb.run(current_scorer)
+    result = await adb.run(
+        flask_app.uncertainty_engine.item_uncertainty,
+        qr_code,
+        request.args.get('draws', DEFAULT_DRAWS, type=int),
+        request.args.get('confidence', DEFAULT_CONFIDENCE, type=float),
+        request.args.get('seed', type=int),
+        request.args.get('cache', '1') != '0'
+    )
+    if result is None:
+        return error_response(f'No item found with QR code: {qr_code}', 404)
+    return Response(result)
+
+
+def listing_handler(listing, collection: str):
+    async def handler(request: Request) -> Response:
+        async def build():
+            return Response(await adb.run(flask_app.listing_payload, listing, collection, request.args))
+        return await conditional(request, PRIVATE_NO_CACHE, build)
+    return handler
+
+
+async def item_materials(request: Request, qr_code: str) -> Response:
+    async def build():
+        materials = await adb.get_material_composition(qr_code)
+        return Response([dict(material) for material in materials])
+    return await conditional(request, NO_CACHE, build)
+
+
+async def suggestions(request: Request, query: str) -> Response:
+    items = await adb.list_all_clothing_items()
+    query_lower = query.lower()
+    matches = [
+        {'qr_code': item['qr_code'], 'item_name': item['item_name']}
+        for item in items
+        if query_lower in item['qr_code'].lower() or query_lower in item['item_name'].lower()
+    ]
+    return Response({'suggestions': matches[:5]})
+
+
+async def status(request: Request) -> Response:
+    return Response({
+        'pid': os.getpid(),
+        'catalog_version': flask_app.catalog_cache.version,
+        'db_threads': adb.max_workers,
+        'db_timeout': adb.timeout,
+        'db': adb.stats,
+        'scan_log': flask_app.scan_logger.stats()
+    })
+
+
+ROUTES: List[Tuple[re.Pattern, object]] = [
+    (re.compile(pattern), handler) for pattern, handler in [
+        (r'^/api/analyze/([^/]+)$', analyze),
+        (r'^/api/dual_analyze/([^/]+)$', dual_analyze),
+        (r'^/api/alternatives/([^/]+)$', alternatives),
+        (r'^/api/uncertainty/([^/]+)$', uncertainty),
+        (r'^/api/items$', listing_handler(flask_app.ITEMS_LISTING, 'items')),
+        (r'^/api/materials$', listing_handler(flask_app.MATERIALS_LISTING, 'materials')),
+        (r'^/api/impacts$', listing_handler(flask_app.IMPACTS_LISTING, 'impacts')),
+        (r'^/api/materials/([^/]+)$', item_materials),
+        (r'^/api/suggestions/([^/]+)$', suggestions),
+        (r'^/api/asgi/status$', status)
+    ]
+]
+
+
+async def dispatch(request: Request) -> Response:
+    for pattern, handler in ROUTES:
+        match = pattern.match(request.path)
+        if not match:
+            continue
+        if request.method not in ('GET', 'HEAD'):
+            return error_response('Method not allowed (the ASGI server is read-only)', 405)
+        try:
+            # scope['path'] is already percent-decoded by the server
+            return await handler(request, *match.groups())
+        except (ListingError, RecommenderError, UncertaintyError) as e:
+            return error_response(str(e), 400)
+        except DatabaseBusyError as e:
+            return Response({'error': True, 'message': str(e)}, 503, {'Retry-After': '1'})
+        except Exception as e:
+            return error_response(str(e), 500)
+    return error_response(f'Not found: {request.path}', 404)
+
+
+# ============================================================================
+# ASGI APPLICATION
+# ============================================================================
+
+def start_worker() -> None:
+    """Per-process setup: catalog warm-up, snapshot poller and scan log writer (as in the Flask workers)"""
+    if os.environ.get('WARMUP_ENABLED', '1') == '1':
+        from warmup import warm_up
+        try:
+            report = warm_up(precompute_scores=os.environ.get('WARMUP_PRECOMPUTE_SCORES', '1') == '1')
+            print(f"ASGI worker {os.getpid()} warmed up: {report}")
+        except Exception as e:
+            print(f"ASGI worker {os.getpid()} warm-up failed, continuing cold: {e}")
+    if flask_app.snapshot_publisher:
+        flask_app.snapshot_publisher.ensure_poller()
+    flask_app.scan_logger.ensure_writer()
+
+
+async def lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await adb.run(start_worker)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await adb.run(flask_app.scan_logger.flush)
+            adb.shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    # No-ops after the first call in this process (servers without lifespan support)
+    if flask_app.snapshot_publisher:
+        flask_app.snapshot_publisher.ensure_poller()
+    flask_app.scan_logger.ensure_writer()
+
+    request = Request(scope)
+    response = await dispatch(request)
+    body = response.body()
+    headers = [(b'content-type', b'application/json')]
+    headers += [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response.headers.items()]
+    if response.status != 304:
+        headers.append((b'content-length', str(len(body)).encode('latin-1')))
+
+    await send({'type': 'http.response.start', 'status': response.status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': b'' if request.method == 'HEAD' else body})
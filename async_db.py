@@ -0,0 +1,70 @@
+# async_db.py - Awaitable access to the (synchronous) catalog and database layer
+"""
+The ASGI entry point (asgi_app.py) keeps its event loop free by running every
+SQLite-touching call in a bounded thread pool. Nothing is reimplemented: the
+wrapped object is the same FashionEnvironmentDB / CatalogCache the Flask app
+uses, so the query definitions stay in one place.
+
+    adb = AsyncDB(catalog_cache, max_workers=8, timeout=5.0)
+    item = await adb.get_clothing_item(qr_code)       # any method of the wrapped object
+    score = await adb.run(scorer.get_dual_sustainability_score, qr_code)
+
+The pool size bounds concurrent database work per process. A call that does
+not finish within `timeout` (e.g. a writer holds the database lock) raises
+DatabaseBusyError instead of parking the request; the thread finishes in the
+background.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+
+class DatabaseBusyError(Exception):
+    """A database call did not finish within the timeout (reported as HTTP 503)"""
+
+
+class AsyncDB:
+    """
+    Thread-offloaded, awaitable view of a synchronous db-like object.
+
+    Args:
+        db: Object whose methods are exposed as coroutines (FashionEnvironmentDB, CatalogCache)
+        max_workers: Threads doing database work at the same time
+        timeout: Longest wait (s) for one call; None waits indefinitely
+    """
+
+    def __init__(self, db, max_workers: int = 8, timeout: Optional[float] = 5.0):
+        self.db = db
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='async-db')
+        self.stats = {'calls': 0, 'timeouts': 0, 'in_flight': 0}
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """Run a blocking callable in the pool and await its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+        self.stats['calls'] += 1
+        self.stats['in_flight'] += 1
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            raise DatabaseBusyError(f"Database call {getattr(func, '__name__', func)} timed out after {self.timeout}s")
+        finally:
+            self.stats['in_flight'] -= 1
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.db, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+        call.__name__ = name
+        return call
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
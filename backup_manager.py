@@ -0,0 +1,362 @@
+# backup_manager.py - Online database backups through the SQLite backup API
+"""
+Consistent backups of the live database without stopping the app.
+
+The copy is made with sqlite3.Connection.backup in small page steps. The
+source is only read-locked during a step, and the copier sleeps between steps,
+so kiosk requests keep writing while a backup runs. If the database changes
+mid-backup SQLite restarts the copy, which guarantees an untorn snapshot. On
+a busy database (the scan log commits every second) a stepped copy that takes
+longer than the gap between commits would restart forever, so after
+MAX_BACKUP_RESTARTS restarts the copy is finished in one step, holding a read
+lock for its duration.
+
+Finished copies are integrity-checked, gzip-compressed and rotated so that only
+the newest `keep` backups stay in the backup directory.
+
+Backups run in a background thread (BackupManager.start_backup) and can be
+scheduled at a fixed interval; with several gunicorn workers a lock file makes
+sure only one of them runs a scheduled backup.
+
+Usage:
+    python backup_manager.py                 # one backup with default settings
+    python backup_manager.py --list          # list retained backups
+"""
+
+import argparse
+import gzip
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows - no cross-process locking
+    fcntl = None
+
+
+BACKUP_PREFIX = 'fashion_env_'
+PAGES_PER_STEP = 256
+STEP_SLEEP_SECONDS = 0.05
+MAX_BACKUP_RESTARTS = 3
+JOB_HISTORY = 20
+
+
+class _TooManyRestarts(Exception):
+    """Aborts a stepped backup that keeps restarting"""
+
+
+def backup_to_file(source_path: str, dest_path: str, compress: bool = True,
+                   pages_per_step: int = PAGES_PER_STEP, step_sleep: float = STEP_SLEEP_SECONDS,
+                   progress: Optional[Callable[[int, int], None]] = None,
+                   max_restarts: int = MAX_BACKUP_RESTARTS, stats: Optional[Dict] = None) -> int:
+    """
+    Copy a live SQLite database to dest_path (gzip-compressed if compress).
+
+    Args:
+        pages_per_step: Pages copied per backup step
+        step_sleep: Pause between steps, leaving the database to other writers
+        progress: Called with (pages_remaining, pages_total) after every step
+        max_restarts: Copy restarts (caused by concurrent commits) tolerated
+            before the rest is copied in one step
+        stats: Filled with 'restarts' and 'single_step' (whether the fallback ran)
+
+    Returns:
+        Size of the written file in bytes
+    """
+    tmp_db_path = f"{dest_path}.{os.getpid()}.tmp"
+    stats = stats if stats is not None else {}
+    stats.update(restarts=0, single_step=False)
+    last_remaining = [None]
+
+    def on_step(status, remaining, total):
+        # A commit by another connection restarts the copy from the first page
+        if last_remaining[0] is not None and remaining > last_remaining[0]:
+            stats['restarts'] += 1
+            if stats['restarts'] > max_restarts:
+                raise _TooManyRestarts()
+        last_remaining[0] = remaining
+        if progress:
+            progress(remaining, total)
+        if remaining:
+            time.sleep(step_sleep)
+
+    try:
+        source = sqlite3.connect(source_path, timeout=30)
+        target = sqlite3.connect(tmp_db_path)
+        try:
+            try:
+                source.backup(target, pages=pages_per_step, progress=on_step)
+            except _TooManyRestarts:
+                stats['single_step'] = True
+                source.backup(target, pages=-1)
+                if progress:
+                    progress(0, 1)
+            result = target.execute('PRAGMA quick_check').fetchone()[0]
+            if result != 'ok':
+                raise sqlite3.DatabaseError(f"Backup failed integrity check: {result}")
+        finally:
+            target.close()
+            source.close()
+
+        if compress:
+            tmp_path = f"{dest_path}.{os.getpid()}.part"
+            with open(tmp_db_path, 'rb') as f_in, gzip.open(tmp_path, 'wb', compresslevel=6) as f_out:
+                shutil.copyfileobj(f_in, f_out)
+            os.replace(tmp_path, dest_path)
+        else:
+            os.replace(tmp_db_path, dest_path)
+    finally:
+        if os.path.exists(tmp_db_path):
+            os.remove(tmp_db_path)
+
+    return os.path.getsize(dest_path)
+
+
+class BackupManager:
+    """
+    Runs backups of one database in the background and keeps a rotated set.
+
+    Args:
+        db_path: Database to back up
+        backup_dir: Directory for the backup files
+        keep: Number of backups to retain
+        interval: Seconds between scheduled backups (None or 0 disables the schedule)
+        compress: gzip the backups
+    """
+
+    def __init__(self, db_path: str, backup_dir: str = 'backups', keep: int = 24,
+                 interval: Optional[float] = None, compress: bool = True,
+                 pages_per_step: int = PAGES_PER_STEP, step_sleep: float = STEP_SLEEP_SECONDS):
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.interval = interval
+        self.compress = compress
+        self.pages_per_step = pages_per_step
+        self.step_sleep = step_sleep
+
+        self._jobs = {}
+        self._current = None
+        self._lock = threading.Lock()
+        self._scheduler_pid = None
+
+    # ------------------------------------------------------------------
+    # Jobs
+    # ------------------------------------------------------------------
+
+    def start_backup(self, trigger: str = 'manual') -> Dict:
+        """Start a backup thread; returns the running job if one is already in progress"""
+        with self._lock:
+            if self._current and self._jobs[self._current]['status'] == 'running':
+                return dict(self._jobs[self._current])
+            job = self._new_job(trigger)
+
+        thread = threading.Thread(target=self.run_backup, args=(job['job_id'],), name='db-backup', daemon=True)
+        thread.start()
+        return dict(job)
+
+    def _new_job(self, trigger: str) -> Dict:
+        job = {
+            'job_id': uuid.uuid4().hex[:12],
+            'trigger': trigger,
+            'status': 'running',
+            'started_at': datetime.now().isoformat(),
+            'finished_at': None,
+            'pages_total': None,
+            'pages_remaining': None,
+            'progress': 0.0,
+            'path': None,
+            'size_bytes': None,
+            'restarts': None,
+            'single_step': None,
+            'error': None
+        }
+        self._jobs[job['job_id']] = job
+        self._current = job['job_id']
+
+        # Bounded history
+        for job_id in list(self._jobs)[:-JOB_HISTORY]:
+            del self._jobs[job_id]
+        return job
+
+    def run_backup(self, job_id: Optional[str] = None) -> Dict:
+        """
+        Run one backup in the calling thread and rotate old ones. Waits for a
+        backup running in another worker or process (the same lock file the
+        schedule takes), so concurrent backups never share a file.
+        """
+        if job_id is None:
+            with self._lock:
+                job_id = self._new_job('direct')['job_id']
+        job = self._jobs[job_id]
+
+        lock_file = self._lock_file(blocking=True)
+        try:
+            return self._backup(job)
+        finally:
+            lock_file.close()
+
+    def _backup(self, job: Dict) -> Dict:
+        """Copy, verify and rotate for one job; the caller holds the backup lock file"""
+        def on_progress(remaining, total):
+            job['pages_total'] = total
+            job['pages_remaining'] = remaining
+            job['progress'] = round(1 - remaining / total, 4) if total else 1.0
+
+        extension = '.db.gz' if self.compress else '.db'
+        # Microseconds keep two backups started within one second apart
+        filename = f"{BACKUP_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}{extension}"
+        path = os.path.join(self.backup_dir, filename)
+
+        try:
+            job['size_bytes'] = backup_to_file(
+                self.db_path, path, compress=self.compress,
+                pages_per_step=self.pages_per_step, step_sleep=self.step_sleep,
+                progress=on_progress, stats=job
+            )
+            job['path'] = path
+            job['progress'] = 1.0
+            job['status'] = 'completed'
+            self.rotate()
+        except Exception as e:
+            job['status'] = 'failed'
+            job['error'] = str(e)
+            print(f"Database backup failed: {e}")
+        finally:
+            job['finished_at'] = datetime.now().isoformat()
+
+        return dict(job)
+
+    def _lock_file(self, blocking: bool):
+        """
+        Open and flock the backup lock file. Returns None when blocking is
+        False and another worker holds it.
+        """
+        os.makedirs(self.backup_dir, exist_ok=True)
+        lock_file = open(os.path.join(self.backup_dir, '.backup.lock'), 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except OSError:
+                lock_file.close()
+                return None
+        return lock_file
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    def current_job(self) -> Optional[Dict]:
+        return self.get_job(self._current) if self._current else None
+
+    # ------------------------------------------------------------------
+    # Retention
+    # ------------------------------------------------------------------
+
+    def list_backups(self) -> List[Dict]:
+        """Retained backups, newest first"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        backups = []
+        for filename in os.listdir(self.backup_dir):
+            if not filename.startswith(BACKUP_PREFIX) or not filename.endswith(('.db', '.db.gz')):
+                continue
+            path = os.path.join(self.backup_dir, filename)
+            stat = os.stat(path)
+            backups.append({
+                'filename': filename,
+                'path': path,
+                'size_bytes': stat.st_size,
+                'created_at': datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                'mtime': stat.st_mtime
+            })
+        return sorted(backups, key=lambda backup: backup['mtime'], reverse=True)
+
+    def rotate(self) -> List[str]:
+        """Delete all but the newest `keep` backups; returns the removed filenames"""
+        removed = []
+        for backup in self.list_backups()[self.keep:]:
+            try:
+                os.remove(backup['path'])
+                removed.append(backup['filename'])
+            except OSError:
+                pass
+        return removed
+
+    # ------------------------------------------------------------------
+    # Schedule
+    # ------------------------------------------------------------------
+
+    def ensure_scheduler(self) -> None:
+        """Start the schedule thread in this process (once per pid, so it survives forks)"""
+        if not self.interval or self._scheduler_pid == os.getpid():
+            return
+        self._scheduler_pid = os.getpid()
+        thread = threading.Thread(target=self._schedule_loop, name='db-backup-scheduler', daemon=True)
+        thread.start()
+
+    def is_due(self) -> bool:
+        backups = self.list_backups()
+        return not backups or time.time() - backups[0]['mtime'] >= self.interval
+
+    def _schedule_loop(self) -> None:
+        # Check often enough that a missed slot is caught up quickly
+        check_interval = min(60.0, self.interval)
+        while True:
+            time.sleep(check_interval)
+            try:
+                self._run_scheduled()
+            except Exception as e:
+                print(f"Backup scheduler error: {e}")
+
+    def _run_scheduled(self) -> None:
+        if not self.is_due():
+            return
+        lock_file = self._lock_file(blocking=False)
+        if lock_file is None:
+            # Another worker is backing up
+            return
+        try:
+            # Re-check under the lock: another worker may have just finished
+            if not self.is_due():
+                return
+            with self._lock:
+                current = self.current_job()
+                if current and current['status'] == 'running':
+                    return
+                job = self._new_job('scheduled')
+            self._backup(job)
+        finally:
+            lock_file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Back up the database with the SQLite online backup API')
+    parser.add_argument('--db', default='fashion_env.db', help='Database file')
+    parser.add_argument('--dir', default='backups', help='Backup directory')
+    parser.add_argument('--keep', type=int, default=24, help='Number of backups to retain')
+    parser.add_argument('--no-compress', action='store_true', help='Write plain .db files')
+    parser.add_argument('--list', action='store_true', help='List retained backups and exit')
+    args = parser.parse_args()
+
+    manager = BackupManager(args.db, args.dir, keep=args.keep, compress=not args.no_compress)
+    if args.list:
+        for backup in manager.list_backups():
+            print(f"{backup['created_at']}  {backup['size_bytes']:>10}  {backup['filename']}")
+        return
+
+    job = manager.run_backup()
+    if job['status'] == 'completed':
+        print(f"Backup written to {job['path']} ({job['size_bytes']} bytes)")
+    else:
+        print(f"Backup failed: {job['error']}")
+
+
+if __name__ == "__main__":
+    main()
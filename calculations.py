@@ -8,6 +8,8 @@ import math
 from typing import Dict, List, Tuple, Optional
 from dataclasses import dataclass
 
+from grading import score_to_grade
+
 
 # ============================================================================
 # CONFIGURATION CLASSES
@@ -237,22 +239,6 @@ def calculate_tube_scale(water_liters: float) -> float:
     return round(tube_volume, 2)
 
 
-def score_to_grade(score: float) -> str:
-    """Convert numeric score to letter grade"""
-    if score >= 90: return 'A+'
-    elif score >= 85: return 'A'
-    elif score >= 80: return 'A-'
-    elif score >= 75: return 'B+'
-    elif score >= 70: return 'B'
-    elif score >= 65: return 'B-'
-    elif score >= 60: return 'C+'
-    elif score >= 55: return 'C'
-    elif score >= 50: return 'C-'
-    elif score >= 45: return 'D+'
-    elif score >= 40: return 'D'
-    else: return 'F'
-
-
 # ============================================================================
 # DUAL SUSTAINABILITY SCORER
 # ============================================================================
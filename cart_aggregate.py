@@ -0,0 +1,152 @@
+# cart_aggregate.py - Running cart totals maintained on add/remove
+"""
+Keeps per-item impact vectors and running sums for a cart so that the cart
+summary endpoints read totals instead of rescoring every item on every poll.
+
+The aggregate is stored in the session next to cart_items. Entries are built
+once when an item is added (from the catalog cache) and the totals are updated
+in O(1) on add and remove. The aggregate records the catalog version it was
+built against; callers rebuild it when the catalog has changed since.
+"""
+
+from typing import Dict, List, Optional
+
+
+IMPACT_CATEGORIES = ['water_usage', 'carbon_footprint', 'energy_usage']
+
+
+def _empty_totals() -> Dict:
+    return {
+        'basic_count': 0,
+        'basic_sum': 0.0,
+        'dual_count': 0,
+        'dual_weight': 0,
+        'initial_weighted': 0.0,
+        'lasting_weighted': 0.0,
+        'impacts': {category: 0.0 for category in IMPACT_CATEGORIES}
+    }
+
+
+class CartAggregate:
+    """
+    Per-item vectors plus running sums for one cart.
+
+    Entry format (built by the caller):
+        {
+            'qr_code': str, 'name': str, 'weight_grams': int,
+            'basic_score': float or None,     # None if the item is unknown
+            'initial_cost': float or None,    # None if the dual score failed
+            'lasting_cost': float or None,
+            'impacts': {category: float} or None   # None without a composition
+        }
+    """
+
+    def __init__(self, catalog_version=None):
+        self.catalog_version = catalog_version
+        self.entries = {}
+        self.totals = _empty_totals()
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+
+    def add(self, entry: Dict) -> None:
+        qr_code = entry['qr_code']
+        if qr_code in self.entries:
+            self.remove(qr_code)
+        self.entries[qr_code] = entry
+        self._apply(entry, 1)
+
+    def remove(self, qr_code: str) -> Optional[Dict]:
+        entry = self.entries.pop(qr_code, None)
+        if entry is None:
+            return None
+        if self.entries:
+            self._apply(entry, -1)
+        else:
+            # Start from exact zeros again instead of accumulating float drift
+            self.totals = _empty_totals()
+        return entry
+
+    def _apply(self, entry: Dict, sign: int) -> None:
+        totals = self.totals
+        if entry['basic_score'] is not None:
+            totals['basic_count'] += sign
+            totals['basic_sum'] += sign * entry['basic_score']
+
+        if entry['initial_cost'] is not None:
+            weight = entry['weight_grams']
+            totals['dual_count'] += sign
+            totals['dual_weight'] += sign * weight
+            totals['initial_weighted'] += sign * entry['initial_cost'] * weight
+            totals['lasting_weighted'] += sign * entry['lasting_cost'] * weight
+
+        if entry['impacts'] is not None:
+            for category in IMPACT_CATEGORIES:
+                totals['impacts'][category] += sign * entry['impacts'][category]
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def basic_summary(self) -> Dict:
+        """Same shape as the basic cart score: average score plus per-item scores"""
+        item_scores = [
+            {'name': entry['name'], 'score': entry['basic_score']}
+            for entry in self.entries.values()
+            if entry['basic_score'] is not None
+        ]
+        count = self.totals['basic_count']
+        return {
+            'sustainability_score': round(self.totals['basic_sum'] / count, 1) if count else None,
+            'item_scores': item_scores
+        }
+
+    def dual_averages(self) -> Dict:
+        """Weight-adjusted Initial/Lasting Cost averages over the scored items"""
+        weight = self.totals['dual_weight']
+        return {
+            'scored_items': [qr_code for qr_code, entry in self.entries.items() if entry['initial_cost'] is not None],
+            'total_weight': weight,
+            'avg_initial_cost': self.totals['initial_weighted'] / weight if weight > 0 else 0,
+            'avg_lasting_cost': self.totals['lasting_weighted'] / weight if weight > 0 else 0
+        }
+
+    def impact_totals(self) -> Dict:
+        """Raw impact totals in the format expected by the ESP32 data store"""
+        items = [
+            dict({'name': entry['name']}, **{category: round(entry['impacts'][category], 2)
+                                             for category in IMPACT_CATEGORIES})
+            for entry in self.entries.values()
+            if entry['impacts'] is not None
+        ]
+        totals = {category: round(self.totals['impacts'][category], 2) for category in IMPACT_CATEGORIES}
+        totals['item_count'] = len(self.entries)
+        totals['items'] = items
+        return totals
+
+    # ------------------------------------------------------------------
+    # Session storage
+    # ------------------------------------------------------------------
+
+    def to_dict(self) -> Dict:
+        return {
+            'catalog_version': self.catalog_version,
+            'entries': list(self.entries.values()),
+            'totals': self.totals
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'CartAggregate':
+        aggregate = cls(data.get('catalog_version'))
+        aggregate.entries = {entry['qr_code']: entry for entry in data.get('entries', [])}
+        aggregate.totals = data.get('totals') or _empty_totals()
+        return aggregate
+
+    @classmethod
+    def build(cls, cart_items: List[Dict], make_entry, catalog_version=None) -> 'CartAggregate':
+        """Full rebuild from cart items (used for old sessions and after catalog changes)"""
+        aggregate = cls(catalog_version)
+        for cart_item in cart_items:
+            aggregate.add(make_entry(cart_item))
+        return aggregate
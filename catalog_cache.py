@@ -0,0 +1,425 @@
+# catalog_cache.py - In-process cache of the clothing catalog
+"""
+Read-through cache for clothing items, material compositions and environmental
+impacts, plus memoized per-item scores.
+
+CatalogCache exposes the same read methods as FashionEnvironmentDB
+(get_clothing_item, get_material_composition, get_environmental_impact, ...),
+so the scorers can be handed the cache instead of the database object.
+
+To stay consistent with writes made by other workers (or by the desktop app and
+import scripts) the database keeps a catalog version counter in the catalog_meta
+table, bumped by triggers on every catalog table. The cache re-reads that
+counter at most once per revalidate_interval and drops its contents when it
+changes.
+
+By default every worker keeps its own copy. With attach_snapshot() the cache
+instead serves reads from a shared memory-mapped snapshot (catalog_snapshot.py)
+and follows the version in the snapshot header, without querying SQLite.
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+CATALOG_TABLES = [
+    'clothing_items',
+    'clothing_material_composition',
+    'materials',
+    'environmental_impacts'
+]
+
+# SQLite's default limit on host parameters in one statement
+SQLITE_MAX_PARAMS = 999
+
+
+# ============================================================================
+# CATALOG VERSION COUNTER
+# ============================================================================
+
+def ensure_catalog_version_schema(conn) -> None:
+    """Create the catalog_meta table and the triggers that bump its version"""
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS catalog_meta (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO catalog_meta (key, value) VALUES ('catalog_version', 1)")
+
+    for table in CATALOG_TABLES:
+        for operation in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_{operation.lower()}_version
+            AFTER {operation} ON {table}
+            BEGIN
+                UPDATE catalog_meta SET value = value + 1 WHERE key = 'catalog_version';
+            END
+            ''')
+    conn.commit()
+
+
+def read_catalog_version(conn) -> int:
+    """Return the current catalog version (0 if the counter does not exist yet)"""
+    try:
+        row = conn.execute("SELECT value FROM catalog_meta WHERE key = 'catalog_version'").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] if row else 0
+
+
+# ============================================================================
+# CATALOG CACHE
+# ============================================================================
+
+def fetch_impact_table(cursor) -> Dict:
+    """Map (material_name, impact_category) to the first matching impact row"""
+    cursor.execute('''
+    SELECT m.material_name, ei.impact_category, ei.impact_value, ei.unit
+    FROM environmental_impacts ei
+    JOIN materials m ON ei.material_id = m.material_id
+    ORDER BY ei.impact_id
+    ''')
+    impacts = {}
+    for row in cursor:
+        impacts.setdefault((row['material_name'], row['impact_category']), {
+            'impact_value': row['impact_value'],
+            'unit': row['unit']
+        })
+    return impacts
+
+
+class CatalogCache:
+    """
+    Process-local cache of the catalog tables and of computed item scores.
+    Safe to share between threads of one worker.
+    """
+
+    def __init__(self, db_connection, revalidate_interval: float = 1.0):
+        self.db = db_connection
+        self.revalidate_interval = revalidate_interval
+        self.version = None
+        self.loaded_at = None
+
+        self._lock = threading.RLock()
+        self._schema_ready = False
+        self._last_check = 0.0
+        self._fully_loaded = False
+        self._items = {}
+        self._compositions = {}
+        self._impacts = None
+        self._scores = {}
+        self.snapshot_reader = None
+
+    def get_connection(self):
+        """Pass-through so code that needs raw SQL can still use the cache as db"""
+        return self.db.get_connection()
+
+    # ------------------------------------------------------------------
+    # Versioning
+    # ------------------------------------------------------------------
+
+    def attach_snapshot(self, reader) -> None:
+        """Serve reads from a catalog_snapshot.SnapshotReader instead of private copies"""
+        with self._lock:
+            self.snapshot_reader = reader
+            self._clear()
+            self.version = None
+            self._last_check = 0.0
+
+    def _snapshot(self):
+        """The mapped snapshot, if snapshot mode is on and a snapshot exists"""
+        if self.snapshot_reader is None:
+            return None
+        return self.snapshot_reader.snapshot
+
+    def revalidate(self, force: bool = False) -> None:
+        """Drop cached data if the catalog version changed since the last check"""
+        now = time.monotonic()
+        if not force and now - self._last_check < self.revalidate_interval:
+            return
+
+        if self.snapshot_reader is not None:
+            snapshot = self.snapshot_reader.refresh(force)
+            if snapshot is not None:
+                with self._lock:
+                    if snapshot.version != self.version:
+                        self._clear()
+                        self.version = snapshot.version
+                    self._last_check = now
+                return
+
+        with self._lock:
+            conn = self.db.get_connection()
+            try:
+                if not self._schema_ready:
+                    try:
+                        ensure_catalog_version_schema(conn)
+                        self._schema_ready = True
+                    except sqlite3.OperationalError:
+                        # Catalog tables not created yet - nothing to version
+                        pass
+                current = read_catalog_version(conn)
+            finally:
+                conn.close()
+
+            if current != self.version:
+                self._clear()
+                self.version = current
+            self._last_check = now
+
+    def invalidate(self) -> None:
+        """Forget everything; the next read goes back to the database"""
+        with self._lock:
+            self._clear()
+            self.version = None
+            self._last_check = 0.0
+
+    def _clear(self) -> None:
+        self._fully_loaded = False
+        self._items = {}
+        self._compositions = {}
+        self._impacts = None
+        self._scores = {}
+        self.loaded_at = None
+
+    def is_warm(self) -> bool:
+        """True when the whole catalog is loaded and still current"""
+        self.revalidate()
+        return self._fully_loaded or self._snapshot() is not None
+
+    # ------------------------------------------------------------------
+    # Bulk loading
+    # ------------------------------------------------------------------
+
+    def load_catalog(self) -> Dict:
+        """Load every item, composition and impact row in three queries"""
+        with self._lock:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            try:
+                if not self._schema_ready:
+                    ensure_catalog_version_schema(conn)
+                    self._schema_ready = True
+
+                # One read transaction, so the rows match the version we record
+                cursor.execute('BEGIN')
+                version = read_catalog_version(conn)
+
+                cursor.execute('SELECT * FROM clothing_items')
+                items = {row['qr_code']: dict(row) for row in cursor}
+
+                cursor.execute('''
+                SELECT cmc.qr_code, m.material_name, cmc.percentage
+                FROM clothing_material_composition cmc
+                JOIN materials m ON cmc.material_id = m.material_id
+                ORDER BY cmc.composition_id
+                ''')
+                compositions = {qr_code: [] for qr_code in items}
+                for row in cursor:
+                    compositions.setdefault(row['qr_code'], []).append({
+                        'material_name': row['material_name'],
+                        'percentage': row['percentage']
+                    })
+
+                impacts = fetch_impact_table(cursor)
+                conn.commit()
+            finally:
+                conn.close()
+
+            self._scores = {}
+            self.version = version
+            self._last_check = time.monotonic()
+            self._items = items
+            self._compositions = compositions
+            self._impacts = impacts
+            self._fully_loaded = True
+            self.loaded_at = time.time()
+
+        return {
+            'items': len(items),
+            'compositions': sum(len(rows) for rows in compositions.values()),
+            'impacts': len(impacts)
+        }
+
+    def prefetch_items(self, qr_codes: List[str]) -> Dict:
+        """
+        Load many items and their compositions with set-based IN queries.
+
+        Returns qr_code -> item row (None for unknown codes). Afterwards the
+        per-item reads for these codes are served from the cache.
+        """
+        self.revalidate()
+        snapshot = self._snapshot()
+        if snapshot is not None:
+            found = {}
+            for qr_code in qr_codes:
+                entry = snapshot.entry(qr_code)
+                found[qr_code] = entry['item'] if entry else None
+            return found
+
+        missing = [qr_code for qr_code in qr_codes if qr_code not in self._items]
+        if missing and not self._fully_loaded:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            try:
+                for start in range(0, len(missing), SQLITE_MAX_PARAMS):
+                    chunk = missing[start:start + SQLITE_MAX_PARAMS]
+                    placeholders = ','.join('?' * len(chunk))
+
+                    cursor.execute(f'SELECT * FROM clothing_items WHERE qr_code IN ({placeholders})', chunk)
+                    items = {row['qr_code']: dict(row) for row in cursor}
+
+                    cursor.execute(f'''
+                    SELECT cmc.qr_code, m.material_name, cmc.percentage
+                    FROM clothing_material_composition cmc
+                    JOIN materials m ON cmc.material_id = m.material_id
+                    WHERE cmc.qr_code IN ({placeholders})
+                    ORDER BY cmc.composition_id
+                    ''', chunk)
+                    compositions = {qr_code: [] for qr_code in items}
+                    for row in cursor:
+                        compositions.setdefault(row['qr_code'], []).append({
+                            'material_name': row['material_name'],
+                            'percentage': row['percentage']
+                        })
+
+                    with self._lock:
+                        self._items.update(items)
+                        self._compositions.update(compositions)
+            finally:
+                conn.close()
+
+        return {qr_code: self._items.get(qr_code) for qr_code in qr_codes}
+
+    # ------------------------------------------------------------------
+    # FashionEnvironmentDB-compatible reads
+    # ------------------------------------------------------------------
+
+    def get_clothing_item(self, qr_code):
+        self.revalidate()
+        snapshot = self._snapshot()
+        if snapshot is not None:
+            entry = snapshot.entry(qr_code)
+            return entry['item'] if entry else None
+
+        item = self._items.get(qr_code)
+        if item is None and not self._fully_loaded:
+            row = self.db.get_clothing_item(qr_code)
+            if row:
+                item = dict(row)
+                with self._lock:
+                    self._items[qr_code] = item
+        return item
+
+    def get_material_composition(self, qr_code):
+        self.revalidate()
+        snapshot = self._snapshot()
+        if snapshot is not None:
+            entry = snapshot.entry(qr_code)
+            return entry['materials'] if entry else []
+
+        materials = self._compositions.get(qr_code)
+        if materials is None:
+            if self._fully_loaded:
+                return []
+            materials = [dict(row) for row in self.db.get_material_composition(qr_code)]
+            with self._lock:
+                self._compositions[qr_code] = materials
+        return materials
+
+    def get_environmental_impact(self, material_name, impact_category):
+        self.revalidate()
+        snapshot = self._snapshot()
+        impacts = snapshot.impacts() if snapshot is not None else self._impacts
+        if impacts is None:
+            with self._lock:
+                conn = self.db.get_connection()
+                try:
+                    impacts = fetch_impact_table(conn.cursor())
+                finally:
+                    conn.close()
+                self._impacts = impacts
+        return impacts.get((material_name.lower(), impact_category))
+
+    def list_all_clothing_items(self):
+        if not self.is_warm():
+            return self.db.list_all_clothing_items()
+        snapshot = self._snapshot()
+        if snapshot is not None:
+            items = [snapshot.entry(qr_code)['item'] for qr_code in snapshot.codes()]
+        else:
+            items = list(self._items.values())
+        return sorted(items, key=lambda item: item['item_name'])
+
+    def item_codes(self) -> List[str]:
+        """QR codes of every item in the catalog"""
+        if not self.is_warm():
+            self.load_catalog()
+        snapshot = self._snapshot()
+        if snapshot is not None:
+            return list(snapshot.codes())
+        return list(self._items.keys())
+
+    def catalog_rows(self) -> Dict:
+        """Items, compositions and impacts of a loaded (non-snapshot) cache"""
+        if not self._fully_loaded:
+            self.load_catalog()
+        return {
+            'items': self._items,
+            'compositions': self._compositions,
+            'impacts': self._impacts
+        }
+
+    # ------------------------------------------------------------------
+    # Score memoization
+    # ------------------------------------------------------------------
+
+    def cached_score(self, kind: str, qr_code: str, compute: Callable[[], Optional[Dict]],
+                     config_fingerprint: Optional[str] = None):
+        """
+        Return a memoized score, computing it on first use for this catalog version.
+        config_fingerprint separates scores computed under different scoring configs.
+        """
+        self.revalidate()
+        snapshot = self._snapshot()
+        if snapshot is not None and kind == 'dual':
+            entry = snapshot.entry(qr_code)
+            # Snapshot scores are only valid for the config they were computed with
+            if entry and entry['dual'] is not None and entry.get('config') == config_fingerprint:
+                return entry['dual']
+
+        key = (kind, qr_code, config_fingerprint)
+        result = self._scores.get(key)
+        if result is None:
+            version = self.version
+            result = compute()
+            if result is not None:
+                with self._lock:
+                    # Don't store results computed against an outdated catalog
+                    if version == self.version:
+                        self._scores[key] = result
+        return result
+
+    def drop_scores(self, config_fingerprint: str) -> int:
+        """Forget the scores computed under one scoring config; returns how many were dropped"""
+        with self._lock:
+            stale = [key for key in self._scores if key[2] == config_fingerprint]
+            for key in stale:
+                del self._scores[key]
+        return len(stale)
+
+    def stats(self) -> Dict:
+        """Describe the cache contents (for status/debug endpoints)"""
+        return {
+            'catalog_version': self.version,
+            'fully_loaded': self._fully_loaded,
+            'snapshot': self.snapshot_reader.path if self.snapshot_reader else None,
+            'items': len(self._items),
+            'impacts': len(self._impacts or {}),
+            'scores': len(self._scores),
+            'loaded_at': self.loaded_at
+        }
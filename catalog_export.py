@@ -0,0 +1,229 @@
+# catalog_export.py - Streaming export of the catalog with computed impacts
+"""
+Full catalog dump, one record per clothing item: the item row, its material
+composition, the computed water/carbon/energy totals and the dual scores.
+
+Records are produced by a generator. Items are read in keyset batches (each a
+short read over a lazily iterated cursor) and formatted line by line, so memory
+use does not grow with the catalog and no read lock is held for the whole dump.
+
+Formats:
+    ndjson  one JSON object per line
+    csv     flat columns; the composition as "material:percentage;..."
+
+Usage:
+    python catalog_export.py --format csv --output catalog.csv
+    python catalog_export.py --format ndjson --no-scores > catalog.ndjson
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+from typing import Callable, Dict, Iterator, Optional
+
+from catalog_cache import SQLITE_MAX_PARAMS, fetch_impact_table
+
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+EXPORT_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+EXPORT_BATCH_SIZE = 500
+
+IMPACT_CATEGORIES = ['water_usage', 'carbon_footprint', 'energy_usage']
+
+CSV_COLUMNS = [
+    'qr_code', 'item_name', 'brand', 'category', 'weight_grams', 'materials',
+    'water_usage', 'carbon_footprint', 'energy_usage',
+    'initial_cost', 'initial_grade', 'lasting_cost', 'lasting_grade',
+    'final_score', 'final_grade'
+]
+
+
+class _ItemRowSource:
+    """
+    Database stand-in that serves the item currently being exported, so the
+    scorers run on rows already fetched by the export query.
+    """
+
+    def __init__(self, impacts: Dict):
+        self.impacts = impacts
+        self.item = None
+        self.materials = []
+
+    def get_clothing_item(self, qr_code):
+        if self.item and self.item['qr_code'] == qr_code:
+            return self.item
+        return None
+
+    def get_material_composition(self, qr_code):
+        return self.materials
+
+    def get_environmental_impact(self, material_name, impact_category):
+        return self.impacts.get((material_name.lower(), impact_category))
+
+
+def _item_impacts(item: Dict, materials, impacts: Dict) -> Dict:
+    """Water/carbon/energy totals (same formula as /api/analyze); None without data"""
+    totals = {}
+    for category in IMPACT_CATEGORIES:
+        total = None
+        for mat in materials:
+            impact_data = impacts.get((mat['material_name'].lower(), category))
+            if impact_data:
+                total = (total or 0) + (
+                    impact_data['impact_value'] * (mat['percentage'] / 100) * (item['weight_grams'] / 1000)
+                )
+        totals[category] = round(total, 4) if total is not None else None
+    return totals
+
+
+def _dual_summary(score: Optional[Dict]) -> Optional[Dict]:
+    if not score or 'error' in score:
+        return None
+    return {
+        'initial_cost': score['initial_cost']['score'],
+        'initial_grade': score['initial_cost']['grade'],
+        'lasting_cost': score['lasting_cost']['score'],
+        'lasting_grade': score['lasting_cost']['grade'],
+        'final_score': score['final_sustainability_score']['score'],
+        'final_grade': score['final_sustainability_score']['grade']
+    }
+
+
+def iter_catalog_records(db_connection, scorer_factory: Optional[Callable] = None,
+                         batch_size: int = EXPORT_BATCH_SIZE, after: str = '',
+                         upto: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Yield one export record per item, ordered by QR code.
+
+    Args:
+        db_connection: object with get_connection() (FashionEnvironmentDB)
+        scorer_factory: DualSustainabilityScorer-like class; None skips dual scores
+        batch_size: items per read (at most SQLITE_MAX_PARAMS)
+        after, upto: only items with after < qr_code <= upto (None: no upper bound)
+    """
+    batch_size = min(batch_size, SQLITE_MAX_PARAMS)
+
+    conn = db_connection.get_connection()
+    try:
+        impacts = fetch_impact_table(conn.cursor())
+    finally:
+        conn.close()
+
+    source = _ItemRowSource(impacts)
+    scorer = scorer_factory(source) if scorer_factory else None
+
+    last_qr_code = after
+    while True:
+        conn = db_connection.get_connection()
+        try:
+            items = [dict(row) for row in conn.execute(
+                'SELECT * FROM clothing_items WHERE qr_code > ? AND (? IS NULL OR qr_code <= ?) '
+                'ORDER BY qr_code LIMIT ?',
+                (last_qr_code, upto, upto, batch_size)
+            )]
+            if not items:
+                return
+
+            compositions = {item['qr_code']: [] for item in items}
+            placeholders = ','.join('?' * len(items))
+            for row in conn.execute(f'''
+            SELECT cmc.qr_code, m.material_name, cmc.percentage
+            FROM clothing_material_composition cmc
+            JOIN materials m ON cmc.material_id = m.material_id
+            WHERE cmc.qr_code IN ({placeholders})
+            ORDER BY cmc.composition_id
+            ''', list(compositions)):
+                compositions[row['qr_code']].append({
+                    'material_name': row['material_name'],
+                    'percentage': row['percentage']
+                })
+        finally:
+            conn.close()
+
+        for item in items:
+            materials = compositions[item['qr_code']]
+            record = {
+                'qr_code': item['qr_code'],
+                'item_name': item['item_name'],
+                'brand': item['brand'],
+                'category': item['category'],
+                'weight_grams': item['weight_grams'],
+                'materials': materials,
+                'impacts': _item_impacts(item, materials, impacts)
+            }
+            if scorer is not None:
+                source.item = item
+                source.materials = materials
+                record['dual'] = _dual_summary(scorer.get_dual_sustainability_score(item['qr_code']))
+            yield record
+
+        last_qr_code = items[-1]['qr_code']
+
+
+def _csv_line(values) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+def iter_export_lines(records: Iterator[Dict], export_format: str, header: bool = True) -> Iterator[str]:
+    """Format records as NDJSON or CSV text lines (CSV starts with a header line unless header=False)"""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}")
+
+    if export_format == 'ndjson':
+        for record in records:
+            yield json.dumps(record) + '\n'
+        return
+
+    if header:
+        yield _csv_line(CSV_COLUMNS)
+    for record in records:
+        dual = record.get('dual') or {}
+        row = dict(record, **record['impacts'], **dual)
+        row['materials'] = ';'.join(f"{mat['material_name']}:{mat['percentage']}" for mat in record['materials'])
+        yield _csv_line([row.get(column) for column in CSV_COLUMNS])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the catalog with computed impacts and scores')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='ndjson')
+    parser.add_argument('--output', help='Output file (default: stdout)')
+    parser.add_argument('--no-scores', action='store_true', help='Skip dual sustainability scores')
+    parser.add_argument('--db', default='fashion_env.db', help='Database file')
+    args = parser.parse_args()
+
+    from app import FashionEnvironmentDB, DualSustainabilityConfig, DualSustainabilityScorer
+    from calculations import SustainabilityConfig
+    from scoring_config import ScoringConfigStore
+
+    db = FashionEnvironmentDB(args.db)
+    # Score with the config version active in that database
+    scoring_config = ScoringConfigStore(db, DualSustainabilityConfig, SustainabilityConfig).current()
+    records = iter_catalog_records(
+        db,
+        scorer_factory=None if args.no_scores else lambda source: DualSustainabilityScorer(source, scoring_config)
+    )
+
+    output = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        count = 0
+        for line in iter_export_lines(records, args.format):
+            output.write(line)
+            count += 1
+    finally:
+        if args.output:
+            output.close()
+
+    if args.output:
+        lines = count - 1 if args.format == 'csv' else count
+        print(f"Exported {lines} items to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
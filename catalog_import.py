@@ -0,0 +1,278 @@
+# catalog_import.py - Bulk upsert of vendor catalog feeds (CSV / NDJSON)
+"""
+Streams a feed of clothing items with their compositions into the catalog.
+
+Accepted formats are the ones catalog_export.py writes, so an export can be
+edited and fed back in:
+    ndjson  one JSON object per line: qr_code, item_name (or name), brand,
+            category, weight_grams (or weight), materials as a list of
+            {"material_name", "percentage"} or a "material:percentage;..." string
+    csv     header line with the same columns; materials as
+            "material:percentage;..." (computed export columns are ignored)
+
+Rows are read in batches. Per batch the checks run over whole columns: the
+composition percentages are summed per row in one pass (numpy bincount when
+available) and all material names are resolved through the cached
+MaterialResolver map (aliases included).
+Invalid rows are left out and reported with their line number; the valid rows
+of the batch are upserted in one transaction (catalog_writes.write_items).
+
+Usage:
+    python catalog_import.py vendor_feed.csv
+    python catalog_import.py vendor_feed.ndjson --dry-run --errors errors.ndjson
+"""
+
+import argparse
+import csv
+import json
+import sys
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:  # pure-Python fallback
+    np = None
+    NUMPY_AVAILABLE = False
+
+from catalog_writes import CatalogWriteError, parse_item, write_items
+from material_names import MaterialResolver
+
+
+IMPORT_FORMATS = ('ndjson', 'csv')
+IMPORT_MIMETYPES = {
+    'application/x-ndjson': 'ndjson',
+    'application/json': 'ndjson',
+    'text/csv': 'csv'
+}
+IMPORT_BATCH_SIZE = 2000
+PERCENTAGE_TOLERANCE = 0.5
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportFeedError(ValueError):
+    """Unreadable feed (reported to the client as HTTP 400)"""
+
+
+# ============================================================================
+# READING
+# ============================================================================
+
+def _parse_materials(value) -> List[Dict]:
+    """Materials column: list of dicts, or 'material:percentage;...' text"""
+    if isinstance(value, list):
+        return value
+    materials = []
+    for part in str(value or '').split(';'):
+        if not part.strip():
+            continue
+        name, sep, percentage = part.rpartition(':')
+        if not sep:
+            raise CatalogWriteError(f"materials entry '{part.strip()}' is not material:percentage")
+        materials.append({'material_name': name, 'percentage': percentage.strip()})
+    return materials
+
+
+def _item_payload(record: Dict) -> Dict:
+    """Feed record -> /api/items payload (accepts export and API column names)"""
+    return {
+        'qr_code': record.get('qr_code'),
+        'name': record.get('item_name') or record.get('name'),
+        'brand': record.get('brand'),
+        'category': record.get('category'),
+        'weight': record.get('weight_grams') or record.get('weight'),
+        'materials': _parse_materials(record.get('materials'))
+    }
+
+
+def iter_feed_records(stream, feed_format: str) -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """Yield (line number, record, read error) for every data line of a text stream"""
+    if feed_format not in IMPORT_FORMATS:
+        raise ImportFeedError(f"format must be one of: {', '.join(IMPORT_FORMATS)}")
+
+    if feed_format == 'ndjson':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f"invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield line_number, None, 'line is not a JSON object'
+                continue
+            yield line_number, record, None
+        return
+
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames or 'qr_code' not in reader.fieldnames:
+        raise ImportFeedError('CSV feed needs a header line with a qr_code column')
+    for record in reader:
+        yield reader.line_num, record, None
+
+
+# ============================================================================
+# VALIDATION
+# ============================================================================
+
+def percentage_totals(items: List[Dict]) -> List[float]:
+    """Sum of the composition percentages of every item, in one pass"""
+    if NUMPY_AVAILABLE:
+        rows = np.repeat(np.arange(len(items)), [len(item['materials']) for item in items])
+        weights = np.fromiter((percentage for item in items for _, percentage in item['materials']),
+                              dtype=float, count=len(rows))
+        return np.bincount(rows, weights=weights, minlength=len(items)).tolist()
+    return [sum(percentage for _, percentage in item['materials']) for item in items]
+
+
+def validate_batch(resolver, items: List[Dict]) -> List[List[str]]:
+    """Errors per parsed item: percentages not summing to 100, unknown materials"""
+    material_ids = resolver.resolve_many([name for item in items for name, _ in item['materials']])
+    errors = []
+    for item, total in zip(items, percentage_totals(items)):
+        item_errors = []
+        if not item['materials']:
+            item_errors.append('no material composition')
+        elif abs(total - 100) > PERCENTAGE_TOLERANCE:
+            item_errors.append(f"material percentages sum to {round(total, 2)}, not 100")
+        unknown = sorted({name for name, _ in item['materials'] if name not in material_ids})
+        if unknown:
+            item_errors.append(f"unknown material: {', '.join(unknown)}")
+        errors.append(item_errors)
+    return errors
+
+
+# ============================================================================
+# IMPORT
+# ============================================================================
+
+class CatalogImporter:
+    """
+    Validates and upserts a feed batch by batch.
+
+    Args:
+        db: Object with get_connection() (FashionEnvironmentDB)
+        resolver: MaterialResolver (default: db.materials)
+        batch_size: Rows per validation pass and per write transaction
+        dry_run: Validate only, write nothing
+    """
+
+    def __init__(self, db, resolver: Optional[MaterialResolver] = None, batch_size: int = IMPORT_BATCH_SIZE,
+                 dry_run: bool = False):
+        self.db = db
+        self.resolver = resolver or getattr(db, 'materials', None) or MaterialResolver(db)
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+
+    def run(self, records: Iterator[Tuple[int, Optional[Dict], Optional[str]]]) -> Dict:
+        """Import (line, record, read error) tuples; returns counts and the per-row error report"""
+        report = {
+            'dry_run': self.dry_run,
+            'rows': 0,
+            'valid': 0,
+            'created': 0,
+            'updated': 0,
+            'compositions': 0,
+            'rejected': 0,
+            'errors': []
+        }
+        seen = {}
+        batch = []
+        conn = self.db.get_connection()
+        try:
+            for line_number, record, read_error in records:
+                report['rows'] += 1
+                if read_error:
+                    self._reject(report, line_number, None, [read_error])
+                    continue
+                try:
+                    item = parse_item(_item_payload(record))
+                except CatalogWriteError as e:
+                    self._reject(report, line_number, record.get('qr_code'), [str(e)])
+                    continue
+                if item['qr_code'] in seen:
+                    self._reject(report, line_number, item['qr_code'],
+                                 [f"duplicate of line {seen[item['qr_code']]}"])
+                    continue
+                seen[item['qr_code']] = line_number
+                batch.append((line_number, item))
+                if len(batch) >= self.batch_size:
+                    self._flush(conn, batch, report)
+                    batch = []
+            if batch:
+                self._flush(conn, batch, report)
+        finally:
+            conn.close()
+
+        report['errors'].sort(key=lambda error: error['line'])
+        report['errors_truncated'] = report['rejected'] > len(report['errors'])
+        return report
+
+    def _flush(self, conn, batch: List[Tuple[int, Dict]], report: Dict) -> None:
+        items = [item for _, item in batch]
+        valid = []
+        for (line_number, item), item_errors in zip(batch, validate_batch(self.resolver, items)):
+            if item_errors:
+                self._reject(report, line_number, item['qr_code'], item_errors)
+            else:
+                valid.append(item)
+
+        report['valid'] += len(valid)
+        if not valid or self.dry_run:
+            return
+        written = write_items(conn, valid, self.resolver, 'upsert')
+        for key in ('created', 'updated', 'compositions'):
+            report[key] += written[key]
+
+    def _reject(self, report: Dict, line_number: int, qr_code: Optional[str], errors: List[str]) -> None:
+        report['rejected'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'line': line_number, 'qr_code': qr_code, 'errors': errors})
+
+
+def import_feed(db, stream, feed_format: str, batch_size: int = IMPORT_BATCH_SIZE,
+                dry_run: bool = False) -> Dict:
+    """Validate and upsert a CSV / NDJSON text stream; returns the import report"""
+    return CatalogImporter(db, batch_size=batch_size, dry_run=dry_run).run(iter_feed_records(stream, feed_format))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk upsert a CSV / NDJSON catalog feed')
+    parser.add_argument('feed', help='Feed file (- for stdin)')
+    parser.add_argument('--format', choices=IMPORT_FORMATS,
+                        help='Feed format (default: from the file extension)')
+    parser.add_argument('--dry-run', action='store_true', help='Validate only, write nothing')
+    parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help='Rows per transaction')
+    parser.add_argument('--errors', help='Write the per-row error report as NDJSON to this file')
+    parser.add_argument('--db', default='fashion_env.db', help='Database file')
+    args = parser.parse_args()
+
+    feed_format = args.format or ('csv' if args.feed.lower().endswith('.csv') else 'ndjson')
+
+    from app import FashionEnvironmentDB
+
+    stream = sys.stdin if args.feed == '-' else open(args.feed, newline='', encoding='utf-8')
+    try:
+        report = import_feed(FashionEnvironmentDB(args.db), stream, feed_format, args.batch_size, args.dry_run)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    if args.errors:
+        with open(args.errors, 'w', encoding='utf-8') as output:
+            for error in report['errors']:
+                output.write(json.dumps(error) + '\n')
+
+    action = 'Validated' if args.dry_run else 'Imported'
+    print(f"{action} {report['valid']} of {report['rows']} rows "
+          f"({report['created']} created, {report['updated']} updated, {report['rejected']} rejected)")
+    for error in report['errors'][:20]:
+        print(f"  line {error['line']} {error['qr_code'] or ''}: {'; '.join(error['errors'])}")
+    if report['rejected'] > 20:
+        print(f"  ... {report['rejected'] - 20} more")
+    sys.exit(1 if report['rejected'] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,685 @@
+# catalog_jobs.py - Catalog-wide recomputation jobs on a process pool
+"""
+Full-catalog work (rescoring every item, recomputing the impact
+normalization ranges, exporting) is split into shards by QR-code range and
+run across a ProcessPoolExecutor, so it scales with the number of cores
+instead of running on one thread of a web worker.
+
+    rescore   dual scores of every item under the active scoring config,
+              merged into catalog_scores
+    ranges    min/max normalization range per impact category (same formula
+              as EnhancedSustainabilityScorer.calculate_dynamic_ranges),
+              merged into catalog_impact_ranges
+    export    catalog_export records per shard, concatenated in QR order into
+              one NDJSON / CSV file in the jobs directory
+
+Shard boundaries are taken at equal item counts, a few shards per worker, so
+progress moves in small steps and a slow shard does not hold up the rest.
+Every worker process opens its own read-only SQLite connection
+(file:...?mode=ro) and never writes. The parent merges the shard results as
+they arrive, with batched executemany writes in short transactions.
+
+Cancelling a job sets a multiprocessing Event: pending shards are dropped and
+running shards stop at their next check. Rows already merged by a cancelled
+rescore stay; they are complete, valid scores.
+
+catalog_scores and catalog_impact_ranges are materialized results for
+reporting and offline consumers (SQL, exports). The request paths do not read
+them; they keep scoring through the CatalogCache memo. A scheduled rescore is
+therefore opt-in (interval): it runs in one worker of the web app, guarded by
+a lock file, and also as soon as catalog_scores holds scores from another
+scoring config.
+
+Usage:
+    python catalog_jobs.py rescore --workers 8
+    python catalog_jobs.py ranges
+    python catalog_jobs.py export --format csv --no-scores
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:  # Windows - no cross-process locking
+    fcntl = None
+
+from catalog_export import EXPORT_FORMATS, IMPACT_CATEGORIES, iter_catalog_records, iter_export_lines
+from scoring_config import ScoringConfigVersion
+
+
+JOB_KINDS = ('rescore', 'ranges', 'export')
+SHARDS_PER_WORKER = 4
+WRITE_BATCH_SIZE = 1000
+CANCEL_CHECK_EVERY = 100
+JOB_HISTORY = 20
+
+# forkserver children start from a clean process instead of a copy of a
+# multi-threaded web worker
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+class CatalogJobError(ValueError):
+    """Invalid job request (reported to the client as HTTP 400)"""
+
+
+def ensure_catalog_job_schema(conn) -> None:
+    """Create the tables the job results are merged into"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS catalog_scores (
+        qr_code TEXT PRIMARY KEY,
+        config_version INTEGER NOT NULL,
+        fingerprint TEXT NOT NULL,
+        initial_cost REAL,
+        initial_grade TEXT,
+        lasting_cost REAL,
+        lasting_grade TEXT,
+        final_score REAL,
+        final_grade TEXT,
+        job_id TEXT NOT NULL,
+        scored_at REAL NOT NULL
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS catalog_impact_ranges (
+        impact_category TEXT PRIMARY KEY,
+        min_value REAL NOT NULL,
+        max_value REAL NOT NULL,
+        job_id TEXT NOT NULL,
+        computed_at REAL NOT NULL
+    )
+    ''')
+    conn.commit()
+
+
+def shard_bounds(conn, shards: int) -> List[Tuple[str, Optional[str], int]]:
+    """
+    Split the items into `shards` QR-code ranges of (nearly) equal size.
+
+    Returns:
+        [(after, upto, items)]: a shard holds after < qr_code <= upto; the last
+        shard has no upper bound, so items added meanwhile are still covered
+    """
+    total = conn.execute('SELECT COUNT(*) FROM clothing_items').fetchone()[0]
+    shards = max(1, min(shards, total))
+    bounds = []
+    after = ''
+    start = 0
+    for index in range(1, shards + 1):
+        end = total * index // shards
+        upto = None
+        if index < shards:
+            upto = conn.execute('SELECT qr_code FROM clothing_items ORDER BY qr_code LIMIT 1 OFFSET ?',
+                                (end - 1,)).fetchone()[0]
+        bounds.append((after, upto, end - start))
+        after, start = upto, end
+    return bounds if total else []
+
+
+# ============================================================================
+# WORKER PROCESSES
+# ============================================================================
+
+class ReadOnlyDB:
+    """get_connection() source that opens the database read-only"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def get_connection(self):
+        conn = sqlite3.connect(f"file:{quote(os.path.abspath(self.db_path))}?mode=ro", uri=True, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+
+_worker = {}
+
+
+def _init_worker(db_path: str, config_version: Optional[int], config_data: Optional[Dict], cancel_event) -> None:
+    _worker.update(
+        db=ReadOnlyDB(db_path),
+        config=(config_version, config_data),
+        cancel=cancel_event,
+        scorer_factory=None
+    )
+
+
+def _scorer_factory() -> Callable:
+    """DualSustainabilityScorer factory for the config version the job was started with"""
+    if _worker['scorer_factory'] is None:
+        from app import DualSustainabilityConfig, DualSustainabilityScorer
+        from calculations import SustainabilityConfig
+
+        version, data = _worker['config']
+        scoring_config = ScoringConfigVersion(version, data, DualSustainabilityConfig, SustainabilityConfig)
+        _worker['scorer_factory'] = lambda source: DualSustainabilityScorer(source, scoring_config)
+    return _worker['scorer_factory']
+
+
+def _cancelled(count: int) -> bool:
+    return count % CANCEL_CHECK_EVERY == 0 and _worker['cancel'].is_set()
+
+
+def _rescore_shard(after: str, upto: Optional[str], params: Dict) -> Dict:
+    rows = []
+    items = 0
+    records = iter_catalog_records(_worker['db'], scorer_factory=_scorer_factory(), after=after, upto=upto)
+    for items, record in enumerate(records, start=1):
+        if _cancelled(items):
+            return {'cancelled': True}
+        dual = record['dual']
+        if dual:
+            rows.append((
+                record['qr_code'], dual['initial_cost'], dual['initial_grade'], dual['lasting_cost'],
+                dual['lasting_grade'], dual['final_score'], dual['final_grade']
+            ))
+    return {'cancelled': False, 'items': items, 'rows': rows}
+
+
+def _ranges_shard(after: str, upto: Optional[str], params: Dict) -> Dict:
+    if _worker['cancel'].is_set():
+        return {'cancelled': True}
+    conn = _worker['db'].get_connection()
+    try:
+        items = conn.execute('SELECT COUNT(*) FROM clothing_items WHERE qr_code > ? AND (? IS NULL OR qr_code <= ?)',
+                             (after, upto, upto)).fetchone()[0]
+        # Partial sums, so the per-impact-value averages merge exactly across shards
+        placeholders = ','.join('?' * len(IMPACT_CATEGORIES))
+        rows = [tuple(row) for row in conn.execute(f'''
+        SELECT ei.impact_category, ei.impact_value,
+               SUM(cmc.percentage), COUNT(cmc.percentage),
+               SUM(ci.weight_grams), COUNT(ci.weight_grams)
+        FROM environmental_impacts ei
+        JOIN materials m ON ei.material_id = m.material_id
+        JOIN clothing_material_composition cmc ON m.material_id = cmc.material_id
+        JOIN clothing_items ci ON cmc.qr_code = ci.qr_code
+        WHERE ei.impact_category IN ({placeholders})
+          AND ci.qr_code > ? AND (? IS NULL OR ci.qr_code <= ?)
+        GROUP BY ei.impact_category, ei.impact_value
+        ''', (*IMPACT_CATEGORIES, after, upto, upto))]
+    finally:
+        conn.close()
+    return {'cancelled': False, 'items': items, 'rows': rows}
+
+
+def _export_shard(after: str, upto: Optional[str], params: Dict) -> Dict:
+    scorer_factory = _scorer_factory() if params['scores'] else None
+    items = 0
+    with open(params['part_path'], 'w', newline='', encoding='utf-8') as output:
+        records = iter_catalog_records(_worker['db'], scorer_factory=scorer_factory, after=after, upto=upto)
+        for line in iter_export_lines(records, params['format'], header=False):
+            items += 1
+            if _cancelled(items):
+                return {'cancelled': True}
+            output.write(line)
+    return {'cancelled': False, 'items': items}
+
+
+_SHARD_RUNNERS = {
+    'rescore': _rescore_shard,
+    'ranges': _ranges_shard,
+    'export': _export_shard
+}
+
+
+def _run_shard(kind: str, index: int, after: str, upto: Optional[str], params: Dict) -> Dict:
+    result = _SHARD_RUNNERS[kind](after, upto, params)
+    result['index'] = index
+    return result
+
+
+# ============================================================================
+# MERGING (parent process)
+# ============================================================================
+
+class _Merge:
+    """Parent-side result handling of one job kind"""
+
+    def __init__(self, manager: 'CatalogJobManager', job: Dict, scoring_config):
+        self.manager = manager
+        self.job = job
+
+    def shard_params(self, index: int) -> Dict:
+        return self.job['params']
+
+    def add(self, shard: Dict) -> None:
+        raise NotImplementedError
+
+    def finish(self) -> Dict:
+        raise NotImplementedError
+
+    def abort(self) -> None:
+        pass
+
+
+class _ScoreMerge(_Merge):
+    def __init__(self, manager: 'CatalogJobManager', job: Dict, scoring_config):
+        super().__init__(manager, job, scoring_config)
+        self.config_version = scoring_config.version
+        self.fingerprint = scoring_config.compiled.fingerprint
+        self.result = {'config_version': self.config_version, 'scored': 0, 'unscored': 0, 'grades': {}}
+
+    def add(self, shard: Dict) -> None:
+        scored_at = time.time()
+        rows = [row + (self.config_version, self.fingerprint, self.job['job_id'], scored_at) for row in shard['rows']]
+        conn = self.manager.get_connection()
+        try:
+            for start in range(0, len(rows), WRITE_BATCH_SIZE):
+                conn.executemany('''
+                INSERT INTO catalog_scores (qr_code, initial_cost, initial_grade, lasting_cost, lasting_grade,
+                                            final_score, final_grade, config_version, fingerprint, job_id, scored_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(qr_code) DO UPDATE SET
+                    initial_cost = excluded.initial_cost, initial_grade = excluded.initial_grade,
+                    lasting_cost = excluded.lasting_cost, lasting_grade = excluded.lasting_grade,
+                    final_score = excluded.final_score, final_grade = excluded.final_grade,
+                    config_version = excluded.config_version, fingerprint = excluded.fingerprint,
+                    job_id = excluded.job_id, scored_at = excluded.scored_at
+                ''', rows[start:start + WRITE_BATCH_SIZE])
+                conn.commit()
+        finally:
+            conn.close()
+
+        self.result['scored'] += len(rows)
+        self.result['unscored'] += shard['items'] - len(rows)
+        for row in shard['rows']:
+            self.result['grades'][row[6]] = self.result['grades'].get(row[6], 0) + 1
+
+    def finish(self) -> Dict:
+        # Drop scores of items that no longer exist (or no longer have a composition)
+        conn = self.manager.get_connection()
+        try:
+            self.result['removed'] = conn.execute('DELETE FROM catalog_scores WHERE job_id != ?',
+                                                  (self.job['job_id'],)).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        self.result['grades'] = dict(sorted(self.result['grades'].items()))
+        self.manager.mark_rescored()
+        return self.result
+
+
+class _RangeMerge(_Merge):
+    def __init__(self, manager: 'CatalogJobManager', job: Dict, scoring_config):
+        super().__init__(manager, job, scoring_config)
+        self.sums = {}
+
+    def add(self, shard: Dict) -> None:
+        for category, impact_value, pct_sum, pct_count, weight_sum, weight_count in shard['rows']:
+            sums = self.sums.setdefault((category, impact_value), [0.0, 0, 0.0, 0])
+            sums[0] += pct_sum or 0
+            sums[1] += pct_count
+            sums[2] += weight_sum or 0
+            sums[3] += weight_count
+
+    def finish(self) -> Dict:
+        calculated = {}
+        for (category, impact_value), (pct_sum, pct_count, weight_sum, weight_count) in self.sums.items():
+            avg_percentage = (pct_sum / pct_count if pct_count else None) or 50  # Default if null
+            avg_weight = (weight_sum / weight_count if weight_count else None) or 200  # Default if null
+            calculated.setdefault(category, []).append(impact_value * (avg_percentage / 100) * (avg_weight / 1000))
+        ranges = {category: (min(values), max(values)) for category, values in sorted(calculated.items())}
+
+        computed_at = time.time()
+        conn = self.manager.get_connection()
+        try:
+            conn.execute('DELETE FROM catalog_impact_ranges')
+            conn.executemany('''
+            INSERT INTO catalog_impact_ranges (impact_category, min_value, max_value, job_id, computed_at)
+            VALUES (?, ?, ?, ?, ?)
+            ''', [(category, low, high, self.job['job_id'], computed_at) for category, (low, high) in ranges.items()])
+            conn.commit()
+        finally:
+            conn.close()
+        return {'ranges': {category: [low, high] for category, (low, high) in ranges.items()}}
+
+
+class _ExportMerge(_Merge):
+    def __init__(self, manager: 'CatalogJobManager', job: Dict, scoring_config):
+        super().__init__(manager, job, scoring_config)
+        self.parts = []
+
+    def part_path(self, index: int) -> str:
+        return os.path.join(self.manager.work_dir, f".{self.job['job_id']}.{index:04d}.part")
+
+    def shard_params(self, index: int) -> Dict:
+        return dict(self.job['params'], part_path=self.part_path(index))
+
+    def add(self, shard: Dict) -> None:
+        self.parts.append(shard['index'])
+
+    def finish(self) -> Dict:
+        export_format = self.job['params']['format']
+        filename = f"catalog_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{self.job['job_id']}.{export_format}"
+        path = os.path.join(self.manager.work_dir, filename)
+        with open(path, 'w', newline='', encoding='utf-8') as output:
+            output.writelines(iter_export_lines(iter(()), export_format))  # CSV header
+            for index in sorted(self.parts):
+                with open(self.part_path(index), newline='', encoding='utf-8') as part:
+                    for line in part:
+                        output.write(line)
+        self.abort()
+        return {'path': path, 'size_bytes': os.path.getsize(path)}
+
+    def abort(self) -> None:
+        for index in range(self.job['shards_total'] or 0):
+            try:
+                os.remove(self.part_path(index))
+            except OSError:
+                pass
+
+
+_MERGES = {
+    'rescore': _ScoreMerge,
+    'ranges': _RangeMerge,
+    'export': _ExportMerge
+}
+
+
+# ============================================================================
+# JOB MANAGER
+# ============================================================================
+
+class CatalogJobManager:
+    """
+    Runs catalog jobs of one database in the background, one at a time.
+
+    Args:
+        db_path: Database file
+        config_provider: Returns the active ScoringConfigVersion (for rescore / scored exports)
+        work_dir: Directory for exports, shard files and the schedule lock
+        workers: Worker processes per job (default: os.cpu_count())
+        interval: Seconds between scheduled rescores (None or 0 disables the schedule)
+    """
+
+    def __init__(self, db_path: str, config_provider: Callable, work_dir: str = 'catalog_jobs',
+                 workers: Optional[int] = None, interval: Optional[float] = None,
+                 start_method: str = START_METHOD):
+        self.db_path = db_path
+        self.config_provider = config_provider
+        self.work_dir = work_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.interval = interval
+        self.start_method = start_method
+
+        self._jobs = {}
+        self._current = None
+        self._cancel_events = {}
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._scheduler_pid = None
+
+    def get_connection(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        if not self._schema_ready:
+            ensure_catalog_job_schema(conn)
+            self._schema_ready = True
+        return conn
+
+    # ------------------------------------------------------------------
+    # Jobs
+    # ------------------------------------------------------------------
+
+    def start_job(self, kind: str, params: Optional[Dict] = None, workers: Optional[int] = None,
+                  trigger: str = 'manual') -> Dict:
+        """Start a job in a background thread; raises RuntimeError while another job is running"""
+        with self._lock:
+            job = self._new_job(kind, params, workers, trigger)
+
+        thread = threading.Thread(target=self.run_job, args=(job['job_id'],), name='catalog-job', daemon=True)
+        thread.start()
+        return dict(job)
+
+    def _new_job(self, kind: str, params: Optional[Dict], workers: Optional[int], trigger: str) -> Dict:
+        if kind not in JOB_KINDS:
+            raise CatalogJobError(f"kind must be one of: {', '.join(JOB_KINDS)}")
+        params = dict(params or {})
+        if kind == 'export':
+            params['format'] = params.get('format') or 'ndjson'
+            if params['format'] not in EXPORT_FORMATS:
+                raise CatalogJobError(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+            params['scores'] = bool(params.get('scores', True))
+        if workers is not None and (not isinstance(workers, int) or workers < 1):
+            raise CatalogJobError('workers must be a positive integer')
+
+        current = self.current_job()
+        if current and current['status'] in ('running', 'cancelling'):
+            raise RuntimeError(f"Catalog job {current['job_id']} ({current['kind']}) is still running")
+
+        job = {
+            'job_id': uuid.uuid4().hex[:12],
+            'kind': kind,
+            'trigger': trigger,
+            'params': params,
+            'status': 'running',
+            'started_at': datetime.now().isoformat(),
+            'finished_at': None,
+            'workers': workers or self.workers,
+            'shards_total': None,
+            'shards_done': 0,
+            'items_total': None,
+            'items_done': 0,
+            'progress': 0.0,
+            'result': None,
+            'error': None
+        }
+        self._jobs[job['job_id']] = job
+        self._current = job['job_id']
+
+        # Bounded history
+        for job_id in list(self._jobs)[:-JOB_HISTORY]:
+            del self._jobs[job_id]
+        return job
+
+    def run(self, kind: str, params: Optional[Dict] = None, workers: Optional[int] = None,
+            trigger: str = 'direct', on_progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Create and run a job in the calling thread"""
+        with self._lock:
+            job_id = self._new_job(kind, params, workers, trigger)['job_id']
+        return self.run_job(job_id, on_progress)
+
+    def run_job(self, job_id: str, on_progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Run a created job in the calling thread (the shards run in worker processes).
+
+        on_progress is called with a copy of the job about twice a second while shards run.
+        """
+        job = self._jobs[job_id]
+        context = multiprocessing.get_context(self.start_method)
+        cancel_event = context.Event()
+        self._cancel_events[job_id] = cancel_event
+        merge = None
+
+        try:
+            os.makedirs(self.work_dir, exist_ok=True)
+            needs_scorer = job['kind'] == 'rescore' or (job['kind'] == 'export' and job['params']['scores'])
+            scoring_config = self.config_provider() if needs_scorer else None
+
+            conn = self.get_connection()
+            try:
+                shards = shard_bounds(conn, job['workers'] * SHARDS_PER_WORKER)
+            finally:
+                conn.close()
+            job['shards_total'] = len(shards)
+            job['items_total'] = sum(items for _, _, items in shards)
+            merge = _MERGES[job['kind']](self, job, scoring_config)
+
+            initargs = (
+                self.db_path,
+                scoring_config.version if scoring_config else None,
+                scoring_config.data if scoring_config else None,
+                cancel_event
+            )
+            workers = max(1, min(job['workers'], len(shards)))
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                     initializer=_init_worker, initargs=initargs) as pool:
+                pending = {
+                    pool.submit(_run_shard, job['kind'], index, after, upto, merge.shard_params(index))
+                    for index, (after, upto, _) in enumerate(shards)
+                }
+                while pending:
+                    done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        shard = future.result()
+                        if shard['cancelled'] or cancel_event.is_set():
+                            continue
+                        merge.add(shard)
+                        job['shards_done'] += 1
+                        job['items_done'] += shard['items']
+                        job['progress'] = round(min(1.0, job['shards_done'] / job['shards_total']), 4)
+                    if on_progress:
+                        on_progress(dict(job))
+                    if cancel_event.is_set():
+                        # Pending shards are dropped, running ones stop at their next check
+                        pool.shutdown(wait=True, cancel_futures=True)
+                        break
+
+            if cancel_event.is_set():
+                merge.abort()
+                job['status'] = 'cancelled'
+            else:
+                job['result'] = merge.finish()
+                job['progress'] = 1.0
+                job['status'] = 'completed'
+        except Exception as e:
+            if merge is not None:
+                merge.abort()
+            job['status'] = 'failed'
+            job['error'] = str(e)
+            print(f"Catalog job {job_id} ({job['kind']}) failed: {e}")
+        finally:
+            job['finished_at'] = datetime.now().isoformat()
+            self._cancel_events.pop(job_id, None)
+
+        return dict(job)
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """Request cancellation; returns the job (None if unknown)"""
+        job = self._jobs.get(job_id)
+        if not job:
+            return None
+        cancel_event = self._cancel_events.get(job_id)
+        if job['status'] == 'running' and cancel_event is not None:
+            job['status'] = 'cancelling'
+            cancel_event.set()
+        return dict(job)
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    def current_job(self) -> Optional[Dict]:
+        return self.get_job(self._current) if self._current else None
+
+    def list_jobs(self) -> List[Dict]:
+        """Jobs started by this process, newest first"""
+        return [dict(job) for job in reversed(list(self._jobs.values()))]
+
+    # ------------------------------------------------------------------
+    # Schedule
+    # ------------------------------------------------------------------
+
+    def _marker_path(self) -> str:
+        return os.path.join(self.work_dir, '.rescore_last_run')
+
+    def mark_rescored(self) -> None:
+        os.makedirs(self.work_dir, exist_ok=True)
+        with open(self._marker_path(), 'w') as marker:
+            marker.write(datetime.now().isoformat())
+
+    def is_due(self) -> bool:
+        """Interval elapsed since the last rescore, or scores from another scoring config are stored"""
+        try:
+            if time.time() - os.path.getmtime(self._marker_path()) >= self.interval:
+                return True
+        except OSError:
+            return True
+        conn = self.get_connection()
+        try:
+            return conn.execute('SELECT 1 FROM catalog_scores WHERE fingerprint != ? LIMIT 1',
+                                (self.config_provider().compiled.fingerprint,)).fetchone() is not None
+        finally:
+            conn.close()
+
+    def ensure_scheduler(self) -> None:
+        """Start the schedule thread in this process (once per pid, so it survives forks)"""
+        if not self.interval or self._scheduler_pid == os.getpid():
+            return
+        self._scheduler_pid = os.getpid()
+        thread = threading.Thread(target=self._schedule_loop, name='catalog-job-scheduler', daemon=True)
+        thread.start()
+
+    def _schedule_loop(self) -> None:
+        # Check often enough that a config change is rescored quickly
+        check_interval = min(60.0, self.interval)
+        while True:
+            time.sleep(check_interval)
+            try:
+                self._run_scheduled()
+            except Exception as e:
+                print(f"Catalog job scheduler error: {e}")
+
+    def _run_scheduled(self) -> None:
+        if not self.is_due():
+            return
+        os.makedirs(self.work_dir, exist_ok=True)
+        lock_file = open(os.path.join(self.work_dir, '.rescore.lock'), 'a')
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    # Another worker is rescoring
+                    return
+            # Re-check under the lock: another worker may have just finished
+            if not self.is_due():
+                return
+            with self._lock:
+                try:
+                    job_id = self._new_job('rescore', None, None, 'scheduled')['job_id']
+                except RuntimeError:
+                    return
+            self.run_job(job_id)
+        finally:
+            lock_file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a catalog-wide job across worker processes')
+    parser.add_argument('kind', choices=JOB_KINDS)
+    parser.add_argument('--workers', type=int, help='Worker processes (default: number of CPUs)')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='ndjson', help='Export format')
+    parser.add_argument('--no-scores', action='store_true', help='Export without dual scores')
+    parser.add_argument('--dir', default='catalog_jobs', help='Directory for exports')
+    parser.add_argument('--db', default='fashion_env.db', help='Database file')
+    args = parser.parse_args()
+
+    from app import FashionEnvironmentDB, DualSustainabilityConfig
+    from calculations import SustainabilityConfig
+    from scoring_config import ScoringConfigStore
+
+    # Score with the config version active in that database
+    store = ScoringConfigStore(FashionEnvironmentDB(args.db), DualSustainabilityConfig, SustainabilityConfig)
+    manager = CatalogJobManager(args.db, store.current, work_dir=args.dir, workers=args.workers)
+
+    params = {'format': args.format, 'scores': not args.no_scores} if args.kind == 'export' else None
+    started = time.perf_counter()
+    job = manager.run(args.kind, params, trigger='cli')
+    job['seconds'] = round(time.perf_counter() - started, 2)
+    print(json.dumps(job, indent=2))
+    if job['status'] != 'completed':
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
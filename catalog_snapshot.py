@@ -0,0 +1,405 @@
+# catalog_snapshot.py - Memory-mapped catalog snapshot shared by all workers
+"""
+Read-mostly snapshot of the catalog and of the precomputed item scores.
+
+One worker writes the file (atomically, whenever the catalog version changes);
+every worker maps it read-only, so the catalog lives once in the OS page cache
+instead of once per gunicorn worker. Readers compare the version in the file
+header with the version they have mapped and remap when it changes.
+
+File layout (little-endian):
+
+    header   magic, format, catalog version, record count, section offsets
+    records  one fixed-size record per item, sorted by QR code: location of the
+             QR code and of the item's JSON blob, followed by the numeric vector
+             (weight, water, carbon, energy, initial/lasting/final score)
+    keys     UTF-8 QR codes, concatenated
+    blobs    per-item JSON: item row, material composition, dual score and the
+             fingerprint of the scoring config it was computed with
+    impacts  JSON list of [material, category, value, unit]
+
+Numeric vectors are read with struct.unpack_from straight from the map; JSON
+blobs are only decoded for the item that is asked for, once per mapping (the
+decoded entry is kept until the next remap replaces the snapshot).
+
+Snapshot mode is opt-in (CATALOG_SNAPSHOT_PATH) and meant for gunicorn on
+Linux; on platforms without fcntl only one process should publish.
+"""
+
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows - no cross-process locking
+    fcntl = None
+
+from catalog_cache import CatalogCache, read_catalog_version
+
+
+MAGIC = b'HWCS'
+FORMAT_VERSION = 1
+
+# magic, format, catalog version, record count, records/keys/blobs/impacts offsets
+HEADER = struct.Struct('<4sHxxQIQQQQ')
+# key offset, key length, blob offset, blob length, numeric vector
+RECORD = struct.Struct('<IHxxII7d')
+KEY_LOCATION = struct.Struct('<IH')
+
+VECTOR_FIELDS = (
+    'weight_grams',
+    'water_usage',
+    'carbon_footprint',
+    'energy_usage',
+    'initial_cost',
+    'lasting_cost',
+    'final_score'
+)
+
+
+class SnapshotError(ValueError):
+    """Raised when a file is not a readable catalog snapshot"""
+
+
+# ============================================================================
+# WRITING
+# ============================================================================
+
+def _score_vector(item: Dict, score: Optional[Dict]) -> tuple:
+    """Numeric record fields for an item; NaN where no dual score exists"""
+    nan = float('nan')
+    if not score or 'error' in score:
+        return (float(item['weight_grams']), nan, nan, nan, nan, nan, nan)
+
+    details = score['initial_cost']['breakdown']['impact_details']
+    return (
+        float(item['weight_grams']),
+        details.get('water_usage', {}).get('raw_impact', nan),
+        details.get('carbon_footprint', {}).get('raw_impact', nan),
+        details.get('energy_usage', {}).get('raw_impact', nan),
+        score['initial_cost']['score'],
+        score['lasting_cost']['score'],
+        score['final_sustainability_score']['score']
+    )
+
+
+def write_snapshot(path: str, catalog_version: int, items: Dict, compositions: Dict,
+                   impacts: Dict, scores: Dict, config_fingerprint: Optional[str] = None) -> None:
+    """
+    Write a snapshot file atomically (temp file + rename).
+
+    Args:
+        items: qr_code -> item row dict
+        compositions: qr_code -> list of {'material_name', 'percentage'}
+        impacts: (material_name, category) -> {'impact_value', 'unit'}
+        scores: qr_code -> dual score dict
+        config_fingerprint: scoring config the scores were computed with
+    """
+    codes = sorted(items, key=lambda code: code.encode('utf-8'))
+
+    records = bytearray()
+    keys = bytearray()
+    blobs = bytearray()
+    for qr_code in codes:
+        key = qr_code.encode('utf-8')
+        blob = json.dumps({
+            'item': items[qr_code],
+            'materials': compositions.get(qr_code, []),
+            'dual': scores.get(qr_code),
+            'config': config_fingerprint
+        }, separators=(',', ':')).encode('utf-8')
+
+        vector = _score_vector(items[qr_code], scores.get(qr_code))
+        records += RECORD.pack(len(keys), len(key), len(blobs), len(blob), *vector)
+        keys += key
+        blobs += blob
+
+    impacts_blob = json.dumps(
+        [[material, category, data['impact_value'], data['unit']]
+         for (material, category), data in impacts.items()],
+        separators=(',', ':')
+    ).encode('utf-8')
+
+    records_offset = HEADER.size
+    keys_offset = records_offset + len(records)
+    blobs_offset = keys_offset + len(keys)
+    impacts_offset = blobs_offset + len(blobs)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, catalog_version, len(codes),
+                         records_offset, keys_offset, blobs_offset, impacts_offset)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(records)
+        f.write(keys)
+        f.write(blobs)
+        f.write(impacts_blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_snapshot_version(path: str) -> Optional[int]:
+    """Read only the catalog version from a snapshot header (None if unreadable)"""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+    except OSError:
+        return None
+    if len(header) < HEADER.size:
+        return None
+    magic, file_format, version = HEADER.unpack(header)[:3]
+    if magic != MAGIC or file_format != FORMAT_VERSION:
+        return None
+    return version
+
+
+# ============================================================================
+# READING
+# ============================================================================
+
+class CatalogSnapshot:
+    """A read-only mapping of one snapshot file"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._map) < HEADER.size:
+            raise SnapshotError(f"{path} is too short to be a catalog snapshot")
+        (magic, file_format, self.version, self.count, self._records_offset,
+         self._keys_offset, self._blobs_offset, self._impacts_offset) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or file_format != FORMAT_VERSION:
+            raise SnapshotError(f"{path} is not a format {FORMAT_VERSION} catalog snapshot")
+
+        self._impacts = None
+        self._entries = {}
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, qr_code):
+        return self._find(qr_code) >= 0
+
+    def _key(self, index: int) -> bytes:
+        key_offset, key_length = KEY_LOCATION.unpack_from(self._map, self._records_offset + index * RECORD.size)
+        start = self._keys_offset + key_offset
+        return self._map[start:start + key_length]
+
+    def _find(self, qr_code: str) -> int:
+        """Binary search over the sorted record table"""
+        target = qr_code.encode('utf-8')
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self._key(low) == target:
+            return low
+        return -1
+
+    def codes(self) -> Iterator[str]:
+        """All QR codes, in sorted order"""
+        for index in range(self.count):
+            yield self._key(index).decode('utf-8')
+
+    def vector(self, qr_code: str) -> Optional[Dict]:
+        """Numeric impacts/scores for an item without decoding any JSON"""
+        index = self._find(qr_code)
+        if index < 0:
+            return None
+        values = RECORD.unpack_from(self._map, self._records_offset + index * RECORD.size)[4:]
+        return {field: (None if math.isnan(value) else value) for field, value in zip(VECTOR_FIELDS, values)}
+
+    def entry(self, qr_code: str) -> Optional[Dict]:
+        """Decoded item row, composition and dual score; decoded once per mapping"""
+        entry = self._entries.get(qr_code)
+        if entry is not None:
+            return entry
+        index = self._find(qr_code)
+        if index < 0:
+            return None
+        _, _, blob_offset, blob_length = RECORD.unpack_from(self._map, self._records_offset + index * RECORD.size)[:4]
+        start = self._blobs_offset + blob_offset
+        entry = json.loads(self._map[start:start + blob_length])
+        self._entries[qr_code] = entry
+        return entry
+
+    def impacts(self) -> Dict:
+        """(material_name, category) -> impact row; decoded once per mapping"""
+        if self._impacts is None:
+            rows = json.loads(self._map[self._impacts_offset:])
+            self._impacts = {
+                (material, category): {'impact_value': value, 'unit': unit}
+                for material, category, value, unit in rows
+            }
+        return self._impacts
+
+
+class SnapshotReader:
+    """
+    Keeps the newest snapshot mapped. refresh() re-reads the header version at
+    most once per check_interval and remaps when it changed. The previous map is
+    released once no request references it any more.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.snapshot = None
+        self.remaps = 0
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self, force: bool = False) -> Optional[CatalogSnapshot]:
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return self.snapshot
+
+        with self._lock:
+            self._last_check = now
+            version = read_snapshot_version(self.path)
+            if version is None:
+                return self.snapshot
+            if self.snapshot is None or self.snapshot.version != version:
+                try:
+                    self.snapshot = CatalogSnapshot(self.path)
+                    self.remaps += 1
+                except (OSError, SnapshotError):
+                    pass
+        return self.snapshot
+
+
+# ============================================================================
+# PUBLISHING
+# ============================================================================
+
+class SnapshotPublisher:
+    """
+    Rebuilds the snapshot from the database whenever the catalog version moves
+    past the version on disk.
+
+    Catalog writes made by this worker call request_publish(), which wakes
+    this process's polling thread instead of rebuilding inside the request;
+    bursts of writes coalesce into one publish. Writes made elsewhere (desktop
+    app, import scripts) are picked up by the regular polls, which only one
+    worker at a time runs, elected through a lock file.
+    """
+
+    def __init__(self, db_connection, path: str, scorer_factory: Callable, poll_interval: float = 5.0):
+        self.db = db_connection
+        self.path = path
+        self.scorer_factory = scorer_factory
+        self.poll_interval = poll_interval
+        self._publish_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._force_requested = False
+        self._poller_pid = None
+        self._leader_file = None
+
+    def publish(self, force: bool = False) -> Optional[int]:
+        """Write a new snapshot if the on-disk one is older than the database"""
+        with self._publish_lock:
+            if not force and not self.is_stale():
+                return None
+
+            # Private cache so the snapshot never mixes two catalog versions
+            cache = CatalogCache(self.db)
+            rows = cache.catalog_rows()
+            scorer = self.scorer_factory(cache)
+            scores = {qr_code: scorer.get_dual_sustainability_score(qr_code) for qr_code in rows['items']}
+
+            with self._file_lock():
+                on_disk = read_snapshot_version(self.path)
+                if on_disk is not None and on_disk >= cache.version and not force:
+                    return None
+                write_snapshot(self.path, cache.version, rows['items'], rows['compositions'],
+                               rows['impacts'], scores, scorer.compiled.fingerprint)
+            return cache.version
+
+    def request_publish(self, force: bool = False) -> None:
+        """
+        Have the polling thread publish now (returns immediately). force
+        rebuilds even at the same catalog version, e.g. after a scoring config
+        change; until then, scores from the old config are recomputed on read.
+        """
+        self.ensure_poller()
+        if force:
+            self._force_requested = True
+        self._wake.set()
+
+    def is_stale(self) -> bool:
+        on_disk = read_snapshot_version(self.path)
+        if on_disk is None:
+            return True
+        conn = self.db.get_connection()
+        try:
+            return read_catalog_version(conn) > on_disk
+        finally:
+            conn.close()
+
+    def _file_lock(self):
+        return _FileLock(f"{self.path}.lock")
+
+    def ensure_poller(self) -> None:
+        """Start the polling thread in this process (once per pid, so it survives forks)"""
+        if self._poller_pid == os.getpid():
+            return
+        self._poller_pid = os.getpid()
+        self._leader_file = None
+        thread = threading.Thread(target=self._poll_loop, name='catalog-snapshot-poller', daemon=True)
+        thread.start()
+
+    def _is_leader(self) -> bool:
+        if fcntl is None:
+            return True
+        if self._leader_file is None:
+            leader_file = open(f"{self.path}.leader", 'a')
+            try:
+                fcntl.flock(leader_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                leader_file.close()
+                return False
+            self._leader_file = leader_file
+        return True
+
+    def _poll_loop(self) -> None:
+        while True:
+            # A requested publish runs in any worker; the file lock and the
+            # staleness check keep concurrent publishers from clashing
+            requested = self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            force, self._force_requested = self._force_requested, False
+            try:
+                if requested or self._is_leader():
+                    self.publish(force=force)
+            except Exception as e:
+                print(f"Catalog snapshot poller error: {e}")
+
+
+class _FileLock:
+    """Exclusive advisory lock on a side file (no-op without fcntl)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._file = open(self.path, 'a')
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+        return False
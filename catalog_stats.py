@@ -0,0 +1,152 @@
+# catalog_stats.py - Catalog statistics computed in one pass per table
+"""
+Counters for the admin dashboard (/api/stats/overview) plus breakdowns per
+category, brand and material.
+
+compute_catalog_stats() reads each catalog table once with a grouped query
+(instead of one COUNT/AVG scan per counter) inside a single read transaction.
+CatalogStats keeps the result in memory and only recomputes it when the
+catalog version counter (see catalog_cache.py) has moved.
+"""
+
+import threading
+from typing import Dict
+
+from catalog_cache import read_catalog_version
+
+
+BREAKDOWNS = ('category', 'brand', 'material')
+
+
+def compute_catalog_stats(conn) -> Dict:
+    """
+    Overview counters and breakdowns from four single-pass queries.
+
+    Returns:
+        {'version', 'overview': {...}, 'breakdowns': {'category', 'brand', 'material'}}
+    """
+    cursor = conn.cursor()
+    cursor.execute('BEGIN')
+    try:
+        version = read_catalog_version(conn)
+
+        # Items: one scan grouped by (category, brand)
+        cursor.execute('''
+        SELECT category, brand, COUNT(*) AS items, SUM(weight_grams) AS total_weight
+        FROM clothing_items
+        GROUP BY category, brand
+        ''')
+        items_count = 0
+        total_weight = 0
+        by_category = {}
+        by_brand = {}
+        for row in cursor:
+            items_count += row['items']
+            total_weight += row['total_weight'] or 0
+            for breakdown, key in ((by_category, row['category']), (by_brand, row['brand'])):
+                if key is None:
+                    continue
+                entry = breakdown.setdefault(key, {'items': 0, 'total_weight': 0})
+                entry['items'] += row['items']
+                entry['total_weight'] += row['total_weight'] or 0
+
+        # Compositions: one scan grouped by material
+        cursor.execute('''
+        SELECT material_id, COUNT(DISTINCT qr_code) AS items, AVG(percentage) AS avg_percentage
+        FROM clothing_material_composition
+        GROUP BY material_id
+        ''')
+        usage = {row['material_id']: dict(row) for row in cursor}
+
+        # Impacts: one scan grouped by (material, category)
+        cursor.execute('''
+        SELECT material_id, impact_category, COUNT(*) AS impacts
+        FROM environmental_impacts
+        GROUP BY material_id, impact_category
+        ''')
+        impacts_count = 0
+        impact_categories = set()
+        impacts_by_material = {}
+        for row in cursor:
+            impacts_count += row['impacts']
+            if row['impact_category'] is not None:
+                impact_categories.add(row['impact_category'])
+            impacts_by_material[row['material_id']] = impacts_by_material.get(row['material_id'], 0) + row['impacts']
+
+        cursor.execute('SELECT material_id, material_name FROM materials')
+        by_material = {}
+        for row in cursor:
+            material_usage = usage.get(row['material_id'], {})
+            avg_percentage = material_usage.get('avg_percentage')
+            by_material[row['material_name']] = {
+                'items': material_usage.get('items', 0),
+                'avg_percentage': round(avg_percentage, 1) if avg_percentage is not None else None,
+                'impact_count': impacts_by_material.get(row['material_id'], 0)
+            }
+    finally:
+        conn.commit()
+
+    for breakdown in (by_category, by_brand):
+        for entry in breakdown.values():
+            entry['avg_weight'] = round(entry.pop('total_weight') / entry['items'], 1) if entry['items'] else 0
+
+    avg_weight = total_weight / items_count if items_count else 0
+    return {
+        'version': version,
+        'overview': {
+            'items_count': items_count,
+            'materials_count': len(by_material),
+            'impacts_count': impacts_count,
+            'brands_count': len(by_brand),
+            'categories_count': len(by_category),
+            'impact_categories_count': len(impact_categories),
+            'avg_weight': round(avg_weight, 1) if avg_weight else 0
+        },
+        'breakdowns': {
+            'category': by_category,
+            'brand': by_brand,
+            'material': by_material
+        }
+    }
+
+
+class CatalogStats:
+    """
+    Catalog statistics kept in memory until the catalog version changes.
+
+    The stats are stamped with catalog_cache.version (the snapshot header in
+    snapshot mode), the same counter they are checked against, so a snapshot
+    lagging the database does not force a recompute on every request.
+    """
+
+    def __init__(self, catalog_cache):
+        self.catalog_cache = catalog_cache
+        self._cached = None  # (catalog_cache.version, stats)
+        self._lock = threading.Lock()
+
+    def get(self) -> Dict:
+        self.catalog_cache.revalidate()
+        version = self.catalog_cache.version
+        cached = self._cached
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        with self._lock:
+            if self._cached is None or self._cached[0] != version:
+                conn = self.catalog_cache.get_connection()
+                try:
+                    self._cached = (version, compute_catalog_stats(conn))
+                finally:
+                    conn.close()
+            return self._cached[1]
+
+    def overview(self, breakdowns=()) -> Dict:
+        """Overview counters, plus the requested breakdowns under 'breakdowns'"""
+        stats = self.get()
+        result = dict(stats['overview'])
+        if breakdowns:
+            result['breakdowns'] = {name: stats['breakdowns'][name] for name in breakdowns}
+        return result
+
+    def invalidate(self) -> None:
+        self._cached = None
@@ -0,0 +1,232 @@
+# catalog_writes.py - Atomic, batched writes of clothing items and compositions
+"""
+Item rows and their material compositions are written together in one
+transaction, so a failed request never leaves an item without (or with half
+of) its composition.
+
+Per batch, whatever its size:
+    - one IN (...) lookup for the existing QR codes
+    - material names resolved to material_ids through the MaterialResolver
+      map (material_names.py), which also accepts aliases
+    - one executemany for the item rows and one for the composition rows
+
+Unknown materials, duplicate or missing QR codes and bad percentages are
+reported as CatalogWriteError before anything is written.
+"""
+
+from collections import Counter
+from typing import Dict, List, Optional
+
+from catalog_cache import SQLITE_MAX_PARAMS
+
+
+MAX_BULK_ITEMS = 10000
+WRITE_MODES = ('insert', 'update', 'upsert')
+
+
+class CatalogWriteError(ValueError):
+    """Invalid item write (reported to the client as HTTP 400)"""
+
+
+class UnknownItemError(CatalogWriteError):
+    """Update of QR codes that are not in the catalog (HTTP 404)"""
+
+
+# ============================================================================
+# PARSING
+# ============================================================================
+
+def _text(data: Dict, key: str) -> Optional[str]:
+    value = str(data.get(key) or '').strip()
+    return value if value else None
+
+
+def parse_item(data: Dict, qr_code: Optional[str] = None) -> Dict:
+    """
+    Validate one item payload (the /api/items JSON shape).
+
+    Args:
+        data: {'qr_code', 'name', 'brand', 'category', 'weight', 'materials': [
+               {'material_name', 'percentage'}, ...]}
+        qr_code: Overrides data['qr_code'] (PUT /api/items/<qr_code>)
+
+    Materials without a name or with a zero percentage are skipped, as before.
+    """
+    if not isinstance(data, dict):
+        raise CatalogWriteError('Each item must be a JSON object')
+
+    qr_code = qr_code or _text(data, 'qr_code')
+    name = _text(data, 'name')
+    weight = data.get('weight')
+    if not qr_code or not name or not weight:
+        raise CatalogWriteError('QR code, name, and weight are required')
+    try:
+        weight = int(float(weight))
+    except (TypeError, ValueError):
+        raise CatalogWriteError(f"{qr_code}: weight must be a number")
+    if weight <= 0:
+        raise CatalogWriteError(f"{qr_code}: weight must be positive")
+
+    materials = []
+    for material_data in data.get('materials') or []:
+        if not material_data:
+            continue
+        if not isinstance(material_data, dict):
+            raise CatalogWriteError(f"{qr_code}: each material must be an object with material_name and percentage")
+        material_name = str(material_data.get('material_name') or '').strip().lower()
+        percentage = material_data.get('percentage')
+        if not material_name or not percentage:
+            continue
+        try:
+            percentage = float(percentage)
+        except (TypeError, ValueError):
+            raise CatalogWriteError(f"{qr_code}: percentage of {material_name} must be a number")
+        if percentage <= 0:
+            continue
+        if percentage > 100:
+            raise CatalogWriteError(f"{qr_code}: percentage of {material_name} is above 100")
+        materials.append((material_name, percentage))
+
+    return {
+        'qr_code': qr_code,
+        'name': name,
+        'brand': _text(data, 'brand'),
+        'category': _text(data, 'category'),
+        'weight': weight,
+        'materials': materials
+    }
+
+
+# ============================================================================
+# SCHEMA
+# ============================================================================
+
+_indexed_databases = set()
+
+
+def ensure_composition_index(conn) -> None:
+    """
+    Index compositions by QR code (replacing a composition deletes by qr_code).
+    New databases get it from database_setup.create_tables; older ones are
+    indexed here, once per database file and process, outside any write.
+    """
+    database = conn.execute('PRAGMA database_list').fetchone()[2]
+    if database and database in _indexed_databases:
+        return
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_composition_qr_code ON clothing_material_composition(qr_code)')
+    conn.commit()
+    if database:
+        _indexed_databases.add(database)
+
+
+# ============================================================================
+# SET-BASED LOOKUPS
+# ============================================================================
+
+def _select_in(cursor, query: str, values: List) -> List:
+    """Run `query` (with one {placeholders} slot) over values in IN-list chunks"""
+    rows = []
+    for start in range(0, len(values), SQLITE_MAX_PARAMS):
+        chunk = values[start:start + SQLITE_MAX_PARAMS]
+        cursor.execute(query.format(placeholders=','.join('?' * len(chunk))), chunk)
+        rows.extend(cursor.fetchall())
+    return rows
+
+
+def existing_qr_codes(cursor, qr_codes: List[str]) -> set:
+    rows = _select_in(cursor, 'SELECT qr_code FROM clothing_items WHERE qr_code IN ({placeholders})',
+                      sorted(set(qr_codes)))
+    return {row[0] for row in rows}
+
+
+# ============================================================================
+# WRITES
+# ============================================================================
+
+def write_items(conn, items: List[Dict], resolver, mode: str = 'insert') -> Dict:
+    """
+    Insert or update parsed items (parse_item) and replace their compositions.
+
+    All rows are written in one IMMEDIATE transaction; on any error nothing is
+    written.
+
+    Args:
+        resolver: MaterialResolver for the material names
+        mode: 'insert' - every QR code must be new
+              'update' - every QR code must exist (UnknownItemError otherwise)
+              'upsert' - new QR codes are inserted, existing ones updated
+
+    Returns:
+        {'items': n, 'created': n, 'updated': n, 'compositions': n}
+    """
+    if mode not in WRITE_MODES:
+        raise CatalogWriteError(f"Unknown write mode: {mode}")
+    if not items:
+        raise CatalogWriteError('No items to write')
+
+    qr_codes = [item['qr_code'] for item in items]
+    if len(set(qr_codes)) != len(qr_codes):
+        duplicates = sorted(code for code, count in Counter(qr_codes).items() if count > 1)
+        raise CatalogWriteError(f"QR codes listed more than once: {', '.join(duplicates[:20])}")
+
+    material_names = [name for item in items for name, _ in item['materials']]
+    material_ids = resolver.resolve_many(material_names)
+    unknown = sorted({name for name in material_names if name not in material_ids})
+    if unknown:
+        raise CatalogWriteError(f"Unknown material: {', '.join(unknown[:20])}")
+
+    ensure_composition_index(conn)
+    cursor = conn.cursor()
+    # IMMEDIATE: the existence checks and the writes happen under the write lock
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        existing = existing_qr_codes(cursor, qr_codes)
+        if mode == 'insert' and existing:
+            raise CatalogWriteError(f"QR code already exists: {', '.join(sorted(existing)[:20])}")
+        if mode == 'update' and len(existing) != len(qr_codes):
+            missing = sorted(set(qr_codes) - existing)
+            raise UnknownItemError(f"Item not found: {', '.join(missing[:20])}")
+
+        if mode == 'insert':
+            cursor.executemany('''
+            INSERT INTO clothing_items (qr_code, item_name, brand, category, weight_grams)
+            VALUES (?, ?, ?, ?, ?)
+            ''', [(item['qr_code'], item['name'], item['brand'], item['category'], item['weight'])
+                  for item in items])
+        elif mode == 'upsert':
+            cursor.executemany('''
+            INSERT INTO clothing_items (qr_code, item_name, brand, category, weight_grams)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(qr_code) DO UPDATE SET
+                item_name=excluded.item_name, brand=excluded.brand,
+                category=excluded.category, weight_grams=excluded.weight_grams
+            ''', [(item['qr_code'], item['name'], item['brand'], item['category'], item['weight'])
+                  for item in items])
+        else:
+            cursor.executemany('''
+            UPDATE clothing_items
+            SET item_name=?, brand=?, category=?, weight_grams=?
+            WHERE qr_code=?
+            ''', [(item['name'], item['brand'], item['category'], item['weight'], item['qr_code'])
+                  for item in items])
+        if existing:
+            cursor.executemany('DELETE FROM clothing_material_composition WHERE qr_code=?',
+                               [(code,) for code in existing])
+
+        compositions = [(item['qr_code'], material_ids[name], percentage)
+                        for item in items for name, percentage in item['materials']]
+        cursor.executemany('''
+        INSERT INTO clothing_material_composition (qr_code, material_id, percentage)
+        VALUES (?, ?, ?)
+        ''', compositions)
+
+        conn.commit()
+        return {
+            'items': len(items),
+            'created': len(items) - len(existing),
+            'updated': len(existing),
+            'compositions': len(compositions)
+        }
+    except Exception:
+        conn.rollback()
+        raise
@@ -9,6 +9,7 @@ import sqlite3
 from pathlib import Path
 import numpy as np
 from database_setup import FashionEnvironmentDB
+from material_names import normalize_material_name
 
 def clean_material_name(name):
     """Clean and standardize material names"""
@@ -25,7 +26,7 @@ def clean_material_name(name):
         'Viscose': 'viscose',
         'Wool': 'wool'
     }
-    return name_mapping.get(name, name.lower().replace(' ', '_'))
+    return name_mapping.get(name, normalize_material_name(name))
 
 def import_plastic_textiles_data():
     """Import data from Plastic based Textiles CSV"""
@@ -47,13 +48,11 @@ def import_plastic_textiles_data():
     for material in unique_materials:
         clean_name = clean_material_name(material)
         
-        # Check if material exists
-        cursor = db.conn.cursor()
-        cursor.execute('SELECT material_id FROM materials WHERE material_name = ?', (clean_name,))
-        existing = cursor.fetchone()
+        # Check if material exists (under this name or an alias)
+        existing = db.materials.resolve(clean_name)
         
-        if existing:
-            material_mapping[material] = existing['material_id']
+        if existing is not None:
+            material_mapping[material] = existing
             print(f"✅ Material '{clean_name}' already exists")
         else:
             # Add new material
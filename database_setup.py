@@ -3,6 +3,8 @@ import json
 from datetime import datetime
 from pathlib import Path
 
+from material_names import MaterialResolver, normalize_material_name
+
 class FashionEnvironmentDB:
     def __init__(self, db_path="fashion_env.db"):
         """Initialize database connection and create tables if they don't exist"""
@@ -10,6 +12,13 @@ class FashionEnvironmentDB:
         self.conn = sqlite3.connect(db_path)
         self.conn.row_factory = sqlite3.Row  # This allows dict-like access to rows
         self.create_tables()
+        self.materials = MaterialResolver(self)
+    
+    def get_connection(self):
+        """Separate connection (used by the material name resolver)"""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
     
     def create_tables(self):
         """Create all necessary tables"""
@@ -63,6 +72,8 @@ class FashionEnvironmentDB:
             FOREIGN KEY (material_id) REFERENCES materials(material_id)
         )
         ''')
+        # Replacing an item's composition deletes by qr_code
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_composition_qr_code ON clothing_material_composition(qr_code)')
         
         # Scan history table
         cursor.execute('''
@@ -72,6 +83,7 @@ class FashionEnvironmentDB:
             scan_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             calculated_impacts TEXT,  -- JSON string
             session_id VARCHAR(50),
+            event_type VARCHAR(20) DEFAULT 'analyze',
             FOREIGN KEY (qr_code) REFERENCES clothing_items(qr_code)
         )
         ''')
@@ -86,8 +98,9 @@ class FashionEnvironmentDB:
             cursor.execute('''
             INSERT INTO materials (material_name, density_g_per_cm3, description)
             VALUES (?, ?, ?)
-            ''', (name.lower(), density, description))
+            ''', (normalize_material_name(name), density, description))
             self.conn.commit()
+            self.materials.invalidate()
             return cursor.lastrowid
         except sqlite3.IntegrityError:
             print(f"Material '{name}' already exists")
@@ -97,18 +110,16 @@ class FashionEnvironmentDB:
         """Add environmental impact data for a material"""
         cursor = self.conn.cursor()
         
-        # Get material ID
-        cursor.execute('SELECT material_id FROM materials WHERE material_name = ?', (material_name.lower(),))
-        material = cursor.fetchone()
+        material_id = self.materials.resolve(material_name)
         
-        if not material:
+        if material_id is None:
             print(f"Material '{material_name}' not found. Add the material first.")
             return None
         
         cursor.execute('''
         INSERT INTO environmental_impacts (material_id, impact_category, impact_value, unit, source)
         VALUES (?, ?, ?, ?, ?)
-        ''', (material['material_id'], category, value, unit, source))
+        ''', (material_id, category, value, unit, source))
         
         self.conn.commit()
         return cursor.lastrowid
@@ -131,18 +142,16 @@ class FashionEnvironmentDB:
         """Add material composition for a clothing item"""
         cursor = self.conn.cursor()
         
-        # Get material ID
-        cursor.execute('SELECT material_id FROM materials WHERE material_name = ?', (material_name.lower(),))
-        material = cursor.fetchone()
+        material_id = self.materials.resolve(material_name)
         
-        if not material:
+        if material_id is None:
             print(f"Material '{material_name}' not found")
             return False
         
         cursor.execute('''
         INSERT INTO clothing_material_composition (qr_code, material_id, percentage)
         VALUES (?, ?, ?)
-        ''', (qr_code, material['material_id'], percentage))
+        ''', (qr_code, material_id, percentage))
         
         self.conn.commit()
         return True
@@ -166,13 +175,15 @@ class FashionEnvironmentDB:
     
     def get_environmental_impact(self, material_name, impact_category):
         """Get environmental impact value for a material and category"""
+        material_id = self.materials.resolve(material_name)
+        if material_id is None:
+            return None
         cursor = self.conn.cursor()
         cursor.execute('''
-        SELECT ei.impact_value, ei.unit
-        FROM environmental_impacts ei
-        JOIN materials m ON ei.material_id = m.material_id
-        WHERE m.material_name = ? AND ei.impact_category = ?
-        ''', (material_name.lower(), impact_category))
+        SELECT impact_value, unit
+        FROM environmental_impacts
+        WHERE material_id = ? AND impact_category = ?
+        ''', (material_id, impact_category))
         return cursor.fetchone()
     
     def calculate_total_impact(self, qr_code, impact_category):
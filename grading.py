@@ -0,0 +1,95 @@
+# grading.py - Score-to-grade lookup shared by the scorers and the batch paths
+"""
+One definition of the letter-grade bands. GRADE_THRESHOLDS holds the lower
+bound of every grade above F, ascending. A score gets the grade of the highest
+threshold it reaches (score >= threshold), as the per-scorer if-chains did.
+Non-finite scores (NaN, +/-inf) get the lowest grade, as NaN did there.
+
+    score_to_grade(72.5)              -> 'B'     (one bisect over the thresholds)
+    grade_scores([91.0, 12.0])        -> ['A+', 'F']
+    grade_distribution(final_scores)  -> {'A+': 1, 'A': 0, ..., 'F': 1}
+
+grade_scores, grade_bands and grade_distribution accept lists or numpy
+arrays; with numpy a whole column of scores is graded in one searchsorted
+pass. The bands are tuned here for every scorer at once, or a GradeScale with
+other thresholds is built for a one-off grading.
+"""
+
+import math
+from bisect import bisect_right
+from typing import Dict, List, Sequence
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:  # pure-Python fallback
+    np = None
+    NUMPY_AVAILABLE = False
+
+
+# Lower bound of each grade above F (ascending), and the grades from worst to best
+GRADE_THRESHOLDS = (40, 45, 50, 55, 60, 65, 70, 75, 80, 85, 90)
+GRADES = ('F', 'D', 'D+', 'C-', 'C', 'C+', 'B-', 'B', 'B+', 'A-', 'A', 'A+')
+
+
+class GradeScale:
+    """
+    Letter grades over ascending score thresholds.
+
+    Args:
+        thresholds: Lower bound of every grade but the lowest, strictly ascending
+        grades: Grades from worst to best (one more than thresholds)
+    """
+
+    def __init__(self, thresholds: Sequence[float] = GRADE_THRESHOLDS, grades: Sequence[str] = GRADES):
+        thresholds = tuple(thresholds)
+        if len(grades) != len(thresholds) + 1:
+            raise ValueError('grades needs exactly one more entry than thresholds')
+        if any(upper <= lower for lower, upper in zip(thresholds, thresholds[1:])):
+            raise ValueError('thresholds must be strictly ascending')
+        self.thresholds = thresholds
+        self.grades = tuple(grades)
+        if NUMPY_AVAILABLE:
+            self._threshold_array = np.array(thresholds, dtype=float)
+            self._grade_array = np.array(self.grades, dtype=object)
+
+    def grade(self, score: float) -> str:
+        """Letter grade of one score"""
+        if not math.isfinite(score):
+            return self.grades[0]
+        return self.grades[bisect_right(self.thresholds, score)]
+
+    def bands(self, scores):
+        """Band index (position in grades) per score: numpy array with numpy, else a list"""
+        if NUMPY_AVAILABLE:
+            values = np.asarray(scores, dtype=float)
+            bands = np.searchsorted(self._threshold_array, values, side='right')
+            bands[~np.isfinite(values)] = 0
+            return bands
+        thresholds = self.thresholds
+        return [bisect_right(thresholds, score) if math.isfinite(score) else 0 for score in scores]
+
+    def grade_many(self, scores) -> List[str]:
+        """Letter grade per score"""
+        if NUMPY_AVAILABLE:
+            return self._grade_array[self.bands(scores)].tolist()
+        grades = self.grades
+        return [grades[band] for band in self.bands(scores)]
+
+    def distribution(self, scores) -> Dict[str, int]:
+        """Number of scores per grade, best grade first (grades without scores count 0)"""
+        if NUMPY_AVAILABLE:
+            counts = np.bincount(self.bands(scores), minlength=len(self.grades)).tolist()
+        else:
+            counts = [0] * len(self.grades)
+            for band in self.bands(scores):
+                counts[band] += 1
+        return {grade: counts[band] for band, grade in reversed(list(enumerate(self.grades)))}
+
+
+DEFAULT_GRADE_SCALE = GradeScale()
+
+score_to_grade = DEFAULT_GRADE_SCALE.grade
+grade_bands = DEFAULT_GRADE_SCALE.bands
+grade_scores = DEFAULT_GRADE_SCALE.grade_many
+grade_distribution = DEFAULT_GRADE_SCALE.distribution
@@ -0,0 +1,43 @@
+# gunicorn.conf.py - Gunicorn settings and warm-start hooks
+"""
+Warm-start configuration (all optional, via environment variables):
+
+    WARMUP_ENABLED=0              disable preloading entirely
+    WARMUP_PRECOMPUTE_SCORES=0    only load the catalog, compute scores on demand
+    CATALOG_SNAPSHOT_PATH=<file>  share one memory-mapped catalog snapshot between
+                                  all workers (see catalog_snapshot.py); the master
+                                  publishes it once before forking
+"""
+
+import os
+
+warmup_enabled = os.environ.get('WARMUP_ENABLED', '1') == '1'
+warmup_precompute_scores = os.environ.get('WARMUP_PRECOMPUTE_SCORES', '1') == '1'
+catalog_snapshot_path = os.environ.get('CATALOG_SNAPSHOT_PATH')
+
+
+def when_ready(server):
+    """Runs once in the master before the first workers are forked"""
+    if not (warmup_enabled and catalog_snapshot_path):
+        return
+
+    from warmup import publish_snapshot
+    try:
+        version = publish_snapshot()
+        server.log.info(f"Catalog snapshot published at version {version}")
+    except Exception as e:
+        # Workers publish it themselves (or fall back to the database)
+        server.log.warning(f"Could not publish catalog snapshot: {e}")
+
+
+def post_fork(server, worker):
+    """Runs in every new worker (initial boot and recycles) before it accepts requests"""
+    if not warmup_enabled:
+        return
+
+    from warmup import warm_up
+    try:
+        report = warm_up(precompute_scores=warmup_precompute_scores)
+        server.log.info(f"Worker {worker.pid} warmed up: {report}")
+    except Exception as e:
+        server.log.warning(f"Worker {worker.pid} warm-up failed, continuing cold: {e}")
@@ -0,0 +1,62 @@
+# http_cache.py - Conditional GET support (ETag / If-None-Match)
+"""
+ETags for read endpoints whose content only changes with a version counter
+(the catalog version, the scoring config fingerprint, ...).
+
+The ETag combines the version with the request path and query string, so
+differently paged or projected responses get different tags. When the client
+already has the current tag the view is not run at all and a 304 is returned;
+the version itself comes from memory (CatalogCache), not from SQLite.
+"""
+
+import functools
+import hashlib
+from typing import Callable, Optional
+
+from flask import make_response, request
+
+
+# Cache-Control policies
+NO_CACHE = 'no-cache'                 # store, but revalidate on every use
+PRIVATE_NO_CACHE = 'private, no-cache'
+SHORT_PUBLIC = 'public, max-age=60'
+
+
+def make_etag(version: str, key: str) -> str:
+    return hashlib.blake2b(f"{version}|{key}".encode('utf-8'), digest_size=12).hexdigest()
+
+
+def conditional_get(version_func: Callable[[], Optional[str]], cache_control: str = NO_CACHE):
+    """
+    Decorate a GET view with ETag / If-None-Match handling.
+
+    Args:
+        version_func: Returns the current version of the view's data (None
+            disables caching for the request)
+        cache_control: Cache-Control header for 200 and 304 responses
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+
+            # Read the version before building the response: if the data changes
+            # meanwhile the tag is older than the content and the next request refetches
+            version = version_func()
+            if version is None:
+                return view(*args, **kwargs)
+
+            etag = make_etag(version, request.full_path)
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = cache_control
+            return response
+        return wrapper
+    return decorator
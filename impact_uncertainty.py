@@ -0,0 +1,242 @@
+# impact_uncertainty.py - Monte Carlo uncertainty bands for item impacts
+"""
+The environmental_impacts table can hold several values for the same material
+and category, one per `source` (data_cleanup.py keeps only the most trusted
+one; the scorers use the first row). Here every source is kept and treated as
+an equally likely estimate:
+
+    draw = value of a uniformly chosen source * lognormal(0, SOURCE_SIGMA)
+
+The lognormal factor (mean 1) models the spread within one source, so a
+single-source value still gets an uncertainty band.
+
+For an item, each (material, category) is sampled `draws` times in one
+vectorized call, combined with the composition and weight, and pushed through
+the Initial Cost normalization. Lasting Cost does not depend on impact data,
+so the final score only varies through Initial Cost. Reported: mean, standard
+deviation and a central confidence interval for water/carbon/energy and for
+the final score, plus the probability of each final grade.
+"""
+
+import math
+import random
+import threading
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:  # pure-Python fallback (fewer draws)
+    np = None
+    NUMPY_AVAILABLE = False
+
+from grading import GRADES, grade_distribution
+
+
+IMPACT_CATEGORIES = ('water_usage', 'carbon_footprint', 'energy_usage')
+
+SOURCE_SIGMA = 0.15
+DEFAULT_DRAWS = 10000
+MAX_DRAWS = 100000
+FALLBACK_MAX_DRAWS = 2000
+DEFAULT_CONFIDENCE = 0.9
+
+
+class UncertaintyError(ValueError):
+    """Invalid uncertainty request (reported to the client as HTTP 400)"""
+
+
+def fetch_impact_sources(cursor) -> Dict:
+    """Map (material_name, impact_category) to every source's value"""
+    cursor.execute('''
+    SELECT m.material_name, ei.impact_category, ei.impact_value, ei.unit, ei.source
+    FROM environmental_impacts ei
+    JOIN materials m ON ei.material_id = m.material_id
+    ORDER BY ei.impact_id
+    ''')
+    sources = {}
+    for row in cursor:
+        entry = sources.setdefault((row['material_name'].lower(), row['impact_category']), {
+            'unit': row['unit'], 'values': [], 'sources': []
+        })
+        entry['values'].append(float(row['impact_value']))
+        entry['sources'].append(row['source'])
+    return sources
+
+
+def _sample_values(rng, values: List[float], draws: int):
+    """`draws` samples of one impact value (numpy array, or list without numpy)"""
+    mu = -SOURCE_SIGMA ** 2 / 2  # keeps the mean of the noise factor at 1
+    if NUMPY_AVAILABLE:
+        picks = np.asarray(values)[rng.integers(len(values), size=draws)] if len(values) > 1 \
+            else np.full(draws, values[0])
+        return picks * rng.lognormal(mu, SOURCE_SIGMA, draws)
+    return [rng.choice(values) * rng.lognormvariate(mu, SOURCE_SIGMA) for _ in range(draws)]
+
+
+def _summary(samples, confidence: float, digits: int = 4) -> Dict:
+    """Mean, standard deviation and central interval of a sample"""
+    lower_q = (1 - confidence) / 2
+    if NUMPY_AVAILABLE:
+        mean = float(samples.mean())
+        std = float(samples.std())
+        lower, median, upper = (float(v) for v in np.quantile(samples, [lower_q, 0.5, 1 - lower_q]))
+    else:
+        ordered = sorted(samples)
+        n = len(ordered)
+        mean = sum(ordered) / n
+        std = math.sqrt(sum((v - mean) ** 2 for v in ordered) / n)
+        lower, median, upper = (ordered[min(n - 1, int(q * n))] for q in (lower_q, 0.5, 1 - lower_q))
+    return {
+        'mean': round(mean, digits),
+        'std': round(std, digits),
+        'median': round(median, digits),
+        'lower': round(lower, digits),
+        'upper': round(upper, digits)
+    }
+
+
+def _grade_probabilities(final_scores, draws: int) -> Dict[str, float]:
+    # One vectorized pass over all draws, same bands as the scorer's grades
+    counts = grade_distribution(final_scores)
+    return {grade: round(counts[grade] / draws, 4) for grade in GRADES if counts[grade]}
+
+
+class UncertaintyEngine:
+    """
+    Monte Carlo impact and score intervals for catalog items.
+
+    The per-source impact table is reloaded when the catalog version moves.
+    Results can be memoized in the catalog cache's score memo (same invalidation
+    as the dual scores).
+    """
+
+    def __init__(self, catalog_cache, scorer_func):
+        self.catalog_cache = catalog_cache
+        self.scorer_func = scorer_func  # returns the current DualSustainabilityScorer
+        self._sources = None
+        self._sources_version = None
+        self._lock = threading.Lock()
+
+    def impact_sources(self) -> Dict:
+        self.catalog_cache.revalidate()
+        with self._lock:
+            if self._sources_version != self.catalog_cache.version:
+                conn = self.catalog_cache.get_connection()
+                try:
+                    self._sources = fetch_impact_sources(conn.cursor())
+                finally:
+                    conn.close()
+                self._sources_version = self.catalog_cache.version
+            return self._sources
+
+    def item_uncertainty(self, qr_code: str, draws: int = DEFAULT_DRAWS,
+                         confidence: float = DEFAULT_CONFIDENCE, seed: Optional[int] = None,
+                         use_cache: bool = True) -> Optional[Dict]:
+        """
+        Simulate one item; None if it does not exist.
+
+        Args:
+            draws: Monte Carlo samples (capped at FALLBACK_MAX_DRAWS without numpy)
+            confidence: Width of the reported central interval (0.5 - 0.99)
+            seed: RNG seed; by default derived from the QR code so repeated
+                requests give the same bands
+            use_cache: Serve / store the result in the score memo (default
+                draws and confidence only, so client-chosen parameters cannot
+                grow the memo)
+        """
+        if not isinstance(draws, int) or not 100 <= draws <= MAX_DRAWS:
+            raise UncertaintyError(f"draws must be between 100 and {MAX_DRAWS}")
+        if not 0.5 <= confidence <= 0.99:
+            raise UncertaintyError('confidence must be between 0.5 and 0.99')
+        confidence = round(confidence, 2)
+        defaults = draws == DEFAULT_DRAWS and confidence == DEFAULT_CONFIDENCE
+        if not NUMPY_AVAILABLE:
+            draws = min(draws, FALLBACK_MAX_DRAWS)
+
+        scorer = self.scorer_func()
+        compute = lambda: self._simulate(scorer, qr_code, draws, confidence, seed)
+        if not use_cache or seed is not None or not defaults:
+            return compute()
+        return self.catalog_cache.cached_score('uncertainty', qr_code, compute, scorer.compiled.fingerprint)
+
+    def _simulate(self, scorer, qr_code: str, draws: int, confidence: float, seed: Optional[int]) -> Optional[Dict]:
+        item = self.catalog_cache.get_clothing_item(qr_code)
+        if not item:
+            return None
+        item = dict(item)
+        materials = [dict(mat) for mat in self.catalog_cache.get_material_composition(qr_code)]
+        components = scorer.get_component_scores(qr_code)
+        if not materials or not components:
+            return {'qr_code': qr_code, 'error': 'No material composition found'}
+
+        if seed is None:
+            seed = sum(ord(ch) * 31 ** i for i, ch in enumerate(qr_code)) % (2 ** 32)
+        rng = np.random.default_rng(seed) if NUMPY_AVAILABLE else random.Random(seed)
+        sources = self.impact_sources()
+        ranges = scorer._get_dynamic_ranges()
+        weight_kg = item['weight_grams'] / 1000
+
+        impacts = {}
+        category_scores = {}
+        for category in IMPACT_CATEGORIES:
+            total = np.zeros(draws) if NUMPY_AVAILABLE else [0.0] * draws
+            unit = None
+            source_count = 0
+            for material in materials:
+                entry = sources.get((material['material_name'].lower(), category))
+                if not entry:
+                    continue
+                # Item totals, not per kg
+                unit = entry['unit'].replace('/kg', '')
+                source_count = max(source_count, len(entry['values']))
+                share = material['percentage'] / 100 * weight_kg
+                samples = _sample_values(rng, entry['values'], draws)
+                if NUMPY_AVAILABLE:
+                    total += samples * share
+                else:
+                    total = [t + s * share for t, s in zip(total, samples)]
+
+            impacts[category] = dict(_summary(total, confidence), unit=unit, max_sources=source_count)
+
+            # Initial Cost normalization (same as DualSustainabilityScorer._calculate_initial_cost)
+            min_val, max_val = ranges.get(category, (0, 0))
+            if max_val > min_val:
+                if NUMPY_AVAILABLE:
+                    category_scores[category] = np.clip((max_val - total) / (max_val - min_val), 0, 1) * 100
+                else:
+                    category_scores[category] = [max(0, min(1, (max_val - t) / (max_val - min_val))) * 100
+                                                 for t in total]
+            else:
+                category_scores[category] = 50.0
+
+        penalty = components['composition_penalty']
+        lasting = max(0, sum(components['lasting'][key] * weight
+                             for key, weight in scorer.compiled.lasting_cost_weights) - penalty)
+        if NUMPY_AVAILABLE:
+            initial = sum(np.broadcast_to(category_scores.get(key, components['initial'].get(key, 0.0)), (draws,)) * weight
+                          for key, weight in scorer.compiled.initial_cost_weights)
+            initial = np.maximum(0, initial - penalty)
+            final = (initial + lasting) / 2
+        else:
+            initial = [0.0] * draws
+            for key, weight in scorer.compiled.initial_cost_weights:
+                scores = category_scores.get(key, components['initial'].get(key, 0.0))
+                if not isinstance(scores, list):
+                    scores = [scores] * draws
+                initial = [i + s * weight for i, s in zip(initial, scores)]
+            initial = [max(0, i - penalty) for i in initial]
+            final = [(i + lasting) / 2 for i in initial]
+
+        return {
+            'qr_code': qr_code,
+            'item_name': item['item_name'],
+            'draws': draws,
+            'confidence': confidence,
+            'seed': seed,
+            'impacts': impacts,
+            'initial_cost': _summary(initial, confidence, digits=1),
+            'lasting_cost': round(lasting, 1),
+            'final_score': _summary(final, confidence, digits=1),
+            'grade_probabilities': _grade_probabilities(final, draws)
+        }
@@ -0,0 +1,497 @@
+# job_queue.py - Persistent background job queue for long-running admin tasks
+"""
+Admin work that used to run as a script in a terminal or inline in a request
+(data imports, cleanup, backups, catalog rescoring, feed imports) is enqueued
+as a row in the job_queue table and picked up by worker threads.
+
+    queue = JobQueue('fashion_env.db', workers=1)
+    queue.register('backup', run_backup, max_attempts=3)
+    job = queue.enqueue('backup')                  # returns immediately
+    queue.get(job['job_id'])                       # status, progress, result
+
+State lives in SQLite, so jobs survive restarts and every gunicorn worker
+(and `python job_queue.py worker`) sees the same queue. A job is claimed in
+a BEGIN IMMEDIATE transaction, which makes claiming atomic across processes.
+While a handler runs, a heartbeat thread renews the job's lease and picks up
+cancel requests. If the worker process dies, the lease expires and the job is
+queued again.
+
+Handlers are called as handler(params, context):
+    context.progress(fraction, message)   report progress (throttled writes)
+    context.cancelled / context.check()   cooperative cancellation
+A handler that raises is retried with exponential backoff until max_attempts;
+PermanentJobError fails the job at once.
+
+Usage:
+    python job_queue.py worker --threads 2        # dedicated worker process
+    python job_queue.py enqueue data_import
+    python job_queue.py list --status failed
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+
+JOB_STATUSES = ('queued', 'running', 'completed', 'failed', 'cancelled')
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 30.0
+RETRY_MAX_SECONDS = 3600.0
+LEASE_SECONDS = 120.0
+HEARTBEAT_SECONDS = 10.0
+PROGRESS_INTERVAL = 0.5
+POLL_INTERVAL = 2.0
+JOB_RETENTION_DAYS = 7
+OUTPUT_TAIL_LINES = 50
+
+
+class JobQueueError(ValueError):
+    """Invalid job request (reported to the client as HTTP 400)"""
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler for failures that retrying cannot fix"""
+
+
+class JobCancelledError(Exception):
+    """Raised by a handler (context.check()) after a cancel request"""
+
+
+def ensure_job_queue_schema(conn) -> None:
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS job_queue (
+        job_id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        params TEXT NOT NULL,
+        status TEXT NOT NULL,
+        priority INTEGER NOT NULL DEFAULT 0,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL,
+        run_after REAL NOT NULL,
+        heartbeat_at REAL,
+        cancel_requested INTEGER NOT NULL DEFAULT 0,
+        worker TEXT,
+        progress REAL NOT NULL DEFAULT 0,
+        message TEXT,
+        result TEXT,
+        error TEXT,
+        created_at TIMESTAMP NOT NULL,
+        started_at TIMESTAMP,
+        finished_at TIMESTAMP
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_job_queue_claim ON job_queue (status, run_after, priority)')
+    conn.commit()
+
+
+def retry_delay(attempts: int, base: float = RETRY_BASE_SECONDS) -> float:
+    """Backoff before the next attempt: base, 2*base, 4*base, ... capped at RETRY_MAX_SECONDS"""
+    return min(RETRY_MAX_SECONDS, base * 2 ** max(0, attempts - 1))
+
+
+def _row_to_job(row) -> Dict:
+    job = dict(row)
+    job['params'] = json.loads(job['params'])
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    job['cancel_requested'] = bool(job['cancel_requested'])
+    return job
+
+
+class JobContext:
+    """Handed to a handler: progress reporting and the cancel flag of its job"""
+
+    def __init__(self, queue: 'JobQueue', job: Dict):
+        self.queue = queue
+        self.job_id = job['job_id']
+        self.attempt = job['attempts']
+        self.max_attempts = job['max_attempts']
+        self.cancelled = job['cancel_requested']
+        self._last_progress = 0.0
+
+    @property
+    def final_attempt(self) -> bool:
+        return self.attempt >= self.max_attempts
+
+    def progress(self, fraction: float, message: Optional[str] = None, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        try:
+            conn = self.queue.get_connection()
+            try:
+                conn.execute('UPDATE job_queue SET progress = ?, message = COALESCE(?, message) WHERE job_id = ?',
+                             (round(max(0.0, min(1.0, fraction)), 4), message, self.job_id))
+                conn.commit()
+                # Reporting handlers see a cancel request without waiting for the next heartbeat
+                row = conn.execute('SELECT cancel_requested FROM job_queue WHERE job_id = ?', (self.job_id,)).fetchone()
+                if row and row['cancel_requested']:
+                    self.cancelled = True
+            finally:
+                conn.close()
+        except sqlite3.OperationalError:
+            # Database busy; progress is informational, the next report catches up
+            pass
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise JobCancelledError('Cancelled')
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue with in-process worker threads.
+
+    Args:
+        db_path: Database holding the job_queue table
+        workers: Worker threads per process (0: this process only enqueues)
+        work_dir: Directory for uploaded job inputs and script output
+        poll_interval: Seconds between checks for due jobs when idle
+        lease_seconds: A running job without a heartbeat for this long is requeued
+    """
+
+    def __init__(self, db_path: str, workers: int = 1, work_dir: str = 'jobs',
+                 poll_interval: float = POLL_INTERVAL, lease_seconds: float = LEASE_SECONDS):
+        self.db_path = db_path
+        self.workers = workers
+        self.work_dir = work_dir
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+
+        self._handlers = {}
+        self._schema_ready = False
+        self._workers_pid = None
+        self._wakeup = threading.Event()
+        self._last_purge = 0.0
+
+    def get_connection(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        if not self._schema_ready:
+            ensure_job_queue_schema(conn)
+            self._schema_ready = True
+        return conn
+
+    def _execute(self, sql: str, params=()) -> int:
+        conn = self.get_connection()
+        try:
+            rowcount = conn.execute(sql, params).rowcount
+            conn.commit()
+            return rowcount
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Handlers
+    # ------------------------------------------------------------------
+
+    def register(self, kind: str, handler: Callable, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 retry_base: float = RETRY_BASE_SECONDS) -> None:
+        """Register handler(params, context) -> result dict for a job kind"""
+        self._handlers[kind] = {'handler': handler, 'max_attempts': max_attempts, 'retry_base': retry_base}
+
+    def kinds(self) -> List[str]:
+        return sorted(self._handlers)
+
+    # ------------------------------------------------------------------
+    # Jobs
+    # ------------------------------------------------------------------
+
+    def enqueue(self, kind: str, params: Optional[Dict] = None, priority: int = 0,
+                max_attempts: Optional[int] = None, delay: float = 0.0) -> Dict:
+        """Add a job; it runs once a worker is free and `delay` seconds have passed"""
+        if kind not in self._handlers:
+            raise JobQueueError(f"kind must be one of: {', '.join(self.kinds())}")
+        if params is not None and not isinstance(params, dict):
+            raise JobQueueError('params must be an object')
+        if max_attempts is not None and (not isinstance(max_attempts, int) or max_attempts < 1):
+            raise JobQueueError('max_attempts must be a positive integer')
+
+        job_id = uuid.uuid4().hex[:12]
+        self._execute('''
+        INSERT INTO job_queue (job_id, kind, params, status, priority, max_attempts, run_after, created_at)
+        VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)
+        ''', (
+            job_id, kind, json.dumps(params or {}), int(priority),
+            max_attempts or self._handlers[kind]['max_attempts'],
+            time.time() + max(0.0, float(delay)), datetime.now().isoformat()
+        ))
+        self._wakeup.set()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        conn = self.get_connection()
+        try:
+            row = conn.execute('SELECT * FROM job_queue WHERE job_id = ?', (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return _row_to_job(row) if row else None
+
+    def list(self, status: Optional[str] = None, kind: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        """Jobs, newest first"""
+        if status is not None and status not in JOB_STATUSES:
+            raise JobQueueError(f"status must be one of: {', '.join(JOB_STATUSES)}")
+        conn = self.get_connection()
+        try:
+            rows = conn.execute('''
+            SELECT * FROM job_queue
+            WHERE (? IS NULL OR status = ?) AND (? IS NULL OR kind = ?)
+            ORDER BY created_at DESC LIMIT ?
+            ''', (status, status, kind, kind, max(1, min(limit, 500)))).fetchall()
+        finally:
+            conn.close()
+        return [_row_to_job(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        conn = self.get_connection()
+        try:
+            rows = conn.execute('SELECT status, COUNT(*) FROM job_queue GROUP BY status').fetchall()
+        finally:
+            conn.close()
+        return {status: count for status, count in rows}
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """Cancel a queued job, or ask the handler of a running job to stop"""
+        now = datetime.now().isoformat()
+        self._execute('''
+        UPDATE job_queue SET status = 'cancelled', cancel_requested = 1, finished_at = ?
+        WHERE job_id = ? AND status = 'queued'
+        ''', (now, job_id))
+        self._execute("UPDATE job_queue SET cancel_requested = 1 WHERE job_id = ? AND status = 'running'", (job_id,))
+        return self.get(job_id)
+
+    def purge(self, days: int = JOB_RETENTION_DAYS) -> int:
+        """Delete finished jobs older than `days`"""
+        cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+        return self._execute('''
+        DELETE FROM job_queue WHERE status IN ('completed', 'failed', 'cancelled') AND finished_at < ?
+        ''', (cutoff,))
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    def claim(self, worker: str) -> Optional[Dict]:
+        """Atomically take the next due job of a registered kind (None when idle)"""
+        if not self._handlers:
+            return None
+        now = time.time()
+        kinds = self.kinds()
+        placeholders = ','.join('?' * len(kinds))
+        conn = self.get_connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+
+            # Jobs of dead workers: retry, or fail once their attempts are used up
+            stale = now - self.lease_seconds
+            conn.execute('''
+            UPDATE job_queue SET status = 'cancelled', finished_at = ?
+            WHERE status = 'running' AND heartbeat_at < ? AND cancel_requested = 1
+            ''', (datetime.now().isoformat(), stale))
+            conn.execute('''
+            UPDATE job_queue SET status = 'queued', worker = NULL, run_after = ?,
+                   error = 'Worker stopped responding'
+            WHERE status = 'running' AND heartbeat_at < ? AND attempts < max_attempts
+            ''', (now, stale))
+            conn.execute('''
+            UPDATE job_queue SET status = 'failed', finished_at = ?, error = 'Worker stopped responding'
+            WHERE status = 'running' AND heartbeat_at < ?
+            ''', (datetime.now().isoformat(), stale))
+
+            row = conn.execute(f'''
+            SELECT job_id FROM job_queue
+            WHERE status = 'queued' AND run_after <= ? AND kind IN ({placeholders})
+            ORDER BY priority DESC, run_after, created_at
+            LIMIT 1
+            ''', (now, *kinds)).fetchone()
+            if row is None:
+                conn.commit()
+                return None
+            conn.execute('''
+            UPDATE job_queue SET status = 'running', attempts = attempts + 1, worker = ?, heartbeat_at = ?,
+                   started_at = ?, progress = 0, error = NULL
+            WHERE job_id = ?
+            ''', (worker, now, datetime.now().isoformat(), row['job_id']))
+            job = _row_to_job(conn.execute('SELECT * FROM job_queue WHERE job_id = ?', (row['job_id'],)).fetchone())
+            conn.commit()
+            return job
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def run_job(self, job: Dict) -> Dict:
+        """Run a claimed job in the calling thread and record the outcome"""
+        spec = self._handlers[job['kind']]
+        context = JobContext(self, job)
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(context, stop), name='job-heartbeat', daemon=True)
+        heartbeat.start()
+
+        try:
+            result = spec['handler'](job['params'], context)
+            self._finish(job['job_id'], 'completed', result=result, progress=1.0)
+        except JobCancelledError:
+            self._finish(job['job_id'], 'cancelled')
+        except Exception as e:
+            if isinstance(e, PermanentJobError) or job['attempts'] >= job['max_attempts']:
+                self._finish(job['job_id'], 'failed', error=str(e))
+            else:
+                self._execute('''
+                UPDATE job_queue SET status = 'queued', worker = NULL, run_after = ?, error = ?
+                WHERE job_id = ?
+                ''', (time.time() + retry_delay(job['attempts'], spec['retry_base']), str(e), job['job_id']))
+            print(f"Job {job['job_id']} ({job['kind']}) attempt {job['attempts']} failed: {e}")
+        finally:
+            stop.set()
+            heartbeat.join()
+        return self.get(job['job_id'])
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict] = None, error: Optional[str] = None,
+                progress: Optional[float] = None) -> None:
+        self._execute('''
+        UPDATE job_queue SET status = ?, result = ?, error = ?, progress = COALESCE(?, progress), finished_at = ?
+        WHERE job_id = ?
+        ''', (status, json.dumps(result) if result is not None else None, error, progress,
+              datetime.now().isoformat(), job_id))
+
+    def _heartbeat(self, context: JobContext, stop: threading.Event) -> None:
+        """Renew the lease and pick up cancel requests while a handler runs"""
+        while not stop.wait(min(HEARTBEAT_SECONDS, self.lease_seconds / 4)):
+            try:
+                conn = self.get_connection()
+                try:
+                    conn.execute('UPDATE job_queue SET heartbeat_at = ? WHERE job_id = ?', (time.time(), context.job_id))
+                    conn.commit()
+                    row = conn.execute('SELECT cancel_requested FROM job_queue WHERE job_id = ?',
+                                       (context.job_id,)).fetchone()
+                finally:
+                    conn.close()
+                if row and row['cancel_requested']:
+                    context.cancelled = True
+            except sqlite3.OperationalError:
+                # Database busy; the next beat is well within the lease
+                pass
+
+    def ensure_workers(self) -> None:
+        """Start the worker threads in this process (once per pid, so they survive forks)"""
+        if not self.workers or self._workers_pid == os.getpid():
+            return
+        self._workers_pid = os.getpid()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, args=(f"{os.getpid()}-{index}",),
+                                      name=f'job-worker-{index}', daemon=True)
+            thread.start()
+
+    def _worker_loop(self, worker: str) -> None:
+        while True:
+            try:
+                job = self.claim(worker)
+                if job is not None:
+                    self.run_job(job)
+                    continue
+                if time.monotonic() - self._last_purge > 3600:
+                    self._last_purge = time.monotonic()
+                    self.purge()
+            except sqlite3.OperationalError:
+                # Database busy; try again after the poll interval
+                pass
+            except Exception as e:
+                print(f"Job worker {worker} error: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+
+# ============================================================================
+# HANDLER HELPERS
+# ============================================================================
+
+def script_job(module: str, timeout: Optional[float] = None) -> Callable:
+    """
+    Handler that runs `python -m module` in a child process (for the
+    data_import / data_cleanup scripts). The output tail goes into the result;
+    a non-zero exit code fails the attempt.
+    """
+    def handler(params: Dict, context: JobContext) -> Dict:
+        started = time.monotonic()
+        with tempfile.TemporaryFile(mode='w+', encoding='utf-8', errors='replace') as output:
+            process = subprocess.Popen([sys.executable, '-m', module], stdout=output, stderr=subprocess.STDOUT,
+                                       stdin=subprocess.DEVNULL, env=dict(os.environ, PYTHONUNBUFFERED='1'))
+            while True:
+                try:
+                    returncode = process.wait(timeout=1.0)
+                    break
+                except subprocess.TimeoutExpired:
+                    pass
+                if context.cancelled or (timeout and time.monotonic() - started > timeout):
+                    process.terminate()
+                    process.wait()
+                    context.check()
+                    raise RuntimeError(f"{module} timed out after {timeout}s")
+            output.seek(0)
+            lines = output.read().splitlines()
+
+        result = {
+            'module': module,
+            'returncode': returncode,
+            'seconds': round(time.monotonic() - started, 2),
+            'output': lines[-OUTPUT_TAIL_LINES:]
+        }
+        if returncode != 0:
+            raise RuntimeError(f"{module} exited with {returncode}: {' | '.join(lines[-3:])}")
+        return result
+    return handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run job queue workers or manage queued jobs')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    worker_parser = subparsers.add_parser('worker', help='Process jobs in the foreground')
+    worker_parser.add_argument('--threads', type=int, default=1, help='Worker threads')
+    enqueue_parser = subparsers.add_parser('enqueue', help='Queue a job')
+    enqueue_parser.add_argument('kind')
+    enqueue_parser.add_argument('--params', default='{}', help='Job parameters as JSON')
+    enqueue_parser.add_argument('--priority', type=int, default=0)
+    list_parser = subparsers.add_parser('list', help='List jobs')
+    list_parser.add_argument('--status', choices=JOB_STATUSES)
+    list_parser.add_argument('--limit', type=int, default=20)
+    cancel_parser = subparsers.add_parser('cancel', help='Cancel a job')
+    cancel_parser.add_argument('job_id')
+    args = parser.parse_args()
+
+    # The handlers are registered by the app
+    from app import job_queue
+
+    if args.command == 'worker':
+        job_queue.workers = args.threads
+        job_queue.ensure_workers()
+        print(f"Job worker {os.getpid()} running {args.threads} thread(s) for: {', '.join(job_queue.kinds())}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            return
+    elif args.command == 'enqueue':
+        job = job_queue.enqueue(args.kind, json.loads(args.params), args.priority)
+        print(f"Queued {job['kind']} job {job['job_id']}")
+    elif args.command == 'list':
+        for job in job_queue.list(args.status, limit=args.limit):
+            print(f"{job['job_id']}  {job['kind']:<16} {job['status']:<10} attempt {job['attempts']}/"
+                  f"{job['max_attempts']}  {round(job['progress'] * 100):>3}%  {job['created_at']}  {job['error'] or ''}")
+    elif args.command == 'cancel':
+        job = job_queue.cancel(args.job_id)
+        print(f"Job {args.job_id}: {job['status'] if job else 'not found'}")
+
+
+if __name__ == "__main__":
+    main()
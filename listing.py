@@ -0,0 +1,166 @@
+# listing.py - Keyset pagination for the database listing endpoints
+"""
+Paged, sorted and projected listings over the catalog tables.
+
+Pages are fetched with keyset (seek) pagination: the next page starts after
+the sort values of the last row returned, so every page is an index range scan
+instead of an OFFSET that re-reads all earlier rows. The position is handed to
+the client as an opaque cursor token.
+
+Query parameters understood by KeysetListing.fetch():
+
+    limit   page size (1..MAX_PAGE_SIZE); without limit and cursor the whole
+            listing is returned
+    cursor  next_cursor value of the previous page
+    sort    one of the listing's sort keys
+    order   asc or desc
+    fields  comma-separated subset of the listing's fields
+"""
+
+import base64
+import json
+from typing import Dict, List, Optional, Tuple
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+class ListingError(ValueError):
+    """Invalid listing parameters (reported to the client as HTTP 400)"""
+
+
+def encode_cursor(values: List) -> str:
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str) -> List:
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise ListingError('Invalid cursor')
+    if not isinstance(values, list) or len(values) < 3:
+        raise ListingError('Invalid cursor')
+    return values
+
+
+class KeysetListing:
+    """
+    One listing endpoint.
+
+    Args:
+        select_from: FROM/JOIN clause of the query
+        fields: output field -> SQL expression
+        sort_keys: sort name -> list of SQL expressions; expressions must never
+            be NULL (wrap nullable columns in IFNULL) and should match an index
+        key: SQL expression of a unique column, used as the final tie-breaker
+        default_sort: sort name used when none is given
+        indexes: CREATE INDEX statements backing the sort keys
+    """
+
+    def __init__(self, select_from: str, fields: Dict[str, str], sort_keys: Dict[str, List[str]],
+                 key: str, default_sort: str, indexes: Tuple[str, ...] = ()):
+        self.select_from = select_from
+        self.fields = fields
+        self.sort_keys = sort_keys
+        self.key = key
+        self.default_sort = default_sort
+        self.indexes = indexes
+        self._indexes_ready = False
+
+    def ensure_indexes(self, conn) -> None:
+        if self._indexes_ready:
+            return
+        for statement in self.indexes:
+            conn.execute(statement)
+        conn.commit()
+        self._indexes_ready = True
+
+    def parse(self, args) -> Dict:
+        """Validate request arguments"""
+        sort = args.get('sort', self.default_sort)
+        if sort not in self.sort_keys:
+            raise ListingError(f"sort must be one of: {', '.join(self.sort_keys)}")
+
+        order = args.get('order', 'asc').lower()
+        if order not in ('asc', 'desc'):
+            raise ListingError('order must be asc or desc')
+
+        fields = list(self.fields)
+        if args.get('fields'):
+            fields = [field.strip() for field in args['fields'].split(',') if field.strip()]
+            unknown = [field for field in fields if field not in self.fields]
+            if unknown:
+                raise ListingError(f"Unknown fields: {', '.join(unknown)}")
+
+        cursor = args.get('cursor')
+        after = None
+        if cursor:
+            values = decode_cursor(cursor)
+            if values[0] != sort or values[1] != order:
+                raise ListingError('Cursor was issued for a different sort order')
+            after = values[2:]
+            if len(after) != len(self.sort_keys[sort]) + 1:
+                raise ListingError('Invalid cursor')
+
+        limit = args.get('limit')
+        paged = limit is not None or cursor is not None
+        if paged:
+            try:
+                limit = int(limit) if limit is not None else DEFAULT_PAGE_SIZE
+            except (TypeError, ValueError):
+                raise ListingError('limit must be an integer')
+            if not 1 <= limit <= MAX_PAGE_SIZE:
+                raise ListingError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+
+        return {
+            'sort': sort,
+            'order': order,
+            'fields': fields,
+            'after': after,
+            'limit': limit if paged else None,
+            'paged': paged
+        }
+
+    def fetch(self, conn, args) -> Tuple[List[Dict], Optional[str], Dict]:
+        """
+        Run the listing query.
+
+        Returns:
+            (rows projected to the requested fields, next cursor or None, parsed params)
+        """
+        params = self.parse(args)
+        self.ensure_indexes(conn)
+
+        order_by = self.sort_keys[params['sort']] + [self.key]
+        direction = 'ASC' if params['order'] == 'asc' else 'DESC'
+
+        columns = [f"{self.fields[field]} AS {field}" for field in params['fields']]
+        columns += [f"{expression} AS _seek_{index}" for index, expression in enumerate(order_by)]
+
+        query = f"SELECT {', '.join(columns)} {self.select_from}"
+        values = []
+        if params['after'] is not None:
+            comparison = '>' if direction == 'ASC' else '<'
+            query += f" WHERE ({', '.join(order_by)}) {comparison} ({', '.join('?' * len(order_by))})"
+            values.extend(params['after'])
+        query += ' ORDER BY ' + ', '.join(f"{expression} {direction}" for expression in order_by)
+        if params['paged']:
+            # One extra row tells whether there is a next page
+            query += ' LIMIT ?'
+            values.append(params['limit'] + 1)
+
+        rows = [dict(row) for row in conn.execute(query, values)]
+
+        next_cursor = None
+        if params['paged'] and len(rows) > params['limit']:
+            rows = rows[:params['limit']]
+            last = rows[-1]
+            next_cursor = encode_cursor(
+                [params['sort'], params['order']] + [last[f"_seek_{index}"] for index in range(len(order_by))]
+            )
+
+        projected = [{field: row[field] for field in params['fields']} for row in rows]
+        return projected, next_cursor, params
@@ -0,0 +1,244 @@
+# material_names.py - Material name normalization and cached name -> material_id resolution
+"""
+Material names come from several places that spell them differently: the
+database and data_import.py use underscores ('organic_cotton'), the scoring
+configs use spaces ('organic cotton'), and vendor feeds and the admin UI send
+free text ('Organic Cotton', 'Spandex').
+
+normalize_material_name() maps all of these to one key: lower case, with
+runs of spaces, hyphens and underscores collapsed into a single '_'. On top of
+that, BUILTIN_MATERIAL_ALIASES maps common synonyms to the catalog name, and
+the material_aliases table holds aliases added through the API.
+
+MaterialResolver keeps an in-memory normalized name -> (material_id, name) map
+per process, so write and read paths no longer run a SELECT per material. The
+map is rebuilt when the materials_version counter in catalog_meta moves; it is
+bumped by triggers on materials and material_aliases, so changes made by
+other workers and scripts are picked up within revalidate_interval.
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from catalog_cache import ensure_catalog_version_schema
+
+
+MATERIALS_VERSION_KEY = 'materials_version'
+
+# Synonym -> catalog name (both normalized)
+BUILTIN_MATERIAL_ALIASES = {
+    'conventional_cotton': 'cotton',
+    'recycled_poly': 'recycled_polyester',
+    'spandex': 'elastane',
+    'lycra': 'elastane',
+    'lyocell': 'tencel',
+    'rayon': 'viscose'
+}
+
+_SEPARATORS = re.compile(r'[\s_\-]+')
+
+
+class MaterialNameError(ValueError):
+    """Invalid material name or alias (reported to the client as HTTP 400)"""
+
+
+def normalize_material_name(name: Optional[str]) -> str:
+    """'Organic Cotton' / 'organic-cotton' / 'organic_cotton' -> 'organic_cotton'"""
+    return _SEPARATORS.sub('_', (name or '').strip().lower()).strip('_')
+
+
+def canonical_material_name(name: Optional[str]) -> str:
+    """Normalized name with the built-in synonyms applied (no database access)"""
+    key = normalize_material_name(name)
+    return BUILTIN_MATERIAL_ALIASES.get(key, key)
+
+
+def ensure_material_alias_schema(conn) -> None:
+    """Create material_aliases and the triggers that bump the materials version"""
+    ensure_catalog_version_schema(conn)
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS material_aliases (
+        alias TEXT PRIMARY KEY,
+        material_id INTEGER NOT NULL,
+        FOREIGN KEY (material_id) REFERENCES materials(material_id)
+    )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO catalog_meta (key, value) VALUES (?, 1)", (MATERIALS_VERSION_KEY,))
+    for table in ('materials', 'material_aliases'):
+        for operation in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_{operation.lower()}_materials_version
+            AFTER {operation} ON {table}
+            BEGIN
+                UPDATE catalog_meta SET value = value + 1 WHERE key = '{MATERIALS_VERSION_KEY}';
+            END
+            ''')
+    conn.commit()
+
+
+class MaterialResolver:
+    """
+    Cached material name -> material_id lookups with alias support.
+
+    Args:
+        db: Object with get_connection() (FashionEnvironmentDB)
+        revalidate_interval: Longest time (s) between materials version checks
+    """
+
+    def __init__(self, db, revalidate_interval: float = 1.0):
+        self.db = db
+        self.revalidate_interval = revalidate_interval
+        self.version = None
+        self._names = {}
+        self._real_names = set()
+        self._aliases = {}
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._last_check = 0.0
+
+    # ------------------------------------------------------------------
+    # Cache maintenance
+    # ------------------------------------------------------------------
+
+    def invalidate(self) -> None:
+        """Re-check the materials version on the next lookup (after a write in this process)"""
+        self._last_check = 0.0
+
+    def _current(self) -> Dict[str, Tuple[int, str]]:
+        now = time.monotonic()
+        if now - self._last_check < self.revalidate_interval:
+            return self._names
+
+        with self._lock:
+            if now - self._last_check < self.revalidate_interval:
+                return self._names
+            conn = self.db.get_connection()
+            try:
+                if not self._schema_ready:
+                    try:
+                        ensure_material_alias_schema(conn)
+                        self._schema_ready = True
+                    except sqlite3.OperationalError:
+                        # Database is locked by a writer; retry the schema on the next check
+                        pass
+                try:
+                    row = conn.execute('SELECT value FROM catalog_meta WHERE key = ?',
+                                       (MATERIALS_VERSION_KEY,)).fetchone()
+                except sqlite3.OperationalError:
+                    row = None
+                # Without a version counter the map is reloaded on every check
+                version = row[0] if row else None
+                if version != self.version or version is None:
+                    self._load(conn)
+                    self.version = version
+            finally:
+                conn.close()
+            self._last_check = now
+            return self._names
+
+    def _load(self, conn) -> None:
+        names = {}
+        for material_id, material_name in conn.execute('SELECT material_id, material_name FROM materials'):
+            names[normalize_material_name(material_name)] = (material_id, material_name)
+        by_id = {entry[0]: entry for entry in names.values()}
+        real_names = set(names)
+
+        # Synonyms never shadow a real material name
+        for alias, target in BUILTIN_MATERIAL_ALIASES.items():
+            if alias not in names and target in names:
+                names[alias] = names[target]
+
+        aliases = {}
+        try:
+            rows = conn.execute('SELECT alias, material_id FROM material_aliases').fetchall()
+        except sqlite3.OperationalError:
+            rows = []
+        for alias, material_id in rows:
+            entry = by_id.get(material_id)
+            if entry is None:
+                continue
+            aliases[alias] = entry[1]
+            if alias not in real_names:
+                names[alias] = entry
+
+        self._names = names
+        self._real_names = real_names
+        self._aliases = aliases
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def lookup(self, name: Optional[str]) -> Optional[Tuple[int, str]]:
+        """(material_id, catalog name) for a material name or alias; None if unknown"""
+        return self._current().get(normalize_material_name(name))
+
+    def resolve(self, name: Optional[str]) -> Optional[int]:
+        """material_id for a material name or alias; None if unknown"""
+        entry = self.lookup(name)
+        return entry[0] if entry else None
+
+    def resolve_many(self, names: List[str]) -> Dict[str, int]:
+        """Name -> material_id for every known name in `names` (unknown names are left out)"""
+        known = self._current()
+        resolved = {}
+        for name in set(names):
+            entry = known.get(normalize_material_name(name))
+            if entry:
+                resolved[name] = entry[0]
+        return resolved
+
+    def catalog_name(self, name: Optional[str]) -> str:
+        """Name as stored in the catalog, or the normalized name if the material is unknown"""
+        entry = self.lookup(name)
+        return entry[1] if entry else normalize_material_name(name)
+
+    # ------------------------------------------------------------------
+    # Aliases
+    # ------------------------------------------------------------------
+
+    def aliases(self) -> Dict:
+        """Database aliases and the built-in synonyms that resolve in this catalog"""
+        names = self._current()
+        return {
+            'aliases': dict(sorted(self._aliases.items())),
+            'builtin': {alias: names[alias][1] for alias in sorted(BUILTIN_MATERIAL_ALIASES) if alias in names}
+        }
+
+    def add_alias(self, alias: str, material_name: str) -> Dict:
+        """Map `alias` to an existing material"""
+        key = normalize_material_name(alias)
+        if not key:
+            raise MaterialNameError('alias is required')
+        target = self.lookup(material_name)
+        if target is None:
+            raise MaterialNameError(f"Unknown material: {material_name}")
+        if key in self._real_names:
+            raise MaterialNameError(f"'{key}' is already a material name")
+
+        conn = self.db.get_connection()
+        try:
+            conn.execute('''
+            INSERT INTO material_aliases (alias, material_id) VALUES (?, ?)
+            ON CONFLICT(alias) DO UPDATE SET material_id = excluded.material_id
+            ''', (key, target[0]))
+            conn.commit()
+        finally:
+            conn.close()
+        self.invalidate()
+        return {'alias': key, 'material_name': target[1]}
+
+    def remove_alias(self, alias: str) -> bool:
+        conn = self.db.get_connection()
+        try:
+            cursor = conn.execute('DELETE FROM material_aliases WHERE alias = ?', (normalize_material_name(alias),))
+            conn.commit()
+            removed = cursor.rowcount > 0
+        finally:
+            conn.close()
+        self.invalidate()
+        return removed
@@ -0,0 +1,248 @@
+# recommender.py - Greener alternatives from a per-category score index
+"""
+For a scanned item, suggest items of the same category with a better final
+dual score.
+
+AlternativesIndex keeps, per category, a list of (-final_score, qr_code)
+sorted with bisect, so "everything better than this item" is a prefix of the
+list, plus a composition vector per item (material -> share) for similarity
+ranking. Lookups never touch SQLite.
+
+When the catalog version moves, the index is updated incrementally: each
+item's signature (item row, composition, and the impact values of its
+materials) is compared with the indexed one, and only changed, added or
+removed items are rescored and moved. A scoring config change rebuilds the
+whole index, since every score changes.
+"""
+
+import bisect
+import math
+import threading
+from typing import Dict, List, Optional
+
+
+DEFAULT_ALTERNATIVES = 3
+MAX_ALTERNATIVES = 20
+RANK_MODES = ('score', 'similar')
+
+
+class RecommenderError(ValueError):
+    """Invalid recommendation request (reported to the client as HTTP 400)"""
+
+
+def composition_vector(materials) -> Dict[str, float]:
+    """Material name -> share of the item (0-1)"""
+    vector = {}
+    for mat in materials:
+        name = mat['material_name'].lower()
+        vector[name] = vector.get(name, 0.0) + mat['percentage'] / 100
+    return vector
+
+
+def category_key(category: Optional[str]) -> str:
+    """Index key: categories are free text in the catalog ('pants' / 'Pants')"""
+    return (category or '').strip().lower()
+
+
+def cosine_similarity(a: Dict[str, float], a_norm: float, b: Dict[str, float], b_norm: float) -> float:
+    if not a_norm or not b_norm:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(name, 0.0) for name, value in a.items()) / (a_norm * b_norm)
+
+
+class AlternativesIndex:
+    """
+    Per-category score index over the catalog.
+
+    sync() updates copies of the entry and ranking tables and publishes both
+    with one reference swap, so queries running in other threads always see a
+    consistent pair without taking the lock.
+
+    Args:
+        catalog_cache: CatalogCache the items and impacts are read from
+        scorer_func: Returns the current DualSustainabilityScorer
+    """
+
+    def __init__(self, catalog_cache, scorer_func):
+        self.catalog_cache = catalog_cache
+        self.scorer_func = scorer_func
+        self._index = ({}, {})  # (qr_code -> entry, category -> [(-final_score, qr_code)])
+        self._version = None
+        self._fingerprint = None
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+
+    def sync(self) -> Dict:
+        """Bring the index up to the current catalog version and scoring config"""
+        self.catalog_cache.revalidate()
+        scorer = self.scorer_func()
+        if self._version == self.catalog_cache.version and self._fingerprint == scorer.compiled.fingerprint:
+            return {'changed': 0}
+
+        with self._lock:
+            version = self.catalog_cache.version
+            fingerprint = scorer.compiled.fingerprint
+            if self._version == version and self._fingerprint == fingerprint:
+                return {'changed': 0}
+
+            if fingerprint != self._fingerprint:
+                entries, by_category = {}, {}
+            else:
+                entries = dict(self._index[0])
+                by_category = {category: list(ranked) for category, ranked in self._index[1].items()}
+
+            categories = [key for key, _ in scorer.compiled.initial_cost_weights]
+            codes = self.catalog_cache.item_codes()
+            changed = 0
+            for qr_code in codes:
+                signature, item, materials = self._signature(qr_code, categories)
+                entry = entries.get(qr_code)
+                if entry is not None and entry['signature'] == signature:
+                    continue
+                self._remove(entries, by_category, qr_code)
+                self._add(entries, by_category, scorer, qr_code, signature, item, materials)
+                changed += 1
+
+            removed = set(entries) - set(codes)
+            for qr_code in removed:
+                self._remove(entries, by_category, qr_code)
+
+            self._index = (entries, by_category)
+            self._version = version
+            self._fingerprint = fingerprint
+            return {'changed': changed, 'removed': len(removed)}
+
+    def _signature(self, qr_code: str, categories: List[str]):
+        item = self.catalog_cache.get_clothing_item(qr_code)
+        item = dict(item) if item else None
+        materials = [dict(mat) for mat in self.catalog_cache.get_material_composition(qr_code)] if item else []
+        impacts = []
+        for mat in materials:
+            for category in categories:
+                impact = self.catalog_cache.get_environmental_impact(mat['material_name'], category)
+                impacts.append(impact['impact_value'] if impact else None)
+        signature = (
+            tuple(sorted(item.items())) if item else None,
+            tuple((mat['material_name'], mat['percentage']) for mat in materials),
+            tuple(impacts)
+        )
+        return signature, item, materials
+
+    def _add(self, entries: Dict, by_category: Dict, scorer, qr_code: str, signature, item, materials) -> None:
+        if not item or not materials:
+            return
+        score = scorer.get_dual_sustainability_score(qr_code)
+        if not score or 'error' in score:
+            return
+
+        vector = composition_vector(materials)
+        entry = {
+            'signature': signature,
+            'qr_code': qr_code,
+            'item_name': item['item_name'],
+            'brand': item.get('brand'),
+            'category': item.get('category'),
+            'final_score': score['final_sustainability_score']['score'],
+            'final_grade': score['final_sustainability_score']['grade'],
+            'initial_cost': score['initial_cost']['score'],
+            'lasting_cost': score['lasting_cost']['score'],
+            'materials': materials,
+            'vector': vector,
+            'norm': math.sqrt(sum(share * share for share in vector.values()))
+        }
+        entries[qr_code] = entry
+        ranked = by_category.setdefault(category_key(entry['category']), [])
+        bisect.insort(ranked, (-entry['final_score'], qr_code))
+
+    def _remove(self, entries: Dict, by_category: Dict, qr_code: str) -> None:
+        entry = entries.pop(qr_code, None)
+        if entry is None:
+            return
+        ranked = by_category[category_key(entry['category'])]
+        position = bisect.bisect_left(ranked, (-entry['final_score'], qr_code))
+        if position < len(ranked) and ranked[position][1] == qr_code:
+            del ranked[position]
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def alternatives(self, qr_code: str, k: int = DEFAULT_ALTERNATIVES, rank: str = 'score',
+                     min_improvement: float = 0.0) -> Optional[Dict]:
+        """
+        Up to k same-category items scoring at least min_improvement higher.
+
+        Args:
+            rank: 'score' - best scores first; 'similar' - most similar
+                composition first (among the better-scoring items)
+
+        Returns:
+            None if the item is not indexed (unknown or unscorable)
+        """
+        if rank not in RANK_MODES:
+            raise RecommenderError(f"rank must be one of: {', '.join(RANK_MODES)}")
+        if not 1 <= k <= MAX_ALTERNATIVES:
+            raise RecommenderError(f"k must be between 1 and {MAX_ALTERNATIVES}")
+
+        self.sync()
+        entries, by_category = self._index
+        entry = entries.get(qr_code)
+        if entry is None:
+            return None
+
+        ranked = by_category.get(category_key(entry['category']), [])
+        # Items scoring above the threshold form a prefix of the ranked list
+        end = bisect.bisect_left(ranked, (-(entry['final_score'] + min_improvement), ''))
+        candidates = [code for _, code in ranked[:end] if code != qr_code]
+        if rank == 'score':
+            chosen = [(code, None) for code in candidates[:k]]
+        else:
+            similarities = [
+                (cosine_similarity(entry['vector'], entry['norm'],
+                                   entries[code]['vector'], entries[code]['norm']), code)
+                for code in candidates
+            ]
+            similarities.sort(key=lambda pair: (-pair[0], -entries[pair[1]]['final_score']))
+            chosen = [(code, similarity) for similarity, code in similarities[:k]]
+
+        alternatives = []
+        for code, similarity in chosen:
+            other = entries[code]
+            if similarity is None:
+                similarity = cosine_similarity(entry['vector'], entry['norm'], other['vector'], other['norm'])
+            alternatives.append({
+                'qr_code': code,
+                'item_name': other['item_name'],
+                'brand': other['brand'],
+                'final_score': other['final_score'],
+                'final_grade': other['final_grade'],
+                'score_gain': round(other['final_score'] - entry['final_score'], 1),
+                'initial_cost': other['initial_cost'],
+                'lasting_cost': other['lasting_cost'],
+                'composition_similarity': round(similarity, 3),
+                'materials': other['materials']
+            })
+
+        return {
+            'qr_code': qr_code,
+            'item_name': entry['item_name'],
+            'category': entry['category'],
+            'final_score': entry['final_score'],
+            'final_grade': entry['final_grade'],
+            'rank': rank,
+            'alternatives': alternatives
+        }
+
+    def stats(self) -> Dict:
+        entries, by_category = self._index
+        return {
+            'version': self._version,
+            'config_fingerprint': self._fingerprint,
+            'items': len(entries),
+            'categories': {category: len(ranked) for category, ranked in by_category.items()}
+        }
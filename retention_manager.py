@@ -0,0 +1,447 @@
+# retention_manager.py - Retention, archival and compaction of event tables
+"""
+Keeps the raw event tables from growing without bound.
+
+For each table in RETENTION_TABLES, rows older than the table's retention
+window are:
+
+    1. archived - one gzip-compressed NDJSON file per day partition, written
+       atomically (temp file + rename) before anything is deleted
+    2. deleted  - in chunked transactions of at most `chunk_size` rows with a
+       pause between chunks, so kiosk requests never wait long for the lock
+    3. compacted - the freed pages are returned to the filesystem with
+       PRAGMA incremental_vacuum, also in steps
+
+scan_history rows are only removed once they are covered by the analytics
+rollups (scan_rollups.py watermark), so reported numbers never change. Users
+are removed when they have not been seen, and have no care habits, within
+the window; users without a last_seen timestamp are never removed. Expired server sessions are already removed by the session
+sweeper (session_store.py).
+
+Incremental vacuum needs auto_vacuum=INCREMENTAL. Converting a database
+created without it takes a full VACUUM, which rewrites the file under an
+exclusive lock, so it is never done by a run; it is an explicit maintenance
+step (--convert-auto-vacuum) for a quiet moment. Until then runs only
+delete, and the report flags that compaction is unavailable.
+
+Every run produces a report with archived/deleted row counts per table, the
+archive files, and the database size before and after (reclaimed bytes).
+
+Usage:
+    python retention_manager.py                  # one run with default windows
+    python retention_manager.py --dry-run        # count what would be removed
+    python retention_manager.py --convert-auto-vacuum   # one-time switch to incremental vacuum
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows - no cross-process locking
+    fcntl = None
+
+
+# table -> id column, timestamp column, default retention window (days) and
+# an extra condition rows must meet to be removed
+RETENTION_TABLES = {
+    'scan_history': {
+        'id_column': 'scan_id',
+        'time_column': 'scan_timestamp',
+        'days': 90,
+        'condition': 'scan_id <= :rollup_watermark'
+    },
+    'user_care_habits': {
+        'id_column': 'id',
+        'time_column': 'created_at',
+        'days': 365,
+        'condition': None
+    },
+    'users': {
+        'id_column': 'id',
+        # NULL last_seen never compares below the cutoff, so those users are kept
+        'time_column': 'last_seen',
+        'days': 365,
+        'condition': '''NOT EXISTS (
+            SELECT 1 FROM user_care_habits h
+            WHERE h.username = users.username AND h.created_at >= :cutoff
+        )'''
+    }
+}
+
+DELETE_CHUNK_SIZE = 500
+CHUNK_SLEEP_SECONDS = 0.05
+VACUUM_PAGES_PER_STEP = 1000
+VACUUM_MAX_STEPS = 100
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+REPORT_HISTORY = 10
+
+
+def ensure_user_activity_schema(conn) -> None:
+    """
+    Add users.last_seen (retention window for users) to older databases.
+    Existing users count as seen at migration time, so their window starts now.
+    """
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(users)')}
+    if columns and 'last_seen' not in columns:
+        conn.execute('ALTER TABLE users ADD COLUMN last_seen TIMESTAMP')
+        conn.execute('UPDATE users SET last_seen = CURRENT_TIMESTAMP')
+        conn.commit()
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class RetentionManager:
+    """
+    Applies the retention windows to one database, in the background or on demand.
+
+    Args:
+        db_path: Database to compact
+        archive_dir: Directory for the compressed partition archives
+        retention_days: Per-table overrides of the default windows
+            (0 or None keeps a table forever)
+        interval: Seconds between scheduled runs (None or 0 disables the schedule)
+        rollups: ScanRollups instance; brought up to date before scan_history is trimmed
+    """
+
+    def __init__(self, db_path: str, archive_dir: str = 'archives', retention_days: Optional[Dict] = None,
+                 interval: Optional[float] = None, rollups=None, chunk_size: int = DELETE_CHUNK_SIZE,
+                 chunk_sleep: float = CHUNK_SLEEP_SECONDS):
+        self.db_path = db_path
+        self.archive_dir = archive_dir
+        self.retention_days = {table: spec['days'] for table, spec in RETENTION_TABLES.items()}
+        self.retention_days.update(retention_days or {})
+        self.interval = interval
+        self.rollups = rollups
+        self.chunk_size = chunk_size
+        self.chunk_sleep = chunk_sleep
+
+        self._reports = []
+        self._running = None
+        self._lock = threading.Lock()
+        self._scheduler_pid = None
+
+    def get_connection(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # ------------------------------------------------------------------
+    # Runs
+    # ------------------------------------------------------------------
+
+    def start_run(self, trigger: str = 'manual') -> Dict:
+        """Start a run in a background thread; returns the running report if one is in progress"""
+        with self._lock:
+            if self._running:
+                return dict(self._running)
+            report = self._new_report(trigger)
+
+        thread = threading.Thread(target=self._run_report, args=(report,), name='db-retention', daemon=True)
+        thread.start()
+        return dict(report)
+
+    def run(self, dry_run: bool = False, trigger: str = 'direct') -> Dict:
+        """Run retention in the calling thread"""
+        with self._lock:
+            if self._running:
+                raise RuntimeError('A retention run is already in progress')
+            report = self._new_report(trigger, dry_run)
+        return self._run_report(report)
+
+    def _new_report(self, trigger: str, dry_run: bool = False) -> Dict:
+        report = {
+            'trigger': trigger,
+            'dry_run': dry_run,
+            'status': 'running',
+            'started_at': _utc_now().isoformat(),
+            'finished_at': None,
+            'tables': {},
+            'size_before_bytes': self._db_size(),
+            'size_after_bytes': None,
+            'reclaimed_bytes': None,
+            'vacuum': None,
+            'error': None
+        }
+        self._running = report
+        self._reports.append(report)
+        del self._reports[:-REPORT_HISTORY]
+        return report
+
+    def _run_report(self, report: Dict) -> Dict:
+        try:
+            rollup_watermark = 0
+            if self.rollups is not None:
+                self.rollups.update()
+                rollup_watermark = self.rollups.watermark()
+
+            for table in RETENTION_TABLES:
+                try:
+                    report['tables'][table] = self._apply_table(table, rollup_watermark, report['dry_run'])
+                except sqlite3.Error as e:
+                    # One table's problem (e.g. a missing table) does not stop the others
+                    report['tables'][table] = {'error': str(e)}
+
+            if not report['dry_run']:
+                report['vacuum'] = self._compact()
+            report['status'] = 'completed'
+        except Exception as e:
+            report['status'] = 'failed'
+            report['error'] = str(e)
+            print(f"Retention run failed: {e}")
+        finally:
+            report['size_after_bytes'] = self._db_size()
+            report['reclaimed_bytes'] = report['size_before_bytes'] - report['size_after_bytes']
+            report['finished_at'] = _utc_now().isoformat()
+            self._running = None
+        return dict(report)
+
+    def reports(self) -> List[Dict]:
+        """Recent run reports, newest first"""
+        return [dict(report) for report in reversed(self._reports)]
+
+    # ------------------------------------------------------------------
+    # Archive + chunked delete
+    # ------------------------------------------------------------------
+
+    def _apply_table(self, table: str, rollup_watermark: int, dry_run: bool) -> Dict:
+        days = self.retention_days.get(table)
+        result = {'retention_days': days, 'archived': 0, 'deleted': 0, 'files': []}
+        if not days:
+            return result
+
+        spec = RETENTION_TABLES[table]
+        cutoff = (_utc_now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+        result['cutoff'] = cutoff
+        where = f"{spec['time_column']} < :cutoff"
+        if spec['condition']:
+            where += f" AND {spec['condition']}"
+        params = {'cutoff': cutoff, 'rollup_watermark': rollup_watermark}
+
+        conn = self.get_connection()
+        try:
+            exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+            if not exists:
+                return result
+            if table == 'users':
+                ensure_user_activity_schema(conn)
+            if dry_run:
+                result['would_delete'] = conn.execute(f'SELECT COUNT(*) FROM {table} WHERE {where}', params).fetchone()[0]
+                return result
+
+            # Partition by day of the timestamp; archive each day before deleting it
+            partitions = [row[0] for row in conn.execute(
+                f"SELECT DISTINCT substr({spec['time_column']}, 1, 10) FROM {table} WHERE {where} ORDER BY 1", params
+            )]
+        finally:
+            conn.close()
+
+        for partition in partitions:
+            ids, path = self._archive_partition(table, spec, where, params, partition)
+            result['archived'] += len(ids)
+            if path:
+                result['files'].append(path)
+            result['deleted'] += self._delete_ids(table, spec['id_column'], ids)
+        return result
+
+    def _archive_partition(self, table: str, spec: Dict, where: str, params: Dict, partition: str):
+        """Write one day partition to a gzip NDJSON file; returns (row ids, path)"""
+        conn = self.get_connection()
+        try:
+            cursor = conn.execute(
+                f"SELECT * FROM {table} WHERE {where} AND substr({spec['time_column']}, 1, 10) IS :partition "
+                f"ORDER BY {spec['id_column']}",
+                dict(params, partition=partition)
+            )
+            rows = [dict(row) for row in cursor]
+        finally:
+            conn.close()
+        if not rows:
+            return [], None
+
+        ids = [row[spec['id_column']] for row in rows]
+        table_dir = os.path.join(self.archive_dir, table)
+        os.makedirs(table_dir, exist_ok=True)
+        # The id range keeps files of later runs for the same day apart
+        path = os.path.join(table_dir, f"{table}_{partition or 'undated'}_{ids[0]}-{ids[-1]}.ndjson.gz")
+        tmp_path = f"{path}.{os.getpid()}.part"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f_out:
+            for row in rows:
+                f_out.write(json.dumps(row, default=str) + '\n')
+        os.replace(tmp_path, path)
+        return ids, path
+
+    def _delete_ids(self, table: str, id_column: str, ids: List[int]) -> int:
+        deleted = 0
+        for start in range(0, len(ids), self.chunk_size):
+            chunk = ids[start:start + self.chunk_size]
+            conn = self.get_connection()
+            try:
+                with conn:
+                    cursor = conn.execute(
+                        f"DELETE FROM {table} WHERE {id_column} IN ({','.join('?' * len(chunk))})", chunk
+                    )
+                    deleted += cursor.rowcount
+            finally:
+                conn.close()
+            # Leave the write lock to request handlers between chunks
+            time.sleep(self.chunk_sleep)
+        return deleted
+
+    # ------------------------------------------------------------------
+    # Compaction
+    # ------------------------------------------------------------------
+
+    def _compact(self) -> Dict:
+        """
+        Return free pages with at most VACUUM_MAX_STEPS bounded incremental_vacuum
+        steps; pages left over are freed by the next run. Does nothing until the
+        database is in incremental auto_vacuum mode (convert_to_incremental).
+        """
+        conn = self.get_connection()
+        try:
+            mode = AUTO_VACUUM_MODES.get(conn.execute('PRAGMA auto_vacuum').fetchone()[0], 'none')
+            result = {'auto_vacuum': mode, 'freed_pages': 0}
+            if mode != 'incremental':
+                result['conversion_needed'] = True
+                return result
+
+            free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            for _ in range(VACUUM_MAX_STEPS):
+                if not free_pages:
+                    break
+                conn.execute(f'PRAGMA incremental_vacuum({VACUUM_PAGES_PER_STEP})').fetchall()
+                remaining = conn.execute('PRAGMA freelist_count').fetchone()[0]
+                result['freed_pages'] += free_pages - remaining
+                if remaining >= free_pages:
+                    break
+                free_pages = remaining
+                time.sleep(self.chunk_sleep)
+            result['free_pages_left'] = free_pages
+            return result
+        finally:
+            conn.close()
+
+    def convert_to_incremental(self) -> Dict:
+        """
+        Switch the database to auto_vacuum=INCREMENTAL. The full VACUUM this
+        needs rewrites the whole file under an exclusive lock: run it as a
+        maintenance step, not from a web worker.
+        """
+        conn = self.get_connection()
+        try:
+            before = AUTO_VACUUM_MODES.get(conn.execute('PRAGMA auto_vacuum').fetchone()[0], 'none')
+            if before == 'incremental':
+                return {'auto_vacuum': before, 'converted': False}
+            size_before = self._db_size()
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+            return {
+                'auto_vacuum': AUTO_VACUUM_MODES.get(conn.execute('PRAGMA auto_vacuum').fetchone()[0], 'none'),
+                'converted': True,
+                'reclaimed_bytes': size_before - self._db_size()
+            }
+        finally:
+            conn.close()
+
+    def _db_size(self) -> int:
+        try:
+            return os.path.getsize(self.db_path)
+        except OSError:
+            return 0
+
+    # ------------------------------------------------------------------
+    # Schedule
+    # ------------------------------------------------------------------
+
+    def ensure_scheduler(self) -> None:
+        """Start the schedule thread in this process (once per pid, so it survives forks)"""
+        if not self.interval or self._scheduler_pid == os.getpid():
+            return
+        self._scheduler_pid = os.getpid()
+        thread = threading.Thread(target=self._schedule_loop, name='db-retention-scheduler', daemon=True)
+        thread.start()
+
+    def _marker_path(self) -> str:
+        return os.path.join(self.archive_dir, '.retention_last_run')
+
+    def is_due(self) -> bool:
+        try:
+            return time.time() - os.path.getmtime(self._marker_path()) >= self.interval
+        except OSError:
+            return True
+
+    def _schedule_loop(self) -> None:
+        # Check often enough that a missed slot is caught up quickly
+        check_interval = min(300.0, self.interval)
+        while True:
+            time.sleep(check_interval)
+            try:
+                self._run_scheduled()
+            except Exception as e:
+                print(f"Retention scheduler error: {e}")
+
+    def _run_scheduled(self) -> None:
+        if not self.is_due():
+            return
+        os.makedirs(self.archive_dir, exist_ok=True)
+        lock_file = open(os.path.join(self.archive_dir, '.retention.lock'), 'a')
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    # Another worker is running retention
+                    return
+            # Re-check under the lock: another worker may have just finished
+            if not self.is_due():
+                return
+            with self._lock:
+                if self._running:
+                    return
+                report = self._new_report('scheduled')
+            self._run_report(report)
+            with open(self._marker_path(), 'w') as marker:
+                marker.write(report['finished_at'])
+        finally:
+            lock_file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive and delete old event rows, then compact the database')
+    parser.add_argument('--db', default='fashion_env.db', help='Database file')
+    parser.add_argument('--archive-dir', default='archives', help='Archive directory')
+    parser.add_argument('--dry-run', action='store_true', help='Only count the rows that would be removed')
+    parser.add_argument('--convert-auto-vacuum', action='store_true',
+                        help='Switch the database to incremental auto_vacuum (full VACUUM, exclusive lock) and exit')
+    for table, spec in RETENTION_TABLES.items():
+        parser.add_argument(f"--{table.replace('_', '-')}-days", type=int, default=spec['days'],
+                            help=f"Retention window for {table} (0 keeps everything)")
+    args = parser.parse_args()
+
+    from scan_rollups import ScanRollups
+
+    manager = RetentionManager(
+        args.db, args.archive_dir,
+        retention_days={table: getattr(args, f"{table}_days") for table in RETENTION_TABLES},
+        rollups=ScanRollups(args.db)
+    )
+    if args.convert_auto_vacuum:
+        print(json.dumps(manager.convert_to_incremental(), indent=2))
+        return
+
+    report = manager.run(dry_run=args.dry_run)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
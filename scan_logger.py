@@ -0,0 +1,228 @@
+# scan_logger.py - Write-behind logging of scan events into scan_history
+"""
+Every scan (/api/analyze, /api/dual_analyze) and add-to-cart is recorded in
+scan_history without touching SQLite on the request path.
+
+log() only appends the event to a bounded in-memory queue. A background writer
+thread per process drains the queue and inserts the events in batched
+transactions (one executemany per batch), either when a batch is full or
+after flush_interval seconds.
+
+When the queue is full the overflow policy decides:
+    drop_oldest  - discard the oldest queued event (default; never blocks)
+    drop_newest  - discard the incoming event
+    block        - wait up to block_timeout for room, then drop the incoming event
+
+Dropped events are counted in stats(). A failed batch is retried a few times
+and then dropped, so a locked or broken database never grows the queue
+without bound. After each flush the writer runs the on_flush hook, which the
+app uses to keep the scan rollups (scan_rollups.py) current.
+"""
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'block')
+EVENT_TYPES = ('analyze', 'dual_analyze', 'add_to_cart')
+
+MAX_BATCH_ATTEMPTS = 3
+
+
+def ensure_scan_history_schema(conn) -> None:
+    """Create scan_history if needed and add the event_type column and timestamp index"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS scan_history (
+        scan_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        qr_code VARCHAR(50),
+        scan_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        calculated_impacts TEXT,  -- JSON string
+        session_id VARCHAR(50),
+        FOREIGN KEY (qr_code) REFERENCES clothing_items(qr_code)
+    )
+    ''')
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(scan_history)')}
+    if 'event_type' not in columns:
+        conn.execute("ALTER TABLE scan_history ADD COLUMN event_type VARCHAR(20) DEFAULT 'analyze'")
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_scan_history_timestamp ON scan_history(scan_timestamp)')
+    conn.commit()
+
+
+class ScanLogger:
+    """
+    Bounded write-behind queue in front of scan_history.
+
+    Args:
+        db_path: Database file
+        max_queue: Events held in memory before the overflow policy applies
+        batch_size: Events per insert transaction
+        flush_interval: Longest time (s) an event waits in the queue
+        policy: One of OVERFLOW_POLICIES
+        block_timeout: Longest wait (s) for room under the 'block' policy
+        on_flush: Called by the writer thread with the number of events written
+            (e.g. to update rollups)
+    """
+
+    def __init__(self, db_path: str, max_queue: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 1.0, policy: str = 'drop_oldest', block_timeout: float = 0.05,
+                 enabled: bool = True, on_flush: Optional[Callable[[int], None]] = None):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.db_path = db_path
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.enabled = enabled
+        self.on_flush = on_flush
+
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._writer_pid = None
+        self._schema_ready = False
+        self._counters = {
+            'enqueued': 0,
+            'written': 0,
+            'dropped': 0,
+            'batches': 0,
+            'failed_batches': 0,
+            'max_depth': 0
+        }
+        self.last_error = None
+        atexit.register(self.flush)
+
+    # ------------------------------------------------------------------
+    # Request path
+    # ------------------------------------------------------------------
+
+    def log(self, event_type: str, qr_code: str, impacts: Optional[Dict] = None,
+            session_id: Optional[str] = None) -> bool:
+        """Queue one event; returns False if it was dropped. Never raises, never touches SQLite."""
+        if not self.enabled:
+            return False
+        try:
+            event = (
+                qr_code,
+                datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+                json.dumps(impacts) if impacts is not None else None,
+                session_id,
+                event_type
+            )
+            with self._condition:
+                if len(self._queue) >= self.max_queue:
+                    if self.policy == 'drop_oldest':
+                        self._queue.popleft()
+                        self._counters['dropped'] += 1
+                    elif self.policy == 'block':
+                        self._condition.wait_for(lambda: len(self._queue) < self.max_queue, self.block_timeout)
+                    if len(self._queue) >= self.max_queue:
+                        self._counters['dropped'] += 1
+                        return False
+
+                self._queue.append(event)
+                self._counters['enqueued'] += 1
+                depth = len(self._queue)
+                if depth > self._counters['max_depth']:
+                    self._counters['max_depth'] = depth
+                if depth >= self.batch_size:
+                    self._condition.notify_all()
+            return True
+        except Exception as e:
+            self.last_error = str(e)
+            return False
+
+    # ------------------------------------------------------------------
+    # Writer
+    # ------------------------------------------------------------------
+
+    def ensure_writer(self) -> None:
+        """Start the writer thread in this process (once per pid, so it survives forks)"""
+        if not self.enabled or self._writer_pid == os.getpid():
+            return
+        self._writer_pid = os.getpid()
+        # Events queued by the parent before the fork belong to the parent
+        with self._condition:
+            self._queue.clear()
+        thread = threading.Thread(target=self._writer_loop, name='scan-logger', daemon=True)
+        thread.start()
+
+    def _writer_loop(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: len(self._queue) >= self.batch_size, self.flush_interval)
+            try:
+                written = self.flush()
+                if written and self.on_flush:
+                    self.on_flush(written)
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Scan logger error: {e}")
+
+    def _take_batch(self):
+        with self._condition:
+            count = min(self.batch_size, len(self._queue))
+            batch = [self._queue.popleft() for _ in range(count)]
+            # Room again for producers waiting under the 'block' policy
+            self._condition.notify_all()
+        return batch
+
+    def flush(self) -> int:
+        """Write everything queued so far; returns the number of events written"""
+        written = 0
+        with self._write_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    return written
+                if self._write_batch(batch):
+                    written += len(batch)
+                else:
+                    return written
+
+    def _write_batch(self, batch) -> bool:
+        for attempt in range(MAX_BATCH_ATTEMPTS):
+            try:
+                conn = sqlite3.connect(self.db_path, timeout=5)
+                try:
+                    if not self._schema_ready:
+                        ensure_scan_history_schema(conn)
+                        self._schema_ready = True
+                    with conn:
+                        conn.executemany('''
+                        INSERT INTO scan_history (qr_code, scan_timestamp, calculated_impacts, session_id, event_type)
+                        VALUES (?, ?, ?, ?, ?)
+                        ''', batch)
+                finally:
+                    conn.close()
+                self._counters['written'] += len(batch)
+                self._counters['batches'] += 1
+                return True
+            except sqlite3.Error as e:
+                self.last_error = str(e)
+                time.sleep(0.1 * (attempt + 1))
+
+        self._counters['failed_batches'] += 1
+        self._counters['dropped'] += len(batch)
+        print(f"Scan logger dropped {len(batch)} events: {self.last_error}")
+        return False
+
+    def stats(self) -> Dict:
+        return dict(
+            self._counters,
+            enabled=self.enabled,
+            queue_depth=len(self._queue),
+            max_queue=self.max_queue,
+            batch_size=self.batch_size,
+            flush_interval=self.flush_interval,
+            policy=self.policy,
+            last_error=self.last_error
+        )
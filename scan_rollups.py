@@ -0,0 +1,407 @@
+# scan_rollups.py - Hourly and daily rollups of scan_history
+"""
+Dashboards read pre-aggregated buckets instead of scanning scan_history.
+
+Rollup tables (bucket_size is 'hour' or 'day'; bucket_start is a UTC
+'YYYY-MM-DD HH:00:00' / 'YYYY-MM-DD' string):
+
+    scan_rollup_items   events and summed final scores per item and event type
+    scan_rollup_grades  final-grade counts of dual scans, for all sessions
+                        (session_id '') and, in day buckets, per session
+    scan_rollup_carts   add-to-cart events with summed cart scores and sizes
+
+Rollups are maintained incrementally. A watermark (the last rolled-up
+scan_id, kept in catalog_meta) marks where the previous run stopped. Each run
+aggregates only newer rows and adds them to the buckets with UPSERTs, in the
+same write transaction that advances the watermark. Every event is therefore
+counted exactly once, even with several workers running updates.
+
+Raw scan_history rows can be archived or deleted after they are rolled up
+(retention_manager.py) without changing any reported numbers. From then on
+the rollups are the only record of those events: rebuild() refuses to run
+once scan_history no longer starts at the first event, since recomputing
+from the remaining rows would silently drop the older buckets.
+
+Usage:
+    python scan_rollups.py             # roll up new events
+    python scan_rollups.py --rebuild   # recompute all rollups from a complete scan_history
+"""
+
+import argparse
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from grading import GRADES, score_to_grade
+
+
+BUCKET_SIZES = ('hour', 'day')
+WATERMARK_KEY = 'scan_rollup_last_id'
+ROLLUP_CHUNK_SIZE = 5000
+DEFAULT_RANGES = {'hour': timedelta(hours=48), 'day': timedelta(days=30)}
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class RollupQueryError(ValueError):
+    """Invalid rollup query (reported to the client as HTTP 400)"""
+
+
+def ensure_rollup_schema(conn) -> None:
+    conn.executescript('''
+    CREATE TABLE IF NOT EXISTS scan_rollup_items (
+        bucket_size TEXT NOT NULL,
+        bucket_start TEXT NOT NULL,
+        qr_code TEXT NOT NULL,
+        event_type TEXT NOT NULL,
+        events INTEGER NOT NULL DEFAULT 0,
+        score_sum REAL NOT NULL DEFAULT 0,
+        score_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (bucket_size, bucket_start, qr_code, event_type)
+    );
+    CREATE TABLE IF NOT EXISTS scan_rollup_grades (
+        bucket_size TEXT NOT NULL,
+        bucket_start TEXT NOT NULL,
+        session_id TEXT NOT NULL,
+        grade TEXT NOT NULL,
+        events INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (bucket_size, bucket_start, session_id, grade)
+    );
+    CREATE TABLE IF NOT EXISTS scan_rollup_carts (
+        bucket_size TEXT NOT NULL,
+        bucket_start TEXT NOT NULL,
+        events INTEGER NOT NULL DEFAULT 0,
+        score_sum REAL NOT NULL DEFAULT 0,
+        score_count INTEGER NOT NULL DEFAULT 0,
+        items_sum INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (bucket_size, bucket_start)
+    );
+    CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+    ''')
+
+
+def bucket_start(timestamp: str, bucket_size: str) -> str:
+    """Bucket key of a 'YYYY-MM-DD HH:MM:SS' timestamp"""
+    if bucket_size == 'hour':
+        return f"{timestamp[:13]}:00:00"
+    return timestamp[:10]
+
+
+def _parse_time(value: str, name: str) -> datetime:
+    for time_format in (TIMESTAMP_FORMAT, '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, time_format)
+        except ValueError:
+            continue
+    raise RollupQueryError(f"{name} must be YYYY-MM-DD or YYYY-MM-DD HH:MM:SS (UTC)")
+
+
+def _aggregate(rows) -> Dict:
+    """Fold raw scan rows into per-bucket increments"""
+    items, grades, carts = {}, {}, {}
+    for row in rows:
+        timestamp = row['scan_timestamp'] or ''
+        event_type = row['event_type'] or 'analyze'
+        try:
+            impacts = json.loads(row['calculated_impacts']) if row['calculated_impacts'] else {}
+        except ValueError:
+            impacts = {}
+
+        for size in BUCKET_SIZES:
+            start = bucket_start(timestamp, size)
+
+            item = items.setdefault((size, start, row['qr_code'] or '', event_type), [0, 0.0, 0])
+            item[0] += 1
+            score = impacts.get('final_score') if event_type == 'dual_analyze' else None
+            if score is not None:
+                item[1] += score
+                item[2] += 1
+                grade = score_to_grade(score)
+                grades[(size, start, '', grade)] = grades.get((size, start, '', grade), 0) + 1
+                if size == 'day' and row['session_id']:
+                    key = (size, start, row['session_id'], grade)
+                    grades[key] = grades.get(key, 0) + 1
+
+            if event_type == 'add_to_cart':
+                cart = carts.setdefault((size, start), [0, 0.0, 0, 0])
+                cart[0] += 1
+                cart_score = impacts.get('cart_final_score')
+                if cart_score is not None:
+                    cart[1] += cart_score
+                    cart[2] += 1
+                cart[3] += impacts.get('cart_items') or 0
+    return {'items': items, 'grades': grades, 'carts': carts}
+
+
+def _apply(conn, increments: Dict) -> None:
+    conn.executemany('''
+    INSERT INTO scan_rollup_items (bucket_size, bucket_start, qr_code, event_type, events, score_sum, score_count)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(bucket_size, bucket_start, qr_code, event_type) DO UPDATE SET
+        events = events + excluded.events,
+        score_sum = score_sum + excluded.score_sum,
+        score_count = score_count + excluded.score_count
+    ''', [key + tuple(values) for key, values in increments['items'].items()])
+    conn.executemany('''
+    INSERT INTO scan_rollup_grades (bucket_size, bucket_start, session_id, grade, events)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(bucket_size, bucket_start, session_id, grade) DO UPDATE SET
+        events = events + excluded.events
+    ''', [key + (count,) for key, count in increments['grades'].items()])
+    conn.executemany('''
+    INSERT INTO scan_rollup_carts (bucket_size, bucket_start, events, score_sum, score_count, items_sum)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(bucket_size, bucket_start) DO UPDATE SET
+        events = events + excluded.events,
+        score_sum = score_sum + excluded.score_sum,
+        score_count = score_count + excluded.score_count,
+        items_sum = items_sum + excluded.items_sum
+    ''', [key + tuple(values) for key, values in increments['carts'].items()])
+
+
+class ScanRollups:
+    """Incremental maintenance of, and queries over, the scan rollup tables"""
+
+    def __init__(self, db_path: str, chunk_size: int = ROLLUP_CHUNK_SIZE):
+        self.db_path = db_path
+        self.chunk_size = chunk_size
+        self._schema_ready = False
+        self._update_lock = threading.Lock()
+
+    def get_connection(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        if not self._schema_ready:
+            ensure_rollup_schema(conn)
+            conn.commit()
+            self._schema_ready = True
+        return conn
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+
+    def update(self) -> int:
+        """Roll up scan_history rows past the watermark; returns the number of rows added"""
+        total = 0
+        with self._update_lock:
+            conn = self.get_connection()
+            try:
+                while True:
+                    rolled = self._update_chunk(conn)
+                    total += rolled
+                    if rolled < self.chunk_size:
+                        return total
+            finally:
+                conn.close()
+
+    def _update_chunk(self, conn) -> int:
+        # IMMEDIATE: the watermark read and advance happen under the write lock
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            watermark = self._read_watermark(conn)
+            try:
+                rows = conn.execute('''
+                SELECT scan_id, qr_code, scan_timestamp, calculated_impacts, session_id, event_type
+                FROM scan_history
+                WHERE scan_id > ?
+                ORDER BY scan_id
+                LIMIT ?
+                ''', (watermark, self.chunk_size)).fetchall()
+            except sqlite3.OperationalError:
+                # No scan_history yet (the scan logger creates it on its first write)
+                rows = []
+            if rows:
+                _apply(conn, _aggregate(rows))
+                conn.execute('''
+                INSERT INTO catalog_meta (key, value) VALUES (?, ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value
+                ''', (WATERMARK_KEY, rows[-1]['scan_id']))
+            conn.commit()
+            return len(rows)
+        except Exception:
+            conn.rollback()
+            raise
+
+    def rebuild(self) -> int:
+        """
+        Drop all rollups and recompute them from scan_history.
+
+        Raises RuntimeError when rolled-up events have been trimmed from
+        scan_history (the oldest retained scan_id is past 1), because their
+        buckets could not be recomputed.
+        """
+        with self._update_lock:
+            conn = self.get_connection()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                oldest = self._oldest_scan_id(conn)
+                if (oldest is None and self._read_watermark(conn)) or (oldest is not None and oldest > 1):
+                    conn.rollback()
+                    retained = f"starts at scan_id {oldest}" if oldest is not None else 'is empty'
+                    raise RuntimeError(
+                        f"scan_history {retained}; older events only exist in the rollups "
+                        f"(and the retention archives), so a rebuild would lose them"
+                    )
+                for table in ('scan_rollup_items', 'scan_rollup_grades', 'scan_rollup_carts'):
+                    conn.execute(f'DELETE FROM {table}')
+                conn.execute('DELETE FROM catalog_meta WHERE key = ?', (WATERMARK_KEY,))
+                conn.commit()
+            finally:
+                conn.close()
+        return self.update()
+
+    @staticmethod
+    def _read_watermark(conn) -> int:
+        row = conn.execute('SELECT value FROM catalog_meta WHERE key = ?', (WATERMARK_KEY,)).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _oldest_scan_id(conn) -> Optional[int]:
+        try:
+            return conn.execute('SELECT MIN(scan_id) FROM scan_history').fetchone()[0]
+        except sqlite3.OperationalError:
+            return None
+
+    def watermark(self) -> int:
+        conn = self.get_connection()
+        try:
+            return self._read_watermark(conn)
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Queries (rollup tables only)
+    # ------------------------------------------------------------------
+
+    def _range(self, bucket_size: str, start: Optional[str], end: Optional[str]):
+        if bucket_size not in BUCKET_SIZES:
+            raise RollupQueryError(f"bucket must be one of: {', '.join(BUCKET_SIZES)}")
+        end_time = _parse_time(end, 'end') if end else datetime.now(timezone.utc).replace(tzinfo=None)
+        start_time = _parse_time(start, 'start') if start else end_time - DEFAULT_RANGES[bucket_size]
+        return (bucket_start(start_time.strftime(TIMESTAMP_FORMAT), bucket_size),
+                bucket_start(end_time.strftime(TIMESTAMP_FORMAT), bucket_size))
+
+    def scan_series(self, bucket_size: str = 'hour', start: Optional[str] = None, end: Optional[str] = None,
+                    qr_code: Optional[str] = None) -> Dict:
+        """Events per bucket and event type (optionally for one item)"""
+        start, end = self._range(bucket_size, start, end)
+        sql = '''
+        SELECT bucket_start, event_type, SUM(events) AS events
+        FROM scan_rollup_items
+        WHERE bucket_size = ? AND bucket_start BETWEEN ? AND ?
+        '''
+        params = [bucket_size, start, end]
+        if qr_code:
+            sql += ' AND qr_code = ?'
+            params.append(qr_code)
+        sql += ' GROUP BY bucket_start, event_type ORDER BY bucket_start'
+
+        conn = self.get_connection()
+        try:
+            series = {}
+            for row in conn.execute(sql, params):
+                bucket = series.setdefault(row['bucket_start'], {'bucket_start': row['bucket_start'], 'total': 0})
+                bucket[row['event_type']] = row['events']
+                bucket['total'] += row['events']
+        finally:
+            conn.close()
+        return {'bucket': bucket_size, 'start': start, 'end': end, 'qr_code': qr_code,
+                'series': list(series.values())}
+
+    def top_items(self, bucket_size: str = 'day', start: Optional[str] = None, end: Optional[str] = None,
+                  event_type: Optional[str] = None, limit: int = 20) -> Dict:
+        """Most scanned items in the range, with their average final score"""
+        start, end = self._range(bucket_size, start, end)
+        sql = '''
+        SELECT qr_code, SUM(events) AS events, SUM(score_sum) AS score_sum, SUM(score_count) AS score_count
+        FROM scan_rollup_items
+        WHERE bucket_size = ? AND bucket_start BETWEEN ? AND ?
+        '''
+        params = [bucket_size, start, end]
+        if event_type:
+            sql += ' AND event_type = ?'
+            params.append(event_type)
+        sql += ' GROUP BY qr_code ORDER BY events DESC, qr_code LIMIT ?'
+        params.append(max(1, min(limit, 500)))
+
+        conn = self.get_connection()
+        try:
+            items = [{
+                'qr_code': row['qr_code'],
+                'events': row['events'],
+                'avg_final_score': round(row['score_sum'] / row['score_count'], 1) if row['score_count'] else None
+            } for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+        return {'bucket': bucket_size, 'start': start, 'end': end, 'event_type': event_type, 'items': items}
+
+    def grade_distribution(self, bucket_size: str = 'day', start: Optional[str] = None, end: Optional[str] = None,
+                           session_id: Optional[str] = None) -> Dict:
+        """Final grades of dual scans per bucket (per session: day buckets only)"""
+        if session_id and bucket_size != 'day':
+            raise RollupQueryError('Per-session grade distributions use day buckets')
+        start, end = self._range(bucket_size, start, end)
+
+        conn = self.get_connection()
+        try:
+            rows = conn.execute('''
+            SELECT bucket_start, grade, events
+            FROM scan_rollup_grades
+            WHERE bucket_size = ? AND bucket_start BETWEEN ? AND ? AND session_id = ?
+            ORDER BY bucket_start
+            ''', (bucket_size, start, end, session_id or '')).fetchall()
+        finally:
+            conn.close()
+
+        series = {}
+        totals = {grade: 0 for grade in reversed(GRADES)}
+        for row in rows:
+            bucket = series.setdefault(row['bucket_start'], {'bucket_start': row['bucket_start'], 'grades': {}})
+            bucket['grades'][row['grade']] = row['events']
+            totals[row['grade']] += row['events']
+        return {'bucket': bucket_size, 'start': start, 'end': end, 'session_id': session_id,
+                'totals': totals, 'series': list(series.values())}
+
+    def cart_series(self, bucket_size: str = 'day', start: Optional[str] = None, end: Optional[str] = None) -> Dict:
+        """Add-to-cart events with the average cart score and size per bucket"""
+        start, end = self._range(bucket_size, start, end)
+        conn = self.get_connection()
+        try:
+            series = [{
+                'bucket_start': row['bucket_start'],
+                'add_to_cart_events': row['events'],
+                'avg_cart_score': round(row['score_sum'] / row['score_count'], 1) if row['score_count'] else None,
+                'avg_cart_items': round(row['items_sum'] / row['events'], 2) if row['events'] else None
+            } for row in conn.execute('''
+            SELECT bucket_start, events, score_sum, score_count, items_sum
+            FROM scan_rollup_carts
+            WHERE bucket_size = ? AND bucket_start BETWEEN ? AND ?
+            ORDER BY bucket_start
+            ''', (bucket_size, start, end))]
+        finally:
+            conn.close()
+        return {'bucket': bucket_size, 'start': start, 'end': end, 'series': series}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain the scan_history rollup tables')
+    parser.add_argument('--db', default='fashion_env.db', help='Database file')
+    parser.add_argument('--rebuild', action='store_true', help='Recompute all rollups from scan_history')
+    args = parser.parse_args()
+
+    rollups = ScanRollups(args.db)
+    if args.rebuild:
+        try:
+            rolled = rollups.rebuild()
+        except RuntimeError as e:
+            print(f"Rebuild refused: {e}")
+            return
+    else:
+        rolled = rollups.update()
+    print(f"Rolled up {rolled} scan events (watermark: scan_id {rollups.watermark()})")
+
+
+if __name__ == "__main__":
+    main()
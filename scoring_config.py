@@ -0,0 +1,440 @@
+# scoring_config.py - Scoring configuration compiled into lookup tables
+"""
+Turns DualSustainabilityConfig (and optionally SustainabilityConfig) into
+flat lookup tables once, instead of lower-casing material names and probing
+several dicts for every material of every scored item.
+
+Every material name gets a small integer ID. The per-material scores
+(durability, end-of-life, microplastics, enhanced bonus/penalty) are stored in
+lists indexed by that ID, so scoring an item is: resolve its materials to
+(id, fraction) pairs once, then do indexed sums over the tables. Names not in
+the config get an ID on first use, with the same defaults the dict lookups used.
+Material names are keyed by their catalog form (material_names.py), so the
+config's 'organic cotton' matches the catalog's 'organic_cotton' and
+'conventional cotton' matches 'cotton'.
+
+The fingerprint identifies the configuration contents and is part of the
+memoized score cache keys, so scores computed under another configuration are
+never served.
+
+ScoringConfigStore keeps tuned versions of the tables in the database; workers
+pick up a newly activated version without restarting.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from material_names import BUILTIN_MATERIAL_ALIASES, canonical_material_name, normalize_material_name
+
+
+# Defaults used by the scorers for materials missing from a table
+DEFAULT_MATERIAL_SCORE = 50
+DEFAULT_ADJUSTMENT = 0
+
+
+def _normalize_name(name: Optional[str]) -> str:
+    return (name or '').lower()
+
+
+def config_fingerprint(*sections: Dict) -> str:
+    """Stable hash of configuration dicts"""
+    payload = json.dumps(sections, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class CompiledScoringConfig:
+    """
+    Lookup tables for one scoring configuration.
+
+    Args:
+        dual_config: DualSustainabilityConfig instance
+        enhanced_config: SustainabilityConfig instance (optional)
+    """
+
+    def __init__(self, dual_config, enhanced_config=None):
+        self.dual_config = dual_config
+        self.enhanced_config = enhanced_config
+
+        self.initial_cost_weights = tuple(dual_config.initial_cost_weights.items())
+        self.lasting_cost_weights = tuple(dual_config.lasting_cost_weights.items())
+        self.category_durability = {
+            _normalize_name(name): value for name, value in dual_config.category_durability_expectations.items()
+        }
+        self.brand_quality = {
+            _normalize_name(name): value for name, value in dual_config.brand_quality_multipliers.items()
+        }
+
+        sections = [
+            dual_config.initial_cost_weights,
+            dual_config.lasting_cost_weights,
+            dual_config.material_durability_scores,
+            dual_config.end_of_life_scores,
+            dual_config.microplastic_scores,
+            dual_config.category_durability_expectations,
+            dual_config.brand_quality_multipliers
+        ]
+
+        # Material tables: name -> ID, then one list per score kind
+        self._lock = threading.Lock()
+        self.material_ids = {}
+        self._name_ids = {}
+        self.durability = []
+        self.end_of_life = []
+        self.microplastic = []
+        self.adjustment = []
+
+        self._durability_source = self._normalized(dual_config.material_durability_scores)
+        self._end_of_life_source = self._normalized(dual_config.end_of_life_scores)
+        self._microplastic_source = self._normalized(dual_config.microplastic_scores)
+
+        self._adjustment_source = {}
+        if enhanced_config is not None:
+            # Bonus wins over penalty, as in the enhanced scorer
+            self._adjustment_source = dict(self._normalized(enhanced_config.material_sustainability_penalty))
+            self._adjustment_source.update(self._normalized(enhanced_config.material_sustainability_bonus))
+            self.category_weights = tuple(enhanced_config.category_weights.items())
+            self.category_multipliers = {
+                _normalize_name(name): value for name, value in enhanced_config.category_multipliers.items()
+            }
+            sections += [
+                enhanced_config.category_weights,
+                enhanced_config.material_sustainability_bonus,
+                enhanced_config.material_sustainability_penalty,
+                enhanced_config.category_multipliers
+            ]
+
+        for name in sorted(set(self._durability_source) | set(self._end_of_life_source) |
+                           set(self._microplastic_source) | set(self._adjustment_source)):
+            self._register(name)
+
+        # The name rules decide which table entry a material hits, so they are part of the fingerprint
+        self.fingerprint = config_fingerprint(*sections, BUILTIN_MATERIAL_ALIASES)
+        self._weight_factors = {}
+
+    @staticmethod
+    def _normalized(scores: Dict) -> Dict:
+        """Material table keyed by catalog name; an entry under the catalog name wins over a synonym"""
+        normalized = {}
+        synonyms = {}
+        for name, value in scores.items():
+            key = canonical_material_name(name)
+            if key == normalize_material_name(name):
+                normalized[key] = value
+            else:
+                synonyms[key] = value
+        return dict(synonyms, **normalized)
+
+    def _register(self, name: str) -> int:
+        material_id = len(self.durability)
+        self.durability.append(self._durability_source.get(name, DEFAULT_MATERIAL_SCORE))
+        self.end_of_life.append(self._end_of_life_source.get(name, DEFAULT_MATERIAL_SCORE))
+        self.microplastic.append(self._microplastic_source.get(name, DEFAULT_MATERIAL_SCORE))
+        self.adjustment.append(self._adjustment_source.get(name, DEFAULT_ADJUSTMENT))
+        self.material_ids[name] = material_id
+        return material_id
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def material_id(self, material_name: str) -> int:
+        """Integer ID of a material name (assigned on first use for unknown names)"""
+        material_id = self._name_ids.get(material_name)
+        if material_id is not None:
+            return material_id
+        name = canonical_material_name(material_name)
+        material_id = self.material_ids.get(name)
+        if material_id is None:
+            with self._lock:
+                material_id = self.material_ids.get(name)
+                if material_id is None:
+                    material_id = self._register(name)
+        # Spelling as it appears in compositions -> ID, so the next lookup skips normalization
+        self._name_ids[material_name] = material_id
+        return material_id
+
+    def material_vector(self, materials: List[Dict]) -> List[Tuple[int, float]]:
+        """Resolve a composition to (material ID, fraction) pairs"""
+        name_ids = self._name_ids
+        vector = []
+        for mat in materials:
+            material_id = name_ids.get(mat['material_name'])
+            if material_id is None:
+                material_id = self.material_id(mat['material_name'])
+            vector.append((material_id, mat['percentage'] / 100))
+        return vector
+
+    @staticmethod
+    def weighted(table: List[float], vector: List[Tuple[int, float]]) -> float:
+        """Composition-weighted sum of a per-material table"""
+        total = 0
+        for material_id, fraction in vector:
+            total += table[material_id] * fraction
+        return total
+
+    def weight_factor(self, weight_grams) -> float:
+        """get_weight_durability_factor, memoized per weight"""
+        factor = self._weight_factors.get(weight_grams)
+        if factor is None:
+            factor = self.dual_config.get_weight_durability_factor(weight_grams)
+            self._weight_factors[weight_grams] = factor
+        return factor
+
+    def category_durability_multiplier(self, category: Optional[str]) -> float:
+        return self.category_durability.get(_normalize_name(category), 1.0)
+
+    def brand_multiplier(self, brand: Optional[str]) -> float:
+        return self.brand_quality.get(_normalize_name(brand), 1.0)
+
+    def category_multiplier(self, category: Optional[str]) -> float:
+        """Enhanced scorer category multiplier"""
+        return self.category_multipliers.get(_normalize_name(category), 1.0)
+
+
+# ============================================================================
+# VERSIONED CONFIGURATION STORE
+# ============================================================================
+
+# Tables that can be tuned at runtime, per config section
+CONFIG_SECTIONS = {
+    'dual': (
+        'initial_cost_weights',
+        'lasting_cost_weights',
+        'material_durability_scores',
+        'end_of_life_scores',
+        'microplastic_scores',
+        'category_durability_expectations',
+        'brand_quality_multipliers'
+    ),
+    'enhanced': (
+        'category_weights',
+        'material_sustainability_bonus',
+        'material_sustainability_penalty',
+        'category_multipliers'
+    )
+}
+
+# Weight tables: the scorers read every key, so keys can be changed but not added or removed
+FIXED_KEY_TABLES = {'initial_cost_weights', 'lasting_cost_weights', 'category_weights'}
+
+ACTIVE_VERSION_KEY = 'scoring_config_version'
+
+
+class ScoringConfigError(ValueError):
+    """Invalid scoring configuration (reported to the client as HTTP 400)"""
+
+
+def config_to_dict(dual_config, enhanced_config) -> Dict:
+    """Plain-dict form of the tunable tables"""
+    configs = {'dual': dual_config, 'enhanced': enhanced_config}
+    return {
+        section: {table: dict(getattr(configs[section], table)) for table in tables}
+        for section, tables in CONFIG_SECTIONS.items()
+    }
+
+
+def merge_config(base: Dict, patch: Dict) -> Dict:
+    """
+    Apply a partial config to a full one. Tables are merged key by key; a null
+    value removes the key.
+    """
+    if not isinstance(patch, dict):
+        raise ScoringConfigError('config must be an object')
+
+    merged = {section: {table: dict(values) for table, values in tables.items()}
+              for section, tables in base.items()}
+    for section, tables in patch.items():
+        if section not in CONFIG_SECTIONS:
+            raise ScoringConfigError(f"Unknown config section: {section}")
+        if not isinstance(tables, dict):
+            raise ScoringConfigError(f"{section} must be an object")
+        for table, values in tables.items():
+            if table not in CONFIG_SECTIONS[section]:
+                raise ScoringConfigError(f"Unknown table: {section}.{table}")
+            if not isinstance(values, dict):
+                raise ScoringConfigError(f"{section}.{table} must be an object")
+            for key, value in values.items():
+                if table in FIXED_KEY_TABLES and key not in merged[section][table]:
+                    raise ScoringConfigError(f"Unknown weight: {section}.{table}.{key}")
+                if value is None and table in FIXED_KEY_TABLES:
+                    raise ScoringConfigError(f"Weight {section}.{table}.{key} cannot be removed")
+                if value is None:
+                    merged[section][table].pop(key, None)
+                elif isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                    raise ScoringConfigError(f"{section}.{table}.{key} must be a non-negative number")
+                else:
+                    merged[section][table][key] = value
+    return merged
+
+
+class ScoringConfigVersion:
+    """One immutable configuration version: config objects plus compiled tables"""
+
+    def __init__(self, version: int, data: Dict, dual_factory, enhanced_factory):
+        self.version = version
+        self.data = data
+
+        self.dual = dual_factory()
+        self.enhanced = enhanced_factory()
+        for section, config in (('dual', self.dual), ('enhanced', self.enhanced)):
+            for table, values in data.get(section, {}).items():
+                # Instance attributes shadow the class-level defaults
+                setattr(config, table, dict(values))
+
+        # Separate tables (and fingerprints) so a change to one scorer's
+        # section leaves the other scorer's cached results valid
+        self.compiled = CompiledScoringConfig(self.dual)
+        self.compiled_enhanced = CompiledScoringConfig(self.dual, self.enhanced)
+
+
+class ScoringConfigStore:
+    """
+    Scoring configuration versions in the scoring_config_versions table.
+
+    The active version number lives in catalog_meta. current() re-reads it at
+    most once per check_interval and swaps in the new version as a whole, so a
+    scorer always sees one consistent configuration. Version 0 means the
+    built-in defaults.
+    """
+
+    def __init__(self, db_connection, dual_factory, enhanced_factory, check_interval: float = 1.0):
+        self.db = db_connection
+        self.dual_factory = dual_factory
+        self.enhanced_factory = enhanced_factory
+        self.check_interval = check_interval
+
+        self._current = None
+        self._last_check = 0.0
+        self._schema_ready = False
+        self._lock = threading.Lock()
+
+    def get_connection(self):
+        conn = self.db.get_connection()
+        if not self._schema_ready:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS scoring_config_versions (
+                version INTEGER PRIMARY KEY AUTOINCREMENT,
+                data TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                comment TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''')
+            conn.execute('CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            conn.commit()
+            self._schema_ready = True
+        return conn
+
+    def defaults(self) -> Dict:
+        return config_to_dict(self.dual_factory(), self.enhanced_factory())
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def current(self) -> ScoringConfigVersion:
+        """The active configuration (re-checked at most once per check_interval)"""
+        now = time.monotonic()
+        current = self._current
+        if current is not None and now - self._last_check < self.check_interval:
+            return current
+
+        with self._lock:
+            conn = self.get_connection()
+            try:
+                row = conn.execute('SELECT value FROM catalog_meta WHERE key = ?', (ACTIVE_VERSION_KEY,)).fetchone()
+                version = row[0] if row else 0
+                if self._current is None or self._current.version != version:
+                    self._current = ScoringConfigVersion(
+                        version, self._load_data(conn, version), self.dual_factory, self.enhanced_factory
+                    )
+            finally:
+                conn.close()
+            self._last_check = now
+            return self._current
+
+    def _load_data(self, conn, version: int) -> Dict:
+        if version == 0:
+            return self.defaults()
+        row = conn.execute('SELECT data FROM scoring_config_versions WHERE version = ?', (version,)).fetchone()
+        if not row:
+            return self.defaults()
+        return json.loads(row[0])
+
+    def get_version(self, version: int) -> Optional[Dict]:
+        conn = self.get_connection()
+        try:
+            if version == 0:
+                return {'version': 0, 'comment': 'Built-in defaults', 'created_at': None, 'data': self.defaults()}
+            row = conn.execute(
+                'SELECT version, data, fingerprint, comment, created_at FROM scoring_config_versions WHERE version = ?',
+                (version,)
+            ).fetchone()
+        finally:
+            conn.close()
+        if not row:
+            return None
+        result = dict(row)
+        result['data'] = json.loads(result['data'])
+        return result
+
+    def list_versions(self) -> List[Dict]:
+        conn = self.get_connection()
+        try:
+            rows = conn.execute('''
+            SELECT version, fingerprint, comment, created_at
+            FROM scoring_config_versions
+            ORDER BY version DESC
+            ''').fetchall()
+        finally:
+            conn.close()
+        return [dict(row) for row in rows]
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def create_version(self, patch: Dict, comment: Optional[str] = None, activate: bool = True) -> int:
+        """Store a new version (patch merged over the active one); returns its number"""
+        data = merge_config(self.current().data, patch)
+        fingerprint = config_fingerprint(data)
+
+        conn = self.get_connection()
+        try:
+            cursor = conn.execute(
+                'INSERT INTO scoring_config_versions (data, fingerprint, comment) VALUES (?, ?, ?)',
+                (json.dumps(data, sort_keys=True), fingerprint, comment)
+            )
+            version = cursor.lastrowid
+            if activate:
+                self._set_active(conn, version)
+            conn.commit()
+        finally:
+            conn.close()
+
+        self._last_check = 0.0
+        return version
+
+    def activate(self, version: int) -> None:
+        """Make an existing version (or 0 for the defaults) the active one"""
+        conn = self.get_connection()
+        try:
+            if version != 0:
+                exists = conn.execute('SELECT 1 FROM scoring_config_versions WHERE version = ?', (version,)).fetchone()
+                if not exists:
+                    raise ScoringConfigError(f"Unknown config version: {version}")
+            self._set_active(conn, version)
+            conn.commit()
+        finally:
+            conn.close()
+
+        self._last_check = 0.0
+
+    def _set_active(self, conn, version: int) -> None:
+        conn.execute('''
+        INSERT INTO catalog_meta (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value
+        ''', (ACTIVE_VERSION_KEY, version))
@@ -0,0 +1,202 @@
+# serving_benchmark.py - Concurrency benchmark: gunicorn sync workers vs the ASGI entry point
+"""
+Starts both servers with the same number of worker processes, then drives the
+same read-only endpoints at increasing concurrency. Reports throughput and
+latency percentiles per server and concurrency level.
+
+    python serving_benchmark.py --workers 2 --concurrency 1,8,32,128
+    python serving_benchmark.py --lock-db 3        # a writer holds the DB lock for 3 s per level
+    python serving_benchmark.py --wsgi-url http://127.0.0.1:8000 --asgi-url http://127.0.0.1:8001
+
+The ASGI side needs uvicorn (pip install uvicorn); without it only the WSGI
+side is measured. Every request opens its own connection. Sync workers close
+the connection after each response, so both servers pay the same connect cost.
+
+--lock-db simulates a slow writer (a backup, a bulk import): a separate
+connection holds an EXCLUSIVE lock for the first N seconds of each level.
+Sync workers block on it one request per worker. The ASGI server keeps
+answering: DB calls past ASGI_DB_TIMEOUT get a 503, and /api/asgi/status
+stays responsive.
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+
+DEFAULT_PATHS = ['/api/dual_analyze/{qr}', '/api/analyze/{qr}', '/api/items?limit=50', '/api/alternatives/{qr}']
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def fetch(host: str, port: int, path: str, timeout: float) -> int:
+    """One GET on a fresh connection; returns the HTTP status (0 on connection errors)"""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode('latin-1'))
+        await writer.drain()
+        data = await asyncio.wait_for(reader.read(), timeout)
+        writer.close()
+        return int(data.split(b' ', 2)[1]) if data else 0
+    except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+        return 0
+
+
+async def run_level(url: str, paths: List[str], concurrency: int, total: int, timeout: float) -> Dict:
+    parsed = urlparse(url)
+    host, port = parsed.hostname, parsed.port
+    latencies = []
+    statuses = {}
+    counter = iter(range(total))
+
+    async def client():
+        for index in counter:
+            path = paths[index % len(paths)]
+            start = time.perf_counter()
+            status = await fetch(host, port, path, timeout)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    pick = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 1)
+    return {
+        'concurrency': concurrency,
+        'requests': total,
+        'rps': round(total / elapsed, 1),
+        'p50_ms': pick(0.5),
+        'p95_ms': pick(0.95),
+        'p99_ms': pick(0.99),
+        'ok': statuses.get(200, 0) + statuses.get(304, 0),
+        'statuses': {str(code): count for code, count in sorted(statuses.items())}
+    }
+
+
+def hold_lock(db_path: str, seconds: float) -> threading.Thread:
+    """Hold an EXCLUSIVE lock on the database in the background"""
+    def hold():
+        conn = sqlite3.connect(db_path, timeout=30)
+        conn.execute('BEGIN EXCLUSIVE')
+        time.sleep(seconds)
+        conn.rollback()
+        conn.close()
+    thread = threading.Thread(target=hold, daemon=True)
+    thread.start()
+    return thread
+
+
+def wait_ready(url: str, deadline: float = 60.0) -> bool:
+    parsed = urlparse(url)
+    end = time.monotonic() + deadline
+    while time.monotonic() < end:
+        if asyncio.run(fetch(parsed.hostname, parsed.port, '/api/items?limit=1', 5.0)) == 200:
+            return True
+        time.sleep(0.3)
+    return False
+
+
+def start_server(kind: str, workers: int) -> Optional[tuple]:
+    port = free_port()
+    if kind == 'wsgi':
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-k', 'sync',
+                   '-w', str(workers), '-b', f'127.0.0.1:{port}', 'app:app']
+    else:
+        if importlib.util.find_spec('uvicorn') is None:
+            print('uvicorn is not installed - skipping the ASGI server (pip install uvicorn)')
+            return None
+        command = [sys.executable, '-m', 'uvicorn', 'asgi_app:app', '--workers', str(workers),
+                   '--host', '127.0.0.1', '--port', str(port), '--no-access-log', '--log-level', 'warning']
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    if not wait_ready(url):
+        process.terminate()
+        raise RuntimeError(f"{kind} server did not come up: {' '.join(command)}")
+    return process, url
+
+
+def first_qr_code(db_path: str) -> str:
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute('SELECT qr_code FROM clothing_items ORDER BY qr_code LIMIT 1').fetchone()
+    finally:
+        conn.close()
+    if not row:
+        raise RuntimeError('The catalog is empty')
+    return row[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare sync WSGI workers and the ASGI entry point')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes per server')
+    parser.add_argument('--concurrency', default='1,8,32,128', help='Comma-separated client concurrency levels')
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per level')
+    parser.add_argument('--paths', help='Comma-separated paths ({qr} = first QR code); default: a scoring/catalog mix')
+    parser.add_argument('--lock-db', type=float, default=0.0, help='Hold an exclusive DB lock for N s at the start of each level')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Client timeout per request (s)')
+    parser.add_argument('--wsgi-url', help='Benchmark an already running Flask server instead of starting one')
+    parser.add_argument('--asgi-url', help='Benchmark an already running ASGI server instead of starting one')
+    parser.add_argument('--db', default='fashion_env.db', help='Database file (for --lock-db and the QR code)')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    args = parser.parse_args()
+
+    qr_code = first_qr_code(args.db)
+    paths = [path.format(qr=qr_code) for path in (args.paths.split(',') if args.paths else DEFAULT_PATHS)]
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+
+    servers = {}
+    processes = []
+    try:
+        for kind, url in (('wsgi', args.wsgi_url), ('asgi', args.asgi_url)):
+            if url:
+                servers[kind] = url
+                continue
+            started = start_server(kind, args.workers)
+            if started:
+                processes.append(started[0])
+                servers[kind] = started[1]
+
+        results = {}
+        for kind, url in servers.items():
+            results[kind] = []
+            for concurrency in levels:
+                locker = hold_lock(args.db, args.lock_db) if args.lock_db else None
+                results[kind].append(asyncio.run(run_level(url, paths, concurrency, args.requests, args.timeout)))
+                if locker:
+                    locker.join()
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(10)
+
+    if args.json:
+        print(json.dumps({'workers': args.workers, 'paths': paths, 'lock_db': args.lock_db, 'results': results}, indent=2))
+        return
+
+    print(f"workers per server: {args.workers}  requests per level: {args.requests}  lock-db: {args.lock_db}s")
+    print(f"paths: {', '.join(paths)}")
+    print(f"{'server':<6} {'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  statuses")
+    for kind, rows in results.items():
+        for row in rows:
+            print(f"{kind:<6} {row['concurrency']:>5} {row['rps']:>9} {row['p50_ms']:>9} {row['p95_ms']:>9} "
+                  f"{row['p99_ms']:>9}  {row['statuses']}")
+
+
+if __name__ == "__main__":
+    main()
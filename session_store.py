@@ -0,0 +1,247 @@
+# session_store.py - Server-side session storage for the Flask app
+"""
+Keeps session contents (cart items, saved receipt choices, ...) on the server
+and puts only a random session ID in the cookie.
+
+Backends:
+    sqlite  - server_sessions table in the app database; shared by all gunicorn
+              workers (default)
+    memory  - dict with TTL inside the process; only for single-process runs
+    cookie  - Flask's built-in signed-cookie sessions (previous behaviour)
+
+Expired sessions are removed by a background sweeper thread.
+"""
+
+import hashlib
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+
+# ============================================================================
+# BACKENDS
+# ============================================================================
+
+class MemorySessionBackend:
+    """Sessions in a process-local dict (lost on restart, not shared by workers)"""
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_id: str) -> Optional[str]:
+        with self._lock:
+            record = self._sessions.get(session_id)
+        if record is None or record[1] < time.time():
+            return None
+        return record[0]
+
+    def save(self, session_id: str, payload: str, expires_at: float) -> None:
+        with self._lock:
+            self._sessions[session_id] = (payload, expires_at)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def sweep(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (_, expires_at) in self._sessions.items() if expires_at < now]
+            for session_id in expired:
+                del self._sessions[session_id]
+        return len(expired)
+
+
+class SQLiteSessionBackend:
+    """Sessions in the server_sessions table, shared by every worker"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._schema_ready = False
+
+    def get_connection(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._schema_ready:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS server_sessions (
+                session_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_server_sessions_expires ON server_sessions(expires_at)')
+            conn.commit()
+            self._schema_ready = True
+        return conn
+
+    def load(self, session_id: str) -> Optional[str]:
+        conn = self.get_connection()
+        try:
+            row = conn.execute(
+                'SELECT data FROM server_sessions WHERE session_id = ? AND expires_at >= ?',
+                (session_id, time.time())
+            ).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def save(self, session_id: str, payload: str, expires_at: float) -> None:
+        conn = self.get_connection()
+        try:
+            conn.execute('''
+            INSERT INTO server_sessions (session_id, data, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at
+            ''', (session_id, payload, expires_at))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def delete(self, session_id: str) -> None:
+        conn = self.get_connection()
+        try:
+            conn.execute('DELETE FROM server_sessions WHERE session_id = ?', (session_id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def sweep(self) -> int:
+        conn = self.get_connection()
+        try:
+            cursor = conn.execute('DELETE FROM server_sessions WHERE expires_at < ?', (time.time(),))
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+
+# ============================================================================
+# FLASK SESSION INTERFACE
+# ============================================================================
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session dict that remembers its ID and the payload it was loaded with"""
+
+    def __init__(self, initial=None, session_id: str = None, payload_digest: str = None, new: bool = False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = session_id
+        self.payload_digest = payload_digest
+        self.new = new
+        self.modified = False
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Loads and stores sessions through a backend; the cookie holds only the ID.
+
+    Nested changes such as session['cart_items'].append(...) are detected by
+    comparing a digest of the serialized session, so routes that forget to set
+    session.modified still get saved.
+    """
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, backend, sweep_interval: float = 300.0):
+        self.backend = backend
+        self.sweep_interval = sweep_interval
+        self._sweeper_pid = None
+
+    def _ttl_seconds(self, app) -> float:
+        return app.permanent_session_lifetime.total_seconds()
+
+    def open_session(self, app, request):
+        self.ensure_sweeper()
+
+        session_id = request.cookies.get(self.get_cookie_name(app))
+        if session_id:
+            payload = self.backend.load(session_id)
+            if payload is not None:
+                return ServerSideSession(
+                    self.serializer.loads(payload),
+                    session_id=session_id,
+                    payload_digest=_digest(payload)
+                )
+        return ServerSideSession(session_id=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        response.vary.add('Cookie')
+
+        if not session:
+            if not session.new:
+                self.backend.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        payload = self.serializer.dumps(dict(session))
+        expires_at = time.time() + self._ttl_seconds(app)
+        # Unchanged sessions cost no write; the expiry slides on every change
+        if session.new or _digest(payload) != session.payload_digest:
+            self.backend.save(session.sid, payload, expires_at)
+
+        if session.new or self.should_set_cookie(app, session):
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app)
+            )
+
+    def ensure_sweeper(self) -> None:
+        """Start the expiry sweeper in this process (once per pid, so it survives forks)"""
+        if self._sweeper_pid == os.getpid():
+            return
+        self._sweeper_pid = os.getpid()
+        thread = threading.Thread(target=self._sweep_loop, name='session-sweeper', daemon=True)
+        thread.start()
+
+    def _sweep_loop(self) -> None:
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.backend.sweep()
+            except Exception as e:
+                print(f"Session sweeper error: {e}")
+
+
+def _digest(payload: str) -> str:
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def configure_session_store(app, backend_name: str, db_path: str, sweep_interval: float = 300.0) -> Dict:
+    """
+    Install the server-side session interface on app.
+
+    Args:
+        backend_name: 'sqlite', 'memory' or 'cookie'
+        db_path: SQLite database used by the sqlite backend
+    """
+    if backend_name == 'cookie':
+        return {'backend': 'cookie'}
+
+    if backend_name == 'memory':
+        backend = MemorySessionBackend()
+    elif backend_name == 'sqlite':
+        backend = SQLiteSessionBackend(db_path)
+    else:
+        raise ValueError(f"Unknown session backend: {backend_name}")
+
+    app.session_interface = ServerSideSessionInterface(backend, sweep_interval=sweep_interval)
+    return {'backend': backend_name}
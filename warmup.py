@@ -0,0 +1,98 @@
+# warmup.py - Warm-start preloading for web workers
+"""
+Preloads the catalog, scoring configuration, dynamic ranges and per-item scores
+so a freshly started (or recycled) worker serves its first requests at
+steady-state latency.
+
+Called from the gunicorn hooks in gunicorn.conf.py, but can also be run by hand:
+
+    python warmup.py             # warm up and print a report
+    python warmup.py --publish   # also (re)write the shared catalog snapshot,
+                                 # requires CATALOG_SNAPSHOT_PATH
+"""
+
+import argparse
+import time
+from typing import Dict, Optional
+
+
+def warm_up(precompute_scores: bool = True) -> Dict:
+    """
+    Warm the catalog cache and scorers of the app module in this process.
+
+    When the app runs in snapshot mode (CATALOG_SNAPSHOT_PATH) the shared
+    snapshot is mapped, and published first if it is missing or stale;
+    otherwise the catalog is loaded from the database into this worker.
+
+    Args:
+        precompute_scores: Also compute the dual score of every item
+
+    Returns:
+        Report with the data source, counts and timings
+    """
+    import app as web_app
+
+    started = time.perf_counter()
+    cache = web_app.catalog_cache
+    report = {'source': None, 'scored_items': 0}
+
+    if web_app.snapshot_publisher:
+        web_app.snapshot_publisher.publish()
+        cache.revalidate(force=True)
+
+    if cache.is_warm():
+        report['source'] = 'snapshot' if cache.snapshot_reader and cache.snapshot_reader.snapshot else 'inherited'
+    else:
+        report.update(cache.load_catalog())
+        report['source'] = 'database'
+    report['catalog_seconds'] = round(time.perf_counter() - started, 4)
+
+    # Scoring configuration and normalization ranges
+    if not web_app.dual_scorer:
+        web_app.initialize_dual_scorer()
+    web_app.dual_scorer._get_dynamic_ranges()
+
+    # Snapshots already carry every item's score
+    if precompute_scores and report['source'] != 'snapshot':
+        scoring_started = time.perf_counter()
+        for qr_code in cache.item_codes():
+            web_app.dual_scorer.get_dual_sustainability_score(qr_code)
+            report['scored_items'] += 1
+        report['scoring_seconds'] = round(time.perf_counter() - scoring_started, 4)
+
+    # Greener-alternative index (scores come from the memo filled above)
+    if precompute_scores:
+        index_started = time.perf_counter()
+        web_app.alternatives_index.sync()
+        report['alternatives_index_seconds'] = round(time.perf_counter() - index_started, 4)
+
+    report['catalog_version'] = cache.version
+    report['total_seconds'] = round(time.perf_counter() - started, 4)
+    return report
+
+
+def publish_snapshot() -> Optional[int]:
+    """Rewrite the shared catalog snapshot; returns the published catalog version"""
+    import app as web_app
+
+    if not web_app.snapshot_publisher:
+        raise RuntimeError('CATALOG_SNAPSHOT_PATH is not set')
+    return web_app.snapshot_publisher.publish(force=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Preload the catalog cache and item scores')
+    parser.add_argument('--publish', action='store_true', help='Rewrite the shared catalog snapshot first')
+    parser.add_argument('--no-scores', action='store_true', help='Skip precomputing item scores')
+    args = parser.parse_args()
+
+    if args.publish:
+        print(f"published catalog version: {publish_snapshot()}")
+    report = warm_up(precompute_scores=not args.no_scores)
+
+    for key, value in report.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
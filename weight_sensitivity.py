@@ -0,0 +1,251 @@
+# weight_sensitivity.py - What-if analysis of the dual score weights
+"""
+How would grades shift if initial_cost_weights or lasting_cost_weights changed?
+
+The per-item component scores (water/carbon/energy for Initial Cost;
+durability, end-of-life, microplastics and replacement for Lasting Cost) do
+not depend on the weights, so they are collected once per catalog version and
+scoring config into a component matrix. Every candidate weighting is then only
+a weighted sum over that matrix; with numpy all scenarios are evaluated in one
+matrix product.
+
+    final = (max(0, I·w_initial - penalty) + max(0, L·w_lasting - penalty)) / 2
+
+which is the same formula DualSustainabilityScorer uses for a single item.
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:  # pure-Python fallback
+    np = None
+    NUMPY_AVAILABLE = False
+
+from grading import grade_distribution, grade_scores
+
+
+MAX_SCENARIOS = 200
+MAX_QR_CODES = 10000
+WEIGHT_TABLES = ('initial_cost_weights', 'lasting_cost_weights')
+
+
+class WhatIfError(ValueError):
+    """Invalid what-if request (reported to the client as HTTP 400)"""
+
+
+class ComponentMatrix:
+    """Component scores of a set of items, one row per item"""
+
+    def __init__(self, qr_codes: List[str], initial_keys: List[str], lasting_keys: List[str],
+                 initial_rows: List[List[float]], lasting_rows: List[List[float]], penalties: List[float]):
+        self.qr_codes = qr_codes
+        self.initial_keys = initial_keys
+        self.lasting_keys = lasting_keys
+        if NUMPY_AVAILABLE:
+            self.initial = np.array(initial_rows, dtype=float).reshape(len(qr_codes), len(initial_keys))
+            self.lasting = np.array(lasting_rows, dtype=float).reshape(len(qr_codes), len(lasting_keys))
+            self.penalties = np.array(penalties, dtype=float)
+        else:
+            self.initial = initial_rows
+            self.lasting = lasting_rows
+            self.penalties = penalties
+
+    def __len__(self):
+        return len(self.qr_codes)
+
+    def scores(self, initial_weights: List[List[float]], lasting_weights: List[List[float]]) -> List[Dict]:
+        """
+        Evaluate many weightings at once.
+
+        Args:
+            initial_weights / lasting_weights: One weight vector per scenario,
+                in initial_keys / lasting_keys order
+
+        Returns:
+            Per scenario {'initial', 'lasting', 'final'}: per-item score lists
+        """
+        if NUMPY_AVAILABLE:
+            penalties = self.penalties[:, None]
+            # (items x components) @ (components x scenarios)
+            initial = np.maximum(0, self.initial @ np.array(initial_weights, dtype=float).T - penalties)
+            lasting = np.maximum(0, self.lasting @ np.array(lasting_weights, dtype=float).T - penalties)
+            final = (initial + lasting) / 2
+            return [
+                {'initial': initial[:, s].tolist(), 'lasting': lasting[:, s].tolist(), 'final': final[:, s].tolist()}
+                for s in range(len(initial_weights))
+            ]
+
+        results = []
+        for w_initial, w_lasting in zip(initial_weights, lasting_weights):
+            initial = [max(0, sum(c * w for c, w in zip(row, w_initial)) - p)
+                       for row, p in zip(self.initial, self.penalties)]
+            lasting = [max(0, sum(c * w for c, w in zip(row, w_lasting)) - p)
+                       for row, p in zip(self.lasting, self.penalties)]
+            results.append({
+                'initial': initial,
+                'lasting': lasting,
+                'final': [(i + l) / 2 for i, l in zip(initial, lasting)]
+            })
+        return results
+
+
+def build_component_matrix(scorer, qr_codes: List[str]) -> ComponentMatrix:
+    """Collect the component scores of qr_codes (items without a composition are left out)"""
+    initial_keys = [key for key, _ in scorer.compiled.initial_cost_weights]
+    lasting_keys = [key for key, _ in scorer.compiled.lasting_cost_weights]
+
+    codes, initial_rows, lasting_rows, penalties = [], [], [], []
+    for qr_code in qr_codes:
+        components = scorer.get_component_scores(qr_code)
+        if not components:
+            continue
+        codes.append(qr_code)
+        initial_rows.append([components['initial'].get(key, 0.0) for key in initial_keys])
+        lasting_rows.append([components['lasting'].get(key, 0.0) for key in lasting_keys])
+        penalties.append(components['composition_penalty'])
+
+    return ComponentMatrix(codes, initial_keys, lasting_keys, initial_rows, lasting_rows, penalties)
+
+
+def _scenario_weights(base: Dict[str, Dict], scenario: Dict) -> Dict[str, Dict]:
+    """Active weights with the scenario's overrides applied"""
+    if not isinstance(scenario, dict):
+        raise WhatIfError('Each scenario must be an object')
+    weights = {table: dict(base[table]) for table in WEIGHT_TABLES}
+    for table in WEIGHT_TABLES:
+        overrides = scenario.get(table) or {}
+        if not isinstance(overrides, dict):
+            raise WhatIfError(f"{table} must be an object")
+        for key, value in overrides.items():
+            if key not in weights[table]:
+                raise WhatIfError(f"Unknown weight: {table}.{key}")
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                raise WhatIfError(f"{table}.{key} must be a non-negative number")
+            weights[table][key] = value
+    if scenario.get('normalize'):
+        for table in WEIGHT_TABLES:
+            total = sum(weights[table].values())
+            if total > 0:
+                weights[table] = {key: value / total for key, value in weights[table].items()}
+    return weights
+
+
+def _mean(values) -> float:
+    return round(sum(values) / len(values), 2) if values else 0.0
+
+
+class WhatIfEngine:
+    """
+    Weight what-if analysis over the catalog.
+
+    The component matrix of the whole catalog is kept until the catalog
+    version or the scoring config changes.
+    """
+
+    def __init__(self, catalog_cache, scorer_func):
+        self.catalog_cache = catalog_cache
+        self.scorer_func = scorer_func  # returns the current DualSustainabilityScorer
+        self._matrix = None
+        self._matrix_key = None
+        self._lock = threading.Lock()
+
+    def catalog_matrix(self, scorer) -> ComponentMatrix:
+        self.catalog_cache.revalidate()
+        key = (self.catalog_cache.version, scorer.compiled.fingerprint)
+        with self._lock:
+            if self._matrix_key != key:
+                self._matrix = build_component_matrix(scorer, self.catalog_cache.item_codes())
+                self._matrix_key = key
+            return self._matrix
+
+    def evaluate(self, scenarios: List[Dict], qr_codes: Optional[List[str]] = None,
+                 include_items: bool = True) -> Dict:
+        """
+        Grade distributions and per-item deltas for each weight scenario.
+
+        Args:
+            scenarios: [{'name', 'initial_cost_weights': {...}, 'lasting_cost_weights': {...},
+                'normalize': bool}] - weights not given keep their active value
+            qr_codes: Restrict the analysis to these items (default: whole catalog;
+                at most MAX_QR_CODES, blanks and duplicates are dropped)
+            include_items: Add per-item scores and deltas to every scenario
+        """
+        if not isinstance(scenarios, list) or not scenarios:
+            raise WhatIfError('scenarios must be a non-empty list')
+        if len(scenarios) > MAX_SCENARIOS:
+            raise WhatIfError(f"At most {MAX_SCENARIOS} scenarios per request")
+
+        scorer = self.scorer_func()
+        if qr_codes is None:
+            matrix = self.catalog_matrix(scorer)
+        else:
+            if not isinstance(qr_codes, list) or not all(isinstance(code, str) for code in qr_codes):
+                raise WhatIfError('qr_codes must be a list of strings')
+            qr_codes = list(dict.fromkeys(code.strip() for code in qr_codes if code.strip()))
+            if len(qr_codes) > MAX_QR_CODES:
+                raise WhatIfError(f"At most {MAX_QR_CODES} QR codes per request")
+            self.catalog_cache.prefetch_items(qr_codes)
+            matrix = build_component_matrix(scorer, qr_codes)
+
+        base = {table: dict(getattr(scorer.compiled, table)) for table in WEIGHT_TABLES}
+        scenario_weights = [_scenario_weights(base, scenario) for scenario in scenarios]
+
+        # The active weights are evaluated alongside as the baseline (column 0)
+        all_weights = [base] + scenario_weights
+        results = matrix.scores(
+            [[weights['initial_cost_weights'][key] for key in matrix.initial_keys] for weights in all_weights],
+            [[weights['lasting_cost_weights'][key] for key in matrix.lasting_keys] for weights in all_weights]
+        )
+        baseline = results[0]
+        baseline_grades = grade_scores(baseline['final'])
+
+        scenario_results = []
+        for index, (scenario, weights, result) in enumerate(zip(scenarios, scenario_weights, results[1:])):
+            grades = grade_scores(result['final'])
+            deltas = [score - base_score for score, base_score in zip(result['final'], baseline['final'])]
+            entry = {
+                'name': scenario.get('name') or f"scenario_{index + 1}",
+                'weights': weights,
+                'grade_distribution': grade_distribution(result['final']),
+                'mean_scores': {
+                    'initial_cost': _mean(result['initial']),
+                    'lasting_cost': _mean(result['lasting']),
+                    'final': _mean(result['final'])
+                },
+                'mean_delta': _mean(deltas),
+                'grade_changes': sum(1 for grade, base_grade in zip(grades, baseline_grades) if grade != base_grade)
+            }
+            if include_items:
+                entry['items'] = [
+                    {
+                        'qr_code': qr_code,
+                        'final_score': round(score, 1),
+                        'final_grade': grade,
+                        'delta': round(delta, 1),
+                        'baseline_grade': base_grade
+                    }
+                    for qr_code, score, grade, delta, base_grade in zip(
+                        matrix.qr_codes, result['final'], grades, deltas, baseline_grades
+                    )
+                ]
+            scenario_results.append(entry)
+
+        return {
+            'catalog_version': self.catalog_cache.version,
+            'config_fingerprint': scorer.compiled.fingerprint,
+            'items_count': len(matrix),
+            'vectorized': NUMPY_AVAILABLE,
+            'baseline': {
+                'weights': base,
+                'grade_distribution': grade_distribution(baseline['final']),
+                'mean_scores': {
+                    'initial_cost': _mean(baseline['initial']),
+                    'lasting_cost': _mean(baseline['lasting']),
+                    'final': _mean(baseline['final'])
+                }
+            },
+            'scenarios': scenario_results
+        }